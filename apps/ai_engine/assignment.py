@@ -0,0 +1,129 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Cost used for pairs that must not be assigned (below min_score)
+_FORBIDDEN = 1e9
+
+
+def prune_candidates(scores: np.ndarray) -> np.ndarray:
+    """
+    Columns worth keeping for a max-score assignment of every row.
+    Each row only needs its best `n_rows` columns: if a row were assigned a
+    column outside that set, one of its top columns is still free (the other
+    rows use at most n_rows - 1 of them) and is at least as good. So the union
+    of per-row top-n_rows columns contains an optimal assignment.
+    """
+    n_rows, n_cols = scores.shape
+    if n_cols <= n_rows:
+        return np.arange(n_cols)
+    top = np.argpartition(-scores, n_rows - 1, axis=1)[:, :n_rows]
+    return np.unique(top)
+
+
+def hungarian(cost: np.ndarray, time_budget_s: Optional[float] = None) -> Tuple[np.ndarray, bool]:
+    """
+    Min-cost assignment of rows to distinct columns (rows <= columns).
+    Shortest augmenting path Hungarian algorithm with the column scan
+    vectorized. Returns (row -> column, optimal). If `time_budget_s` runs out,
+    the rows not yet augmented are assigned greedily to the cheapest free
+    column and `optimal` is False.
+    """
+    n, m = cost.shape
+    if n > m:
+        raise ValueError("hungarian() needs rows <= columns")
+
+    deadline = time.perf_counter() + time_budget_s if time_budget_s is not None else None
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # column -> row (1-based, 0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+    optimal = True
+
+    for i in range(1, n + 1):
+        if deadline is not None and time.perf_counter() > deadline:
+            optimal = False
+            break
+
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            improve = free & (cur < minv[1:])
+            minv[1:][improve] = cur[improve]
+            way[1:][improve] = j0
+
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    row_to_col = np.full(n, -1, dtype=np.int64)
+    assigned = np.flatnonzero(p[1:])
+    row_to_col[p[1:][assigned] - 1] = assigned
+
+    if not optimal:
+        taken = np.zeros(m, dtype=bool)
+        taken[assigned] = True
+        for row in np.flatnonzero(row_to_col < 0):
+            col = int(np.argmin(np.where(taken, np.inf, cost[row])))
+            row_to_col[row] = col
+            taken[col] = True
+
+    return row_to_col, optimal
+
+
+def solve_assignment(scores: np.ndarray, min_score: Optional[float] = None,
+                     time_budget_s: Optional[float] = None) -> Dict[str, object]:
+    """
+    Conflict-free load -> driver plan maximizing the total score.
+    `scores` is the load x driver matrix from `MatchingEngine.score_matrix`.
+    Pairs below `min_score` are never assigned; loads left without a driver
+    come back in `unassigned`.
+    """
+    n_loads, n_drivers = scores.shape
+    pairs: List[Tuple[int, int]] = []
+    optimal = True
+
+    if n_loads and n_drivers:
+        cols = prune_candidates(scores)
+        cost = -scores[:, cols]
+        if min_score is not None:
+            cost = np.where(scores[:, cols] < min_score, _FORBIDDEN, cost)
+
+        if n_loads <= len(cols):
+            row_to_col, optimal = hungarian(cost, time_budget_s)
+            candidate_pairs = [(row, int(cols[col])) for row, col in enumerate(row_to_col)]
+        else:
+            # More loads than drivers: assign drivers to loads instead
+            col_to_row, optimal = hungarian(cost.T, time_budget_s)
+            candidate_pairs = [(int(row), int(cols[col])) for col, row in enumerate(col_to_row)]
+
+        for row, col in candidate_pairs:
+            if min_score is None or scores[row, col] >= min_score:
+                pairs.append((row, col))
+
+    pairs.sort()
+    assigned_rows = {row for row, _ in pairs}
+    return {
+        "pairs": pairs,
+        "unassigned": [row for row in range(n_loads) if row not in assigned_rows],
+        "optimal": optimal,
+    }
@@ -0,0 +1,341 @@
+# Benchmarks for the matching, routing and pricing engines and the API.
+#
+#   python bench.py                      # full sizes, writes bench_results.json
+#   python bench.py --quick --out a.json # small sizes (CI / smoke)
+#   python bench.py --compare old.json   # also diff against an earlier run
+#
+# Fleets and road graphs are synthetic but seeded, so runs on the same
+# machine are comparable between commits. --compare exits with status 1 when
+# any benchmark's median slowed down by more than --threshold.
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# The API benchmarks run the engines in-process (no worker pool)
+os.environ.setdefault("ENGINE_PROCESSES", "0")
+
+from graph import CSRGraph
+from matching import DriverBatch, MatchingEngine
+from pricing import PricingEngine
+from route_cache import RouteCache
+from routing import RouteOptimizer
+
+CITIES = ["Mumbai", "Pune", "Delhi", "Bangalore", "Chennai", "Nasik", "Surat", "Thane"]
+# Bounding box of the synthetic data (roughly India)
+LAT_RANGE = (8.0, 35.0)
+LNG_RANGE = (68.0, 97.0)
+
+FULL_SIZES = {"fleet": [1000, 10000, 100000, 1000000], "graph": [1000, 10000, 100000, 500000]}
+QUICK_SIZES = {"fleet": [1000, 10000], "graph": [1000, 10000]}
+# match_driver_to_load is pure Python; larger fleets only run the vectorized path
+SCALAR_FLEET_LIMIT = 100000
+# ALT landmark tables are built with one Dijkstra per landmark and direction
+LANDMARK_GRAPH_LIMIT = 100000
+
+
+# --- Synthetic data ---
+
+def make_load(rng: np.random.Generator) -> Dict[str, Any]:
+    return {
+        "load_id": "bench-load",
+        "origin": {"lat": 19.0760, "lng": 72.8777},
+        "destination": {"lat": 18.5204, "lng": 73.8567},
+        "weight": float(rng.uniform(1, 20)),
+        "goods_type": "General",
+        "destination_city": "Pune",
+    }
+
+
+def make_fleet(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`n` engine driver dicts: a quarter clustered around the load origin, the rest spread out."""
+    rng = np.random.default_rng(seed)
+    near = n // 4
+    lats = np.concatenate([rng.normal(19.0760, 0.5, near), rng.uniform(*LAT_RANGE, n - near)])
+    lngs = np.concatenate([rng.normal(72.8777, 0.5, near), rng.uniform(*LNG_RANGE, n - near)])
+    capacities = rng.uniform(1, 30, n).round(1)
+    ratings = rng.uniform(1, 5, n).round(2)
+    homes = rng.integers(0, len(CITIES) + 1, n)
+    return [
+        {
+            "id": f"D{i}",
+            "location": {"lat": lat, "lng": lng},
+            "capacity": capacity,
+            "rating": rating,
+            "home_city": CITIES[home] if home < len(CITIES) else None,
+        }
+        for i, (lat, lng, capacity, rating, home) in enumerate(zip(
+            lats.tolist(), lngs.tolist(), capacities.tolist(), ratings.tolist(), homes.tolist()
+        ))
+    ]
+
+
+def make_graph(n: int, seed: int = 0) -> CSRGraph:
+    """
+    Road-like graph of about `n` nodes: a jittered grid (right and down
+    neighbours) plus 5% random local shortcuts, with haversine-based lengths
+    and random quality / traffic.
+    """
+    rng = np.random.default_rng(seed)
+    side = int(math.ceil(math.sqrt(n)))
+    n = side * side
+    rows, cols = np.divmod(np.arange(n), side)
+    step_lat = (LAT_RANGE[1] - LAT_RANGE[0]) / side
+    step_lng = (LNG_RANGE[1] - LNG_RANGE[0]) / side
+    lats = LAT_RANGE[0] + (rows + rng.uniform(-0.3, 0.3, n)) * step_lat
+    lngs = LNG_RANGE[0] + (cols + rng.uniform(-0.3, 0.3, n)) * step_lng
+
+    ids = np.arange(n)
+    right = ids[cols < side - 1]
+    down = ids[rows < side - 1]
+    extra = rng.integers(0, n, n // 20)
+    extra_to = np.clip(extra + rng.integers(-2, 3, len(extra)) * side + rng.integers(-2, 3, len(extra)), 0, n - 1)
+    sources = np.concatenate([right, down, extra])
+    targets = np.concatenate([right + 1, down + side, extra_to])
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+
+    lat1, lng1, lat2, lng2 = map(np.radians, (lats[sources], lngs[sources], lats[targets], lngs[targets]))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    distance = 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)) * 1.2  # roads are not straight
+
+    return CSRGraph.from_edges(
+        [f"n{i}" for i in range(n)], lats, lngs, sources, targets, distance,
+        rng.uniform(3, 10, len(sources)), rng.uniform(1, 10, len(sources)),
+        RouteOptimizer._edge_costs
+    )
+
+
+# --- Timing ---
+
+def measure(fn: Callable[[int], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Calls fn(i) `repeat` times after `warmup` calls; returns timings in ms."""
+    for i in range(warmup):
+        fn(i)
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(times[0], 4),
+        "median_ms": round(statistics.median(times), 4),
+        "p95_ms": round(times[min(len(times) - 1, int(0.95 * len(times)))], 4),
+    }
+
+
+class Suite:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: List[Dict[str, Any]] = []
+
+    def run(self, name: str, size: int, fn: Callable[[int], Any], repeat: Optional[int] = None,
+            **extra) -> Dict[str, Any]:
+        result = {"name": name, "size": size, **measure(fn, repeat or self.repeat), **extra}
+        self.results.append(result)
+        print(f"{name:<32} {size:>9}  median {result['median_ms']:>10.3f} ms  p95 {result['p95_ms']:>10.3f} ms",
+              flush=True)
+        return result
+
+
+# --- Benchmarks ---
+
+def bench_matching(suite: Suite, sizes: List[int]):
+    engine = MatchingEngine()
+    load = make_load(np.random.default_rng(1))
+    for n in sizes:
+        fleet = make_fleet(n, seed=n)
+        repeat = max(3, min(suite.repeat, 2000000 // n))
+        if n <= SCALAR_FLEET_LIMIT:
+            suite.run("matching.match_driver_to_load", n,
+                      lambda i: engine.match_driver_to_load(load, fleet, top_k=10), repeat=repeat)
+        batch = DriverBatch.from_dicts(fleet)
+        suite.run("matching.batch_from_dicts", n, lambda i: DriverBatch.from_dicts(fleet), repeat=repeat)
+        suite.run("matching.match_driver_batch", n,
+                  lambda i: engine.match_driver_batch(load, batch, top_k=10), repeat=repeat)
+
+
+def bench_routing(suite: Suite, sizes: List[int], landmarks: int):
+    for n in sizes:
+        t0 = time.perf_counter()
+        graph = make_graph(n, seed=n)
+        build_s = time.perf_counter() - t0
+        # No caching: every call searches
+        optimizer = RouteOptimizer(graph, cache=RouteCache(maxsize=0))
+        rng = np.random.default_rng(n)
+        pairs = [(graph.name(int(a)), graph.name(int(b)))
+                 for a, b in rng.integers(0, graph.num_nodes, (suite.repeat + 1, 2))]
+        repeat = max(3, min(suite.repeat, 2000000 // graph.num_nodes))
+
+        def route(algorithm):
+            expanded = []
+            def call(i):
+                res = optimizer.calculate_optimal_route(*pairs[i % len(pairs)], algorithm=algorithm)
+                expanded.append(res.get("nodes_expanded", 0))
+            return call, expanded
+
+        call, expanded = route("astar")
+        result = suite.run("routing.astar", graph.num_nodes, call, repeat=repeat, graph_build_s=round(build_s, 3))
+        result["mean_nodes_expanded"] = round(statistics.mean(expanded), 1)
+
+        if landmarks and n <= LANDMARK_GRAPH_LIMIT:
+            t0 = time.perf_counter()
+            optimizer.build_landmarks(landmarks)
+            landmark_s = time.perf_counter() - t0
+            call, expanded = route("alt")
+            result = suite.run("routing.alt", graph.num_nodes, call, repeat=repeat,
+                               landmarks=landmarks, landmark_build_s=round(landmark_s, 3))
+            result["mean_nodes_expanded"] = round(statistics.mean(expanded), 1)
+
+        names = [graph.name(int(i)) for i in rng.integers(0, graph.num_nodes, 20)]
+        suite.run("routing.route_matrix_10x10", graph.num_nodes,
+                  lambda i: optimizer.route_matrix(names[:10], names[10:]), repeat=max(3, repeat // 10))
+
+
+def bench_pricing(suite: Suite, sizes: List[int]):
+    engine = PricingEngine()
+    rng = np.random.default_rng(7)
+    suite.run("pricing.quote", 1, lambda i: engine.quote(350.0, 8.0, "Mumbai"), repeat=suite.repeat * 10)
+    for n in sizes:
+        distance = rng.uniform(5, 2000, n)
+        weight = rng.uniform(1, 30, n)
+        cities = [CITIES[c] for c in rng.integers(0, len(CITIES), n).tolist()]
+        suite.run("pricing.quote_batch", n, lambda i: engine.quote_batch(distance, weight, cities),
+                  repeat=max(3, min(suite.repeat, 2000000 // n)))
+
+
+def bench_api(suite: Suite, fleet_sizes: List[int]):
+    from fastapi.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    load = {k: v for k, v in make_load(np.random.default_rng(1)).items() if k != "destination_city"}
+
+    def post(path: str, body: Any, **params):
+        def call(i):
+            r = client.post(path, json=body, params=params)
+            r.raise_for_status()
+        return call
+
+    for n in [s for s in fleet_sizes if s <= 10000]:
+        drivers = [
+            {"driver_id": d["id"], "location": d["location"], "rating": d["rating"], "vehicle_type": "Truck",
+             "is_available": True, "capacity": d["capacity"], "home_city": d["home_city"]}
+            for d in make_fleet(n, seed=n)
+        ]
+        columns = {
+            "ids": [d["driver_id"] for d in drivers],
+            "lats": [d["location"]["lat"] for d in drivers],
+            "lngs": [d["location"]["lng"] for d in drivers],
+            "ratings": [d["rating"] for d in drivers],
+            "capacities": [d["capacity"] for d in drivers],
+        }
+        suite.run("api.match", n, post("/match", {"load": load, "available_drivers": drivers}, limit=10))
+        suite.run("api.match_columnar", n, post("/match-columnar", {"load": load, "drivers": columns}, limit=10))
+
+    suite.run("api.optimize_route", 5, post("/optimize-route", {"start": "Mumbai", "end": "Surat"}),
+              repeat=suite.repeat * 10)
+    suite.run("api.predict_price", 1, post("/predict-price", {"distance_km": 350, "weight": 8,
+                                                             "vehicle_type": "Truck", "origin_city": "Mumbai"}),
+              repeat=suite.repeat * 10)
+    rng = np.random.default_rng(3)
+    quotes = {
+        "distance_km": rng.uniform(5, 2000, 10000).tolist(),
+        "weight": rng.uniform(1, 30, 10000).tolist(),
+        "origin_city": [CITIES[c] for c in rng.integers(0, len(CITIES), 10000).tolist()],
+    }
+    suite.run("api.predict_price_batch", 10000, post("/predict-price-batch", quotes))
+
+
+# --- Reporting ---
+
+def metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Benchmarks whose median grew by more than `threshold` (fraction) between runs."""
+    before = {(r["name"], r["size"]): r for r in old["results"]}
+    regressions = []
+    print(f"\nvs {old['meta'].get('commit')} ({old['meta'].get('timestamp')})")
+    for r in new["results"]:
+        prev = before.get((r["name"], r["size"]))
+        if prev is None or prev["median_ms"] <= 0:
+            continue
+        ratio = r["median_ms"] / prev["median_ms"]
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{r['name']:<32} {r['size']:>9}  {prev['median_ms']:>10.3f} -> {r['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+        if flag:
+            regressions.append({"name": r["name"], "size": r["size"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Matching / routing / pricing / API benchmarks")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--only", nargs="+", choices=["matching", "routing", "pricing", "api"],
+                        help="run a subset of the suites")
+    parser.add_argument("--fleet-sizes", type=int, nargs="+")
+    parser.add_argument("--graph-sizes", type=int, nargs="+")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--landmarks", type=int, default=8, help="ALT landmarks (0 = skip ALT)")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed median slowdown (fraction)")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else FULL_SIZES
+    fleet_sizes = args.fleet_sizes or sizes["fleet"]
+    graph_sizes = args.graph_sizes or sizes["graph"]
+    only = set(args.only or ["matching", "routing", "pricing", "api"])
+
+    suite = Suite(args.repeat)
+    if "matching" in only:
+        bench_matching(suite, fleet_sizes)
+    if "routing" in only:
+        bench_routing(suite, graph_sizes, args.landmarks)
+    if "pricing" in only:
+        bench_pricing(suite, fleet_sizes)
+    if "api" in only:
+        bench_api(suite, fleet_sizes)
+
+    report = {"meta": metadata(), "results": suite.results}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(suite.results)} results to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,227 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from geo import GridIndex
+from matching import DriverBatch, MatchingEngine
+
+# (-rounded score, distance_km, driver id): best first, ties nearest first
+# like /match over registry candidates, then by id for a total order
+Key = Tuple[float, float, str]
+
+
+class _Standing:
+    """
+    Best-first keys of one load's best eligible drivers (at most `depth`),
+    plus each member's key. `truncated` is set when some eligible driver
+    is left out; all of those rank below every member.
+    """
+    __slots__ = ("entries", "keys", "truncated")
+
+    def __init__(self):
+        self.entries: List[Key] = []
+        self.keys: Dict[str, Key] = {}
+        self.truncated = False
+
+    def discard(self, driver_id: str) -> Optional[Key]:
+        key = self.keys.pop(driver_id, None)
+        if key is not None:
+            del self.entries[bisect.bisect_left(self.entries, key)]
+        return key
+
+    def offer(self, key: Key, depth: int) -> Optional[str]:
+        """
+        Inserts `key` where it is known to belong; returns the driver id left
+        out (`key`'s own when it cannot be placed), if any.
+        """
+        if self.truncated and (not self.entries or key > self.entries[-1]):
+            return key[2]  # may rank below drivers that are not listed
+        bisect.insort(self.entries, key)
+        self.keys[key[2]] = key
+        if len(self.entries) > depth:
+            dropped = self.entries.pop()
+            del self.keys[dropped[2]]
+            self.truncated = True
+            return dropped[2]
+        return None
+
+
+class ContinuousMatcher:
+    """
+    Standing top-k candidate lists for open loads, kept current from driver
+    events instead of rescoring the fleet per request.
+
+    A load is scored once against the available drivers within `radius_km`
+    of its origin when it is opened. After that a driver update (position,
+    availability, rating...) rescores that driver against the loads near
+    its old and new positions only. Each load keeps its best `depth`
+    (default 2 * top_k) drivers, so members can leave or get worse without
+    losing the top-k; the load's whole neighbourhood is rescored only once
+    fewer than `top_k` known-best drivers remain. Scores and tie order are
+    the MatchingEngine's, so `top()` equals what /match returns for the
+    same radius.
+    """
+    def __init__(self, engine: MatchingEngine, top_k: int = 20, radius_km: float = 100.0,
+                 depth: Optional[int] = None, cell_deg: float = 0.1):
+        self.engine = engine
+        self.top_k = top_k
+        self.depth = max(depth if depth is not None else 2 * top_k, top_k)
+        self.radius_km = radius_km
+        self.loads: Dict[str, Dict[str, Any]] = {}
+        self.load_index = GridIndex(cell_deg)  # load origins
+        self.drivers: Dict[str, Dict[str, Any]] = {}
+        self.driver_index = GridIndex(cell_deg)  # available drivers
+        self._standing: Dict[str, _Standing] = {}
+        self._member_of: Dict[str, Set[str]] = {}  # driver id -> loads listing it
+        self._lock = threading.Lock()
+        self.pairs_scored = 0
+        self.rescans = 0
+
+    def __len__(self):
+        return len(self.loads)
+
+    # --- Loads ---
+
+    def open_loads(self, loads: List[Dict[str, Any]]):
+        """Adds or replaces loads (dicts as `MatchingEngine` consumes, keyed by "load_id")."""
+        with self._lock:
+            for load in loads:
+                load_id = load["load_id"]
+                self._close(load_id)
+                origin = load["origin"]
+                self.loads[load_id] = load
+                self.load_index.insert(load_id, origin["lat"], origin["lng"])
+                self._rescan(load_id)
+
+    def close_load(self, load_id: str) -> bool:
+        with self._lock:
+            return self._close(load_id)
+
+    def _close(self, load_id: str) -> bool:
+        if self.loads.pop(load_id, None) is None:
+            return False
+        self.load_index.remove(load_id)
+        for driver_id in self._standing.pop(load_id).keys:
+            self._unlink(driver_id, load_id)
+        return True
+
+    # --- Drivers ---
+
+    def upsert_drivers(self, drivers: List[Dict[str, Any]]):
+        """Applies driver updates (same dicts as DriverRegistry.upsert) in order."""
+        with self._lock:
+            for driver in drivers:
+                self._update(driver["id"], driver)
+
+    def remove_driver(self, driver_id: str) -> bool:
+        with self._lock:
+            if driver_id not in self.drivers:
+                return False
+            self._update(driver_id, None)
+            return True
+
+    def _update(self, driver_id: str, driver: Optional[Dict[str, Any]]):
+        if driver is None:
+            self.drivers.pop(driver_id, None)
+            self.driver_index.remove(driver_id)
+        else:
+            self.drivers[driver_id] = driver
+            loc = driver["location"]
+            if driver.get("is_available", True):
+                self.driver_index.insert(driver_id, loc["lat"], loc["lng"])
+            else:
+                self.driver_index.remove(driver_id)
+
+        # Loads that list the driver now, plus loads it may enter from its new position
+        affected = set(self._member_of.get(driver_id, ()))
+        near: Dict[str, float] = {}
+        if driver_id in self.driver_index:
+            loc = driver["location"]
+            near = {load_id: d for d, load_id in self.load_index.within(loc["lat"], loc["lng"], self.radius_km)}
+            affected.update(near)
+        if not affected:
+            return
+
+        keys = self._keys(driver, [lid for lid in affected if lid in near]) if near else {}
+        for load_id in affected:
+            standing = self._standing[load_id]
+            if standing.discard(driver_id) is not None:
+                self._unlink(driver_id, load_id)
+            new = keys.get(load_id)
+            if new is not None:
+                self._offer(load_id, standing, new)
+            if standing.truncated and len(standing.entries) < self.top_k:
+                self._rescan(load_id)
+
+    # --- Scoring ---
+
+    def _keys(self, driver: Dict[str, Any], load_ids: List[str]) -> Dict[str, Key]:
+        """Keys of one driver against a few loads (scalar path: cheaper than a 1-row batch)."""
+        keys = {}
+        for load_id in load_ids:
+            match = self.engine.match_driver_to_load(self.loads[load_id], [driver])[0]
+            keys[load_id] = (-match["total_score"], match["details"]["distance_km"], driver["id"])
+        self.pairs_scored += len(load_ids)
+        return keys
+
+    def _rescan(self, load_id: str):
+        """Rebuilds a load's top-k from every available driver within the radius."""
+        load = self.loads[load_id]
+        old = self._standing.get(load_id)
+        if old is not None:
+            for driver_id in old.keys:
+                self._unlink(driver_id, load_id)
+        standing = self._standing[load_id] = _Standing()
+        self.rescans += 1
+
+        origin = load["origin"]
+        ids = [driver_id for _, driver_id in self.driver_index.within(origin["lat"], origin["lng"], self.radius_km)]
+        if not ids:
+            return
+        batch = DriverBatch.from_dicts([self.drivers[driver_id] for driver_id in ids]).without_records()
+        score, distance, _ = self.engine.score_batch(load, batch)
+        self.pairs_scored += len(ids)
+        keys = sorted(zip([-round(x, 2) for x in score.tolist()], distance.tolist(), ids))
+        standing.truncated = len(keys) > self.depth
+        keys = keys[:self.depth]
+        standing.entries = keys
+        standing.keys = {key[2]: key for key in keys}
+        for key in keys:
+            self._member_of.setdefault(key[2], set()).add(load_id)
+
+    def _offer(self, load_id: str, standing: _Standing, key: Key):
+        dropped = standing.offer(key, self.depth)
+        if dropped != key[2]:
+            self._member_of.setdefault(key[2], set()).add(load_id)
+        if dropped is not None and dropped != key[2]:
+            self._unlink(dropped, load_id)
+
+    def _unlink(self, driver_id: str, load_id: str):
+        loads = self._member_of.get(driver_id)
+        if loads is not None:
+            loads.discard(load_id)
+            if not loads:
+                del self._member_of[driver_id]
+
+    # --- Reads ---
+
+    def top(self, load_id: str, k: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """The load's best candidates (at most `k`, default top_k), best first; None for an unknown load."""
+        standing = self._standing.get(load_id)
+        if standing is None:
+            return None
+        entries = standing.entries[:min(k, self.top_k) if k is not None else self.top_k]
+        return [{"driver_id": driver_id, "score": -neg, "distance_km": distance}
+                for neg, distance, driver_id in entries]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open_loads": len(self.loads),
+            "drivers": len(self.drivers),
+            "available": len(self.driver_index),
+            "top_k": self.top_k,
+            "depth": self.depth,
+            "radius_km": self.radius_km,
+            "pairs_scored": self.pairs_scored,
+            "rescans": self.rescans,
+        }
@@ -0,0 +1,18 @@
+import os
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# SQL database holding the AI tables in models.py (pricing rules, demand
+# metrics, match logs). Separate from the platform's MongoDB DATABASE_URL.
+AI_DATABASE_URL = os.environ.get("AI_DATABASE_URL")
+
+
+def make_session_factory(url: Optional[str] = None) -> Optional[sessionmaker]:
+    """Session factory for `url` (default AI_DATABASE_URL); None when no database is configured."""
+    url = url or AI_DATABASE_URL
+    if not url:
+        return None
+    engine = create_engine(url, pool_pre_ping=True)
+    return sessionmaker(bind=engine)
@@ -0,0 +1,210 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import insert
+
+from geo import geohash_code, geohash_codes, geohash_string
+from models import DemandMetric
+
+logger = logging.getLogger(__name__)
+
+LOAD_CREATED = 0       # demand
+DRIVER_AVAILABLE = 1   # supply
+EVENT_KINDS = {"load_created": LOAD_CREATED, "driver_available": DRIVER_AVAILABLE}
+
+# surge = 1 + SURGE_SENSITIVITY * ((demand + 1) / (supply + 1) - 1), clipped to
+# [1, MAX_SURGE]; cells with fewer than MIN_DEMAND loads in the window stay at 1.
+SURGE_SENSITIVITY = 0.25
+MAX_SURGE = 2.0
+MIN_DEMAND = 3
+
+
+def surge_from_counts(demand, supply) -> np.ndarray:
+    demand = np.asarray(demand, dtype=np.float64)
+    supply = np.asarray(supply, dtype=np.float64)
+    ratio = (demand + 1) / (supply + 1)
+    surge = np.clip(1 + SURGE_SENSITIVITY * (ratio - 1), 1.0, MAX_SURGE)
+    return np.where(demand >= MIN_DEMAND, surge, 1.0)
+
+
+class DemandAggregator:
+    """
+    Sliding-window load (demand) / driver (supply) counts per geohash cell.
+    Each cell has a ring of `window_s / bucket_s` time buckets stored in one
+    int32 array; a bucket is zeroed lazily when its slot is reused for a newer
+    time bucket, so recording an event is O(1) and memory is fixed per cell.
+    Each cell's surge is cached on every event and recomputed for all cells
+    once per bucket (to age out old events), so `surge_at` is a dict lookup.
+    Snapshots are bulk-inserted into `DemandMetric` every `flush_s`.
+    Events stamped outside the window (or more than one bucket ahead of the
+    clock) are rejected and counted, so a skewed or millisecond timestamp
+    cannot claim a slot ahead of time; events up to one bucket ahead (small
+    clock skew) are counted in the current bucket, since the next bucket's
+    slot still holds the oldest live bucket of the window.
+    """
+    def __init__(self, precision: int = 5, window_s: float = 900.0, bucket_s: float = 60.0,
+                 session_factory=None, flush_s: float = 60.0):
+        self.precision = precision
+        self.bucket_s = bucket_s
+        self.slots = max(1, int(round(window_s / bucket_s)))
+        self.session_factory = session_factory
+        self.flush_s = flush_s
+
+        self._rows: Dict[int, int] = {}  # geohash code -> row
+        self._codes = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros((0, self.slots, 2), dtype=np.int32)
+        self._slot_bucket = np.zeros((0, self.slots), dtype=np.int64)
+        self._surge = np.ones(0)
+        self._lock = threading.Lock()
+
+        self.events = 0
+        self.rejected = 0  # stale or future-stamped events
+        self.flushed_rows = 0
+        self.flush_errors = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _row(self, code: int) -> int:
+        row = self._rows.get(code)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._codes):
+                grow = max(64, 2 * len(self._codes))
+                self._codes = np.resize(self._codes, grow)
+                self._counts = np.concatenate([self._counts, np.zeros((grow - row, self.slots, 2), np.int32)])
+                self._slot_bucket = np.concatenate([self._slot_bucket, np.full((grow - row, self.slots), -1, np.int64)])
+                self._surge = np.concatenate([self._surge, np.ones(grow - row)])
+            self._codes[row] = code
+            self._rows[code] = row
+        return row
+
+    def _window(self, rows, bucket: int) -> np.ndarray:
+        """(demand, supply) totals over the live buckets of `rows`."""
+        live = self._slot_bucket[rows] > bucket - self.slots
+        return (self._counts[rows] * live[..., None]).sum(axis=-2)
+
+    def record_many(self, kind: int, lats, lngs, at: Optional[float] = None) -> int:
+        """Counts one event of `kind` at each (lat, lng); returns how many were recorded."""
+        n = len(lats)
+        now_bucket = int(time.time() // self.bucket_s)
+        bucket = int(at // self.bucket_s) if at is not None else now_bucket
+        if not now_bucket - self.slots < bucket <= now_bucket + 1:
+            with self._lock:
+                self.rejected += n
+            return 0
+        bucket = min(bucket, now_bucket)
+
+        codes, counts = np.unique(geohash_codes(lats, lngs, self.precision), return_counts=True)
+        slot = bucket % self.slots
+        recorded = 0
+        with self._lock:
+            for code, count in zip(codes.tolist(), counts.tolist()):
+                row = self._row(code)
+                if self._slot_bucket[row, slot] != bucket:
+                    if self._slot_bucket[row, slot] > bucket:
+                        continue  # slot already holds a newer bucket: older than the window
+                    self._counts[row, slot] = 0
+                    self._slot_bucket[row, slot] = bucket
+                self._counts[row, slot, kind] += count
+                recorded += count
+                demand, supply = self._window(row, bucket)
+                self._surge[row] = surge_from_counts(demand, supply)
+            self.events += recorded
+            self.rejected += n - recorded
+        return recorded
+
+    def record(self, kind: int, lat: float, lng: float, at: Optional[float] = None) -> bool:
+        return self.record_many(kind, [lat], [lng], at) > 0
+
+    def surge_at(self, lat: float, lng: float) -> float:
+        row = self._rows.get(geohash_code(lat, lng, self.precision))
+        return float(self._surge[row]) if row is not None else 1.0
+
+    def surge_many(self, lats, lngs) -> np.ndarray:
+        codes = geohash_codes(lats, lngs, self.precision)
+        uniq, inverse = np.unique(codes, return_inverse=True)
+        rows = [self._rows.get(c) for c in uniq.tolist()]
+        surge = self._surge  # read after the rows: arrays grow before a row is published
+        values = np.array([surge[row] if row is not None else 1.0 for row in rows])
+        return values[inverse.reshape(-1)]
+
+    def refresh(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Recomputes every cell's surge; returns the cells with events in the window."""
+        bucket = int((now if now is not None else time.time()) // self.bucket_s)
+        with self._lock:
+            n = len(self._rows)
+            totals = self._window(slice(0, n), bucket)
+            self._surge[:n] = surge_from_counts(totals[:, 0], totals[:, 1])
+            active = np.flatnonzero(totals.sum(axis=1))
+            return [
+                {
+                    "location_geohash": geohash_string(code, self.precision),
+                    "demand_count": demand,
+                    "supply_count": supply,
+                    "surge_multiplier": surge,
+                }
+                for code, (demand, supply), surge in zip(
+                    self._codes[active].tolist(), totals[active].tolist(), self._surge[active].tolist()
+                )
+            ]
+
+    def flush(self) -> int:
+        """Writes a snapshot of every active cell to DemandMetric in one insert."""
+        rows = self.refresh()
+        if self.session_factory is None or not rows:
+            return 0
+        timestamp = datetime.utcnow()
+        for row in rows:
+            row["timestamp"] = timestamp
+        try:
+            with self.session_factory() as session:
+                session.execute(insert(DemandMetric), rows)
+                session.commit()
+        except Exception as e:
+            self.flush_errors += 1
+            logger.warning("Demand snapshot flush failed (%d cells dropped): %s", len(rows), e)
+            return 0
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    def start(self):
+        """Keeps surges aged and flushes snapshots from a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="demand-aggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.flush()
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        while not self._stop.wait(min(self.bucket_s, self.flush_s)):
+            if time.monotonic() - last_flush >= self.flush_s:
+                self.flush()
+                last_flush = time.monotonic()
+            else:
+                self.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cells": len(self._rows),
+            "precision": self.precision,
+            "window_s": self.slots * self.bucket_s,
+            "events": self.events,
+            "rejected": self.rejected,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+        }
@@ -0,0 +1,391 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from geo import haversine_km_many
+from matching import DriverBatch, MatchingEngine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MAGIC = b"MVXDRV01"
+HEADER_BYTES = 64
+CITY_DTYPE = np.dtype("S32")
+ID_BYTES = 40
+DRIVER_DTYPE = np.dtype([
+    ("id", f"S{ID_BYTES}"),
+    ("lat", "<f8"),
+    ("lng", "<f8"),
+    ("capacity", "<f8"),
+    ("rating", "<f8"),
+    ("home_city", "<i4"),   # index into the city table, -1 = none
+    ("available", "<i4"),   # AVAILABLE / BUSY / REMOVED
+    ("version", "<u8"),     # store sequence number of the row's last write
+])
+
+AVAILABLE = 1
+BUSY = 0
+REMOVED = -1
+
+# Optimistic read attempts before a reader falls back to the writer lock
+READ_RETRIES = 8
+
+
+class _IdColumn:
+    """Driver ids decoded on access, so a snapshot never copies the id column."""
+    def __init__(self, raw: np.ndarray):
+        self.raw = raw
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, i):
+        return self.raw[i].decode()
+
+
+class SharedDriverStore:
+    """
+    Fleet state in a memory-mapped file (put it on /dev/shm), shared by every
+    API worker process and engine worker that opens the same path.
+
+    Layout: a header (sequence number, row count), a table of home city
+    names and a fixed-capacity numpy structured array of drivers
+    (DRIVER_DTYPE). A driver keeps its row for the life of the file, so
+    each process caches id -> row and only scans rows appended since.
+
+    Writers serialize on a file lock and follow a seqlock protocol: the
+    sequence number is odd while rows are being written and even again
+    afterwards. Readers work directly on the mapped arrays (no copy), then
+    check the sequence number is even and unchanged; otherwise they redo the
+    read, and after READ_RETRIES attempts take the writer lock instead.
+    Same interface as DriverRegistry for upserts, removal and candidates.
+    """
+    def __init__(self, path: str, capacity: int = 100000, max_cities: int = 1024, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._thread_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._lock_file = open(path if readonly else self._create(path, capacity, max_cities), "rb")
+
+        raw = np.memmap(path, dtype=np.uint8, mode="r" if readonly else "r+")
+        header = raw[:HEADER_BYTES]
+        if header[:8].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a driver store")
+        fields = header[8:48].view("<u8")
+        self._seq = fields[0:1]
+        self._count = fields[1:2]
+        self.capacity = int(fields[2])
+        self._num_cities = fields[3:4]
+        self.max_cities = int(fields[4])
+
+        cities_end = HEADER_BYTES + self.max_cities * CITY_DTYPE.itemsize
+        self._city_table = raw[HEADER_BYTES:cities_end].view(CITY_DTYPE)
+        self._rows = raw[cities_end:cities_end + self.capacity * DRIVER_DTYPE.itemsize].view(DRIVER_DTYPE)
+        self._raw = raw
+
+        # Per-process caches, extended from the shared tables by _sync()
+        self._slots: Dict[str, int] = {}
+        self._cities: List[str] = []
+        self._city_codes: Dict[str, int] = {}
+
+        self.read_retries = 0
+        self.locked_reads = 0
+
+    @staticmethod
+    def _create(path: str, capacity: int, max_cities: int) -> str:
+        """Creates and formats the file unless another process already did."""
+        size = HEADER_BYTES + max_cities * CITY_DTYPE.itemsize + capacity * DRIVER_DTYPE.itemsize
+        with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), "r+b") as f:
+            with _file_lock(f):
+                f.seek(0)
+                if f.read(8) == MAGIC:
+                    return path
+                f.truncate(size)
+                f.seek(8)
+                f.write(np.array([0, 0, capacity, 0, max_cities], dtype="<u8").tobytes())
+                f.flush()
+                f.seek(0)
+                f.write(MAGIC)  # last: marks the file as formatted
+        return path
+
+    def close(self):
+        self._lock_file.close()
+
+    # --- Locking ---
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock, _file_lock(self._lock_file):
+            yield
+
+    @contextmanager
+    def _writing(self):
+        """Writer lock plus the odd/even sequence bump around the writes."""
+        if self.readonly:
+            raise PermissionError("Driver store opened read-only")
+        with self._locked():
+            self._seq[0] += 1
+            try:
+                yield int(self._seq[0]) + 1
+            finally:
+                self._seq[0] += 1
+
+    def read(self, fn: Callable[[], Any]) -> Any:
+        """Runs `fn` (which reads the shared arrays) on a consistent snapshot."""
+        for _ in range(READ_RETRIES):
+            start = int(self._seq[0])
+            if start & 1:
+                time.sleep(0)
+                continue
+            result = fn()
+            if int(self._seq[0]) == start:
+                return result
+            self.read_retries += 1
+        self.locked_reads += 1
+        with self._locked():
+            return fn()
+
+    def _sync(self):
+        """Picks up rows and cities appended by other processes."""
+        with self._sync_lock:
+            count = int(self._count[0])
+            known = len(self._slots)
+            if count > known:
+                for slot, raw_id in enumerate(self._rows["id"][known:count].tolist(), start=known):
+                    self._slots[raw_id.decode()] = slot
+            num_cities = int(self._num_cities[0])
+            for code in range(len(self._cities), num_cities):
+                name = self._city_table[code].decode()
+                self._cities.append(name)
+                self._city_codes[name.lower()] = code
+
+    # --- Writes ---
+
+    def _city_code(self, name: Optional[str]) -> int:
+        """Code of a home city, added to the shared table if new (writer lock held)."""
+        if not name:
+            return -1
+        key = name.lower()
+        code = self._city_codes.get(key)
+        if code is None:
+            code = len(self._cities)
+            if code >= self.max_cities:
+                raise ValueError(f"Driver store city table is full ({self.max_cities})")
+            encoded = name.encode()
+            if len(encoded) > CITY_DTYPE.itemsize:
+                raise ValueError(f"City name too long: {name!r}")
+            self._city_table[code] = encoded
+            self._cities.append(name)
+            self._city_codes[key] = code
+            self._num_cities[0] = code + 1
+        return code
+
+    def upsert(self, driver: Dict[str, Any]):
+        self.upsert_many([driver])
+
+    def upsert_many(self, drivers: List[Dict[str, Any]]):
+        """Adds or replaces driver records (the dicts DriverRegistry takes), in one write."""
+        if self.readonly:
+            raise PermissionError("Driver store opened read-only")
+        if not drivers:
+            return
+        ids = [str(d["id"]) for d in drivers]
+        encoded = [i.encode() for i in ids]
+        for raw_id in encoded:
+            if len(raw_id) > ID_BYTES:
+                raise ValueError(f"Driver id longer than {ID_BYTES} bytes: {raw_id!r}")
+
+        with self._locked():
+            self._sync()
+            count = int(self._count[0])
+            new_ids = list(dict.fromkeys(i for i in ids if i not in self._slots))
+            if count + len(new_ids) > self.capacity:
+                raise ValueError(f"Driver store is full ({self.capacity} drivers)")
+            # Cities first: a full city table must fail before any row is claimed
+            codes = np.array([self._city_code(d.get("home_city")) for d in drivers], dtype=np.int32)
+            for i in new_ids:
+                self._slots[i] = count
+                count += 1
+
+            slots = np.array([self._slots[i] for i in ids], dtype=np.int64)
+            available = np.array([AVAILABLE if d.get("is_available", True) else BUSY for d in drivers], dtype=np.int32)
+            lats = np.array([d["location"]["lat"] for d in drivers], dtype=np.float64)
+            lngs = np.array([d["location"]["lng"] for d in drivers], dtype=np.float64)
+            capacities = np.array([d.get("capacity", 0) for d in drivers], dtype=np.float64)
+            ratings = np.array([d.get("rating", 0) for d in drivers], dtype=np.float64)
+
+            # The writer lock is already held; take the seqlock section only
+            self._seq[0] += 1
+            try:
+                rows = self._rows
+                rows["id"][slots] = encoded
+                rows["lat"][slots] = lats
+                rows["lng"][slots] = lngs
+                rows["capacity"][slots] = capacities
+                rows["rating"][slots] = ratings
+                rows["home_city"][slots] = codes
+                rows["available"][slots] = available
+                rows["version"][slots] = int(self._seq[0]) + 1
+                self._count[0] = count
+            finally:
+                self._seq[0] += 1
+
+    def remove(self, driver_id: str) -> bool:
+        self._sync()
+        slot = self._slots.get(driver_id)
+        if slot is None:
+            return False
+        with self._writing() as version:
+            if self._rows["available"][slot] == REMOVED:
+                return False
+            self._rows["available"][slot] = REMOVED
+            self._rows["version"][slot] = version
+        return True
+
+    # --- Reads ---
+
+    def __len__(self):
+        return self.read(lambda: int(np.count_nonzero(self._rows["available"][:int(self._count[0])] != REMOVED)))
+
+    @property
+    def available_count(self) -> int:
+        return self.read(lambda: int(np.count_nonzero(self._rows["available"][:int(self._count[0])] == AVAILABLE)))
+
+    @property
+    def rows(self) -> int:
+        """Rows in use, including removed drivers (what a full scan scores)."""
+        return int(self._count[0])
+
+    @property
+    def seq(self) -> int:
+        return int(self._seq[0])
+
+    def _record(self, slot: int, row) -> Dict[str, Any]:
+        code = int(row["home_city"])
+        return {
+            "id": row["id"].decode(),
+            "location": {"lat": float(row["lat"]), "lng": float(row["lng"])},
+            "capacity": float(row["capacity"]),
+            "rating": float(row["rating"]),
+            "home_city": self._cities[code] if code >= 0 else None,
+            "is_available": bool(row["available"] == AVAILABLE),
+        }
+
+    def get(self, driver_id: str) -> Optional[Dict[str, Any]]:
+        self._sync()
+        slot = self._slots.get(driver_id)
+        if slot is None:
+            return None
+        row = self.read(lambda: self._rows[slot].copy())
+        self._sync()  # the row may name a city added since
+        return self._record(slot, row) if row["available"] != REMOVED else None
+
+    def view(self):
+        """
+        (DriverBatch, availability) over every row, as views of the shared
+        arrays; only valid inside `read`.
+        """
+        self._sync()
+        rows = self._rows[:int(self._count[0])]
+        batch = DriverBatch(_IdColumn(rows["id"]), rows["lat"], rows["lng"], rows["capacity"], rows["rating"],
+                            rows["home_city"], [name.lower() for name in self._cities])
+        return batch, rows["available"]
+
+    def _nearby(self, lat: float, lng: float, distance: np.ndarray, available: np.ndarray,
+                radius_km: Optional[float], k: Optional[int]) -> np.ndarray:
+        """
+        Mask of the available drivers within `radius_km` and/or among the `k`
+        nearest (equal distances taken by id, like GridIndex.nearest).
+        """
+        eligible = available == AVAILABLE
+        if radius_km is not None:
+            eligible &= distance <= radius_km
+        if k is not None:
+            n = int(np.count_nonzero(eligible))
+            if k < n:
+                masked = np.where(eligible, distance, np.inf)
+                kth = np.partition(masked, k - 1)[k - 1]
+                nearest = masked < kth
+                ties = np.flatnonzero(masked == kth)
+                ids = self._rows["id"][:len(masked)]
+                nearest[ties[np.argsort(ids[ties], kind="stable")][:k - int(np.count_nonzero(nearest))]] = True
+                eligible &= nearest
+        return eligible
+
+    def candidates(self, lat: float, lng: float, radius_km: Optional[float] = None,
+                   k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Available drivers near (lat, lng), nearest first (see DriverRegistry.candidates)."""
+        if radius_km is None and k is None:
+            raise ValueError("candidates() needs radius_km or k")
+
+        def select():
+            batch, available = self.view()
+            distance = haversine_km_many(lat, lng, batch.lats, batch.lngs)
+            slots = np.flatnonzero(self._nearby(lat, lng, distance, available, radius_km, k))
+            slots = slots[np.argsort(distance[slots], kind="stable")]
+            return slots, self._rows[slots].copy()
+
+        slots, rows = self.read(select)
+        self._sync()
+        return [self._record(slot, row) for slot, row in zip(slots.tolist(), rows)]
+
+    def rank(self, engine: MatchingEngine, load_request: Dict[str, Any], top_k: Optional[int] = None,
+             radius_km: Optional[float] = None, nearest: Optional[int] = None):
+        """
+        Scores the available drivers (within `radius_km` / among the `nearest`
+        of the load origin) straight from the shared arrays.
+        Returns (driver ids, score, distance_km, component scores) of the best
+        `top_k`, best first, in the order executor.rank_drivers gives the same
+        drivers from DriverRegistry.candidates (ties nearest first, then by id).
+        """
+        origin = load_request["origin"]
+
+        def ranked():
+            batch, available = self.view()
+            score, distance, components = engine.score_batch(load_request, batch)
+            eligible = self._nearby(origin["lat"], origin["lng"], distance, available, radius_km, nearest)
+            order = engine.rank_scores(score, top_k, eligible, distance=distance, ids=batch.ids.raw)
+            return order, score[order], distance[order], {name: values[order] for name, values in components.items()}
+
+        order, score, distance, components = self.read(ranked)
+        raw_ids = self._rows["id"][order].tolist()  # a row's id never changes
+        return [i.decode() for i in raw_ids], score, distance, components
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "drivers": len(self),
+            "available": self.available_count,
+            "rows": self.rows,
+            "capacity": self.capacity,
+            "cities": int(self._num_cities[0]),
+            "seq": self.seq,
+            "read_retries": self.read_retries,
+            "locked_reads": self.locked_reads,
+        }
+
+
+@contextmanager
+def _file_lock(f):
+    """Exclusive lock on an open file, held across processes."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
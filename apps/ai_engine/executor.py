@@ -0,0 +1,253 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from assignment import solve_assignment
+from driverstore import SharedDriverStore
+from graph import MUTABLE_ARRAYS, CSRGraph
+from landmarks import LandmarkTable
+import profiling
+from matching import DriverBatch, MatchingEngine
+from planner import plan_stops
+from routing import RouteOptimizer
+from traffic import TrafficProfiles
+from shared import attach, to_shared
+
+# Landmark tables are rewritten in place by live updates, like MUTABLE_ARRAYS
+LANDMARK_ARRAYS = ("dist_from", "dist_to")
+
+
+class PoolBusy(Exception):
+    """Too many requests already waiting on the pool (maps to 503)."""
+
+
+class PoolTimeout(Exception):
+    """A task did not finish within its timeout (maps to 504)."""
+
+
+# --- Worker side ---
+# Engines of the current process: the worker's own copies in a pool process,
+# the API's instances when the pool runs inline.
+_engines: Dict[str, Any] = {}
+_blocks: List[Any] = []  # shared memory blocks kept open by this process
+
+
+def _share_arrays(obj: Any, keys) -> Dict[str, tuple]:
+    """Moves `obj`'s arrays into shared memory in place; returns their handles."""
+    handles = {}
+    for key in keys:
+        block, view, handles[key] = to_shared(np.ascontiguousarray(getattr(obj, key)))
+        setattr(obj, key, view)
+        _blocks.append(block)
+    return handles
+
+
+def _attach_arrays(obj: Any, handles: Dict[str, tuple]):
+    for key, handle in handles.items():
+        block, view = attach(handle)
+        setattr(obj, key, view)
+        _blocks.append(block)
+
+
+def _init_worker(snapshot_dir: Optional[str], graph: Optional[CSRGraph], graph_handles: Dict[str, tuple],
+                 landmark_ids: Optional[np.ndarray], landmark_handles: Dict[str, tuple],
+                 profiles: Optional[TrafficProfiles] = None, driver_store_path: Optional[str] = None):
+    """
+    Loads the engines once per worker. The graph comes from the snapshot when
+    there is one (pages shared with every process) or is sent pickled; edge
+    costs and landmark tables are attached from shared memory, so live
+    updates applied by the API process are seen by every worker. The driver
+    store, when configured, is mapped read-only.
+    """
+    if snapshot_dir:
+        graph = CSRGraph.load_snapshot(snapshot_dir)
+    _attach_arrays(graph, graph_handles)
+
+    optimizer = RouteOptimizer(graph)
+    if profiles is not None:
+        optimizer.profiles = profiles
+    if landmark_ids is not None:
+        optimizer.landmarks = LandmarkTable(landmark_ids, None, None)
+        _attach_arrays(optimizer.landmarks, landmark_handles)
+
+    _engines["route"] = optimizer
+    _engines["match"] = MatchingEngine()
+    if driver_store_path:
+        _engines["drivers"] = SharedDriverStore(driver_store_path, readonly=True)
+
+
+def _warm_up() -> int:
+    # Touch the graph so the first real request does not pay for page faults
+    return _engines["route"].graph.num_edges
+
+
+def compute_route(start_node: str, end_node: str, algorithm: str):
+    return _engines["route"].compute_route(start_node, end_node, algorithm)
+
+
+def compute_routes(pairs: List[tuple], algorithm: str):
+    optimizer = _engines["route"]
+    return [optimizer.compute_route(start, end, algorithm) for start, end in pairs]
+
+
+def time_dependent_route(start_node: str, end_node: str, departure: float):
+    return _engines["route"].time_dependent_route(start_node, end_node, departure)
+
+
+def eta_trees(groups: List[tuple]):
+    """`arrival_times` for each (source id, departure, target ids) group."""
+    optimizer = _engines["route"]
+    return [optimizer.arrival_times(source, targets, departure) for source, departure, targets in groups]
+
+
+def plan_route(start_node: str, stops: List[dict], capacity: Optional[float], return_to_start: bool,
+               departure: Optional[float], time_budget_s: float):
+    return plan_stops(_engines["route"], start_node, stops, capacity=capacity, return_to_start=return_to_start,
+                      departure=departure, time_budget_s=time_budget_s)
+
+
+def matrix_rows(source_ids: List[int], target_ids: List[int]):
+    optimizer = _engines["route"]
+    return [optimizer.one_to_many(s, target_ids) for s in source_ids]
+
+
+def rank_drivers(load_dict: dict, batch: DriverBatch, top_k: Optional[int]):
+    """(order, score, distance_km, component scores) of the best `top_k` drivers, best first."""
+    if len(batch) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), {}
+    order, score, distance, components = _engines["match"].rank_batch(load_dict, batch, top_k=top_k)
+    return order, score[order], distance[order], {name: values[order] for name, values in components.items()}
+
+
+def rank_fleet(load_dict: dict, top_k: Optional[int], radius_km: Optional[float], nearest: Optional[int]):
+    """`rank_drivers` over the shared driver store: (driver ids, score, distance_km, component scores)."""
+    return _engines["drivers"].rank(_engines["match"], load_dict, top_k=top_k, radius_km=radius_km, nearest=nearest)
+
+
+def assign_loads(load_dicts: List[dict], batch: DriverBatch, min_score: Optional[float],
+                 time_budget_s: Optional[float]):
+    """`solve_assignment` plan plus (score, distance_km) of each assigned pair."""
+    scores, distances = _engines["match"].score_matrix(load_dicts, batch)
+    plan = solve_assignment(scores, min_score=min_score, time_budget_s=time_budget_s)
+    pair_values = [(float(scores[row, col]), float(distances[row, col])) for row, col in plan["pairs"]]
+    return plan, pair_values
+
+
+# --- API side ---
+
+class EnginePool:
+    """
+    Runs routing / matching tasks off the event loop.
+    processes > 0: a pre-warmed process pool, so CPU-bound searches scale
+    across cores instead of contending for the GIL. processes == 0 (or
+    before `start`): threads in this process, using the API's own engines.
+    At most `max_pending` tasks are queued or running; beyond that `run`
+    raises PoolBusy instead of letting latency grow without bound.
+    """
+    def __init__(self, route_optimizer: RouteOptimizer, matching_engine: MatchingEngine,
+                 processes: int = 0, max_pending: int = 64, timeout_s: float = 30.0,
+                 driver_store: Optional[SharedDriverStore] = None):
+        self.route_optimizer = route_optimizer
+        self.driver_store = driver_store
+        self.processes = processes
+        self.max_pending = max_pending
+        self.timeout_s = timeout_s
+        self.pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+        _engines["route"] = route_optimizer
+        _engines["match"] = matching_engine
+        if driver_store is not None:
+            _engines["drivers"] = driver_store
+        self._threads = ThreadPoolExecutor(max_pending, thread_name_prefix="engine")
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def workers(self) -> int:
+        """Worker processes running (0 when tasks run on threads)."""
+        return self.processes if self._pool is not None else 0
+
+    @property
+    def executor(self) -> Executor:
+        return self._pool if self._pool is not None else self._threads
+
+    def start(self, snapshot_dir: Optional[str] = None):
+        """Spawns the worker processes and waits until each has loaded its engines."""
+        if self.processes <= 0 or self._pool is not None:
+            return
+        optimizer = self.route_optimizer
+        graph_handles = _share_arrays(optimizer.graph, MUTABLE_ARRAYS)
+        landmark_ids, landmark_handles = None, {}
+        if optimizer.landmarks is not None:
+            landmark_ids = optimizer.landmarks.landmark_ids
+            landmark_handles = _share_arrays(optimizer.landmarks, LANDMARK_ARRAYS)
+
+        self._pool = ProcessPoolExecutor(
+            self.processes,
+            # spawn: workers must not inherit the API's threads and locks
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(snapshot_dir, None if snapshot_dir else optimizer.graph,
+                      graph_handles, landmark_ids, landmark_handles, optimizer.profiles,
+                      self.driver_store.path if self.driver_store is not None else None)
+        )
+        # One warm-up task per worker forces every process to start now
+        try:
+            for f in [self._pool.submit(_warm_up) for _ in range(self.processes)]:
+                f.result()
+        except Exception:
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+            for block in _blocks:
+                block.unlink()
+            _blocks.clear()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, timeout_s: Optional[float] = None):
+        """Runs fn(*args) on the pool; raises PoolBusy / PoolTimeout."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolBusy(f"{self.pending} engine tasks pending")
+
+        # A request being profiled gets the task's profile back with its result
+        capture = profiling.current_capture()
+        if capture is not None:
+            fn, args = profiling.run_profiled, (fn, *args)
+
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(fn, *args)
+        self.pending += 1
+        # Released when the work really ends: a timed-out task that is
+        # already running keeps its slot until it finishes.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future),
+                                            timeout_s if timeout_s is not None else self.timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeout(f"Engine task timed out after {timeout_s or self.timeout_s}s")
+        if capture is not None:
+            result, stats = result
+            capture.add(stats)
+        return result
+
+    def _release(self):
+        self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processes": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
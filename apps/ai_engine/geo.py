@@ -0,0 +1,216 @@
+import math
+import heapq
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = math.pi / 180 * EARTH_RADIUS_KM
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great circle distance in km between two points given in decimal degrees."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon / 2) * math.sin(dlon / 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_km_many(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorized `haversine_km` from one point to many."""
+    dlat = np.radians(lats - lat)
+    dlon = np.radians(lngs - lng)
+    a = (np.sin(dlat / 2) * np.sin(dlat / 2) +
+         math.cos(math.radians(lat)) * np.cos(np.radians(lats)) *
+         np.sin(dlon / 2) * np.sin(dlon / 2))
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _quantize(values, lo: float, hi: float, bits: int) -> np.ndarray:
+    q = np.floor((np.asarray(values, dtype=np.float64) - lo) / (hi - lo) * (1 << bits)).astype(np.int64)
+    return np.clip(q, 0, (1 << bits) - 1)
+
+
+def geohash_codes(lats, lngs, precision: int) -> np.ndarray:
+    """
+    Geohash cells as integers (5 * precision bits, longitude bit first), for
+    scalars or arrays. Same cells as the geohash strings, but cheap to compute
+    in bulk and to use as dict keys.
+    """
+    bits = 5 * precision
+    lng_bits, lat_bits = (bits + 1) // 2, bits // 2
+    lng_q = _quantize(lngs, -180.0, 180.0, lng_bits)
+    lat_q = _quantize(lats, -90.0, 90.0, lat_bits)
+    code = np.zeros_like(lat_q)
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (lng_q >> (lng_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_q >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+    return code
+
+
+def geohash_code(lat: float, lng: float, precision: int) -> int:
+    """Scalar `geohash_codes` in plain Python (no array overhead for single lookups)."""
+    bits = 5 * precision
+    lng_bits, lat_bits = (bits + 1) // 2, bits // 2
+    lng_q = min(max(math.floor((lng + 180.0) / 360.0 * (1 << lng_bits)), 0), (1 << lng_bits) - 1)
+    lat_q = min(max(math.floor((lat + 90.0) / 180.0 * (1 << lat_bits)), 0), (1 << lat_bits) - 1)
+    code = 0
+    for i in range(bits):
+        if i % 2 == 0:
+            bit = (lng_q >> (lng_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_q >> (lat_bits - 1 - i // 2)) & 1
+        code = (code << 1) | bit
+    return code
+
+
+def geohash_string(code: int, precision: int) -> str:
+    return "".join(GEOHASH_BASE32[(code >> (5 * (precision - 1 - i))) & 31] for i in range(precision))
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 5) -> str:
+    return geohash_string(geohash_code(lat, lng, precision), precision)
+
+
+class _Desc:
+    """Heap entry key ordered in reverse, so the max-heap drops the larger key of a distance tie."""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+class GridIndex:
+    """
+    Uniform lat/lng grid for point lookups.
+    Each cell is `cell_deg` degrees square; points are bucketed by cell so a
+    radius or k-nearest query only touches the cells around the query point.
+    """
+    def __init__(self, cell_deg: float = 0.1):
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], Dict[Hashable, Tuple[float, float]]] = {}
+        self.positions: Dict[Hashable, Tuple[int, int]] = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.positions
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def insert(self, key: Hashable, lat: float, lng: float):
+        """Adds or moves `key` to (lat, lng)."""
+        self.remove(key)
+        cell = self._cell(lat, lng)
+        self.cells.setdefault(cell, {})[key] = (lat, lng)
+        self.positions[key] = cell
+
+    def remove(self, key: Hashable) -> bool:
+        cell = self.positions.pop(key, None)
+        if cell is None:
+            return False
+        bucket = self.cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self.cells[cell]
+        return True
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[float, Hashable]]:
+        """All points within `radius_km`, as (distance_km, key) sorted by distance, then key."""
+        lat_span = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.9, abs(lat) + lat_span)))
+        lng_span = lat_span / max(cos_lat, 1e-6)
+
+        ci_min, cj_min = self._cell(lat - lat_span, lng - lng_span)
+        ci_max, cj_max = self._cell(lat + lat_span, lng + lng_span)
+
+        found = []
+        if (ci_max - ci_min + 1) * (cj_max - cj_min + 1) > len(self.cells):
+            # Radius covers more cells than are occupied: walk the occupied ones
+            buckets = [b for (ci, cj), b in self.cells.items()
+                       if ci_min <= ci <= ci_max and cj_min <= cj <= cj_max]
+        else:
+            buckets = [self.cells[(ci, cj)]
+                       for ci in range(ci_min, ci_max + 1)
+                       for cj in range(cj_min, cj_max + 1)
+                       if (ci, cj) in self.cells]
+
+        for bucket in buckets:
+            for key, (p_lat, p_lng) in bucket.items():
+                d = haversine_km(lat, lng, p_lat, p_lng)
+                if d <= radius_km:
+                    found.append((d, key))
+        found.sort()
+        return found
+
+    def nearest(self, lat: float, lng: float, k: int = 1,
+                max_radius_km: Optional[float] = None) -> List[Tuple[float, Hashable]]:
+        """
+        The `k` nearest points as (distance_km, key), nearest first (then by key).
+        Scans rings of cells outward until the k-th best distance is closer than
+        anything an unscanned ring could hold.
+        """
+        if k <= 0 or not self.positions:
+            return []
+
+        qi, qj = self._cell(lat, lng)
+        best: List[Tuple[float, Any]] = []  # max-heap of (-distance, _Desc(key))
+        seen = 0
+        ring = 0
+        while True:
+            for cell in self._ring_cells(qi, qj, ring):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for key, (p_lat, p_lng) in bucket.items():
+                    seen += 1
+                    d = haversine_km(lat, lng, p_lat, p_lng)
+                    if max_radius_km is not None and d > max_radius_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, _Desc(key)))
+                    elif d < -best[0][0] or (d == -best[0][0] and key < best[0][1].key):
+                        heapq.heapreplace(best, (-d, _Desc(key)))
+
+            # Closest possible distance of any point outside the scanned rings
+            reach_deg = ring * self.cell_deg
+            cos_lat = math.cos(math.radians(min(89.9, abs(lat) + reach_deg)))
+            ring_km = reach_deg * KM_PER_DEGREE * cos_lat
+
+            if seen >= len(self.positions):
+                break
+            if len(best) == k and -best[0][0] < ring_km:
+                break
+            if max_radius_km is not None and ring_km > max_radius_km:
+                break
+            ring += 1
+
+        return sorted((-d, desc.key) for d, desc in best)
+
+    def _ring_cells(self, qi: int, qj: int, ring: int):
+        if ring == 0:
+            yield (qi, qj)
+            return
+        for cj in range(qj - ring, qj + ring + 1):
+            yield (qi - ring, cj)
+            yield (qi + ring, cj)
+        for ci in range(qi - ring + 1, qi + ring):
+            yield (ci, qj - ring)
+            yield (ci, qj + ring)
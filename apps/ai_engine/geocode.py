@@ -0,0 +1,270 @@
+import csv
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, KM_PER_DEGREE, haversine_km, haversine_km_many
+
+# Grid resolution bounds; the cell size is picked from the point density
+MIN_CELL_DEG = 0.01
+MAX_CELL_DEG = 0.25
+MAX_CELLS = 1 << 20
+# Bounds below use a flat-earth approximation; the slack keeps every
+# point haversine could rank nearest in the candidate list
+_BOUND_SLACK = 1.02
+# Candidate lists longer than this are scanned with numpy instead of a loop
+_VECTOR_SCAN = 32
+
+
+class ReverseGeocoder:
+    """
+    Nearest-place lookups over a fixed set of points (gazetteer cities or
+    road graph nodes). The bounding box is cut into a grid and every cell
+    keeps the few points that can be nearest to anything inside it,
+    computed once on the cell's first lookup, so a lookup is one cell index
+    plus a haversine per candidate. Points outside the box fall back to a
+    full scan. Building only sorts the points by cell (numpy arrays, no
+    per-point Python objects), so a mapped graph snapshot stays cheap.
+    """
+    def __init__(self, names: Sequence[str], lats, lngs, records: Optional[List[Dict[str, Any]]] = None,
+                 cell_deg: Optional[float] = None):
+        self.names = names if isinstance(names, np.ndarray) else np.asarray([str(n) for n in names], dtype=str)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.records = records
+        # cell -> (point indexes, lats, lngs) of its candidates, filled in on first lookup
+        self._cells: Dict[int, Tuple[Any, Any, Any]] = {}
+        if len(self.names) == 0:
+            self.cell_deg, self.rows, self.cols = 1.0, 0, 0
+            return
+
+        span_lat = float(self.lats.max() - self.lats.min())
+        span_lng = float(self.lngs.max() - self.lngs.min())
+        if cell_deg is None:
+            # About four cells per point keeps candidate lists short
+            cell_deg = math.sqrt(max(span_lat * span_lng, 1e-9) / len(self.names)) / 2
+            cell_deg = min(max(cell_deg, MIN_CELL_DEG), MAX_CELL_DEG)
+        while (span_lat / cell_deg + 3) * (span_lng / cell_deg + 3) > MAX_CELLS:
+            cell_deg *= 1.5
+        self.cell_deg = cell_deg
+        # One empty cell of margin around the points
+        self.lat0 = float(self.lats.min()) - cell_deg
+        self.lng0 = float(self.lngs.min()) - cell_deg
+        self.rows = int(span_lat / cell_deg) + 3
+        self.cols = int(span_lng / cell_deg) + 3
+        self._build()
+
+    @classmethod
+    def from_csv(cls, path: str, cell_deg: Optional[float] = None) -> "ReverseGeocoder":
+        """Loads `name,lat,lng` rows; other columns (state...) are returned with the matches."""
+        names, lats, lngs, records = [], [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                names.append(row["name"])
+                lats.append(float(row["lat"]))
+                lngs.append(float(row["lng"]))
+                records.append({k: v for k, v in row.items() if k not in ("lat", "lng") and v})
+        return cls(names, lats, lngs, records=records, cell_deg=cell_deg)
+
+    @classmethod
+    def from_graph(cls, graph) -> "ReverseGeocoder":
+        """Snaps coordinates to the nodes of a CSRGraph."""
+        return cls(graph.names, graph.lats, graph.lngs)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _cell_bounds(self, ci: int, cj: int) -> Tuple[float, float, float, float]:
+        la0 = self.lat0 + ci * self.cell_deg
+        ln0 = self.lng0 + cj * self.cell_deg
+        return la0, la0 + self.cell_deg, ln0, ln0 + self.cell_deg
+
+    def _build(self):
+        """
+        Buckets the points by cell, CSR style: the points of cell c are
+        `_order[_ptr[c]:_ptr[c + 1]]`. Candidate lists are filled in per cell
+        on first use.
+        """
+        pi = np.clip(((self.lats - self.lat0) // self.cell_deg).astype(np.int64), 0, self.rows - 1)
+        pj = np.clip(((self.lngs - self.lng0) // self.cell_deg).astype(np.int64), 0, self.cols - 1)
+        flat = pi * self.cols + pj
+        self._order = np.argsort(flat, kind="stable")
+        self._ptr = np.zeros(self.rows * self.cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat, minlength=self.rows * self.cols), out=self._ptr[1:])
+
+    def _cell_candidates(self, cell: int) -> Tuple[Any, Any, Any]:
+        """(indexes, lats, lngs) of a cell's candidates; lists when short enough for a scalar scan."""
+        # Racing threads compute the same list; either assignment is fine
+        cands = self._cells.get(cell)
+        if cands is None:
+            idx = self._candidates(*divmod(cell, self.cols))
+            lats, lngs = self.lats[idx], self.lngs[idx]
+            if len(idx) <= _VECTOR_SCAN:
+                idx, lats, lngs = idx.tolist(), lats.tolist(), lngs.tolist()
+            cands = (idx, lats, lngs)
+            self._cells[cell] = cands
+        return cands
+
+    def _candidates(self, ci: int, cj: int) -> np.ndarray:
+        """Points whose distance to the cell can beat the best worst-case distance, by rings of buckets."""
+        order, ptr = self._order, self._ptr
+        la0, la1, ln0, ln1 = self._cell_bounds(ci, cj)
+        found = []
+        upper = math.inf
+        ring = 0
+        max_ring = max(self.rows, self.cols)
+        while ring <= max_ring:
+            cells = [i * self.cols + j for i, j in _ring_cells(ci, cj, ring)
+                     if 0 <= i < self.rows and 0 <= j < self.cols]
+            idx = [order[ptr[c]:ptr[c + 1]] for c in cells if ptr[c + 1] > ptr[c]]
+            if idx:
+                idx = np.concatenate(idx)
+                found.append(idx)
+                upper = min(upper, float(self._far_km(idx, la0, la1, ln0, ln1).min()))
+            # Anything outside the scanned rings is at least `ring` cells away
+            reach = ring * self.cell_deg
+            cos_lat = math.cos(math.radians(min(89.9, max(abs(la0), abs(la1)) + reach)))
+            if upper * _BOUND_SLACK < reach * KM_PER_DEGREE * cos_lat:
+                break
+            ring += 1
+        idx = np.concatenate(found)
+        near = self._near_km(idx, la0, la1, ln0, ln1)
+        return np.sort(idx[near <= upper * _BOUND_SLACK + 1e-6])
+
+    def _near_km(self, idx, la0, la1, ln0, ln1) -> np.ndarray:
+        """Lower bound of the distance from each point to the cell."""
+        lat, lng = self.lats[idx], self.lngs[idx]
+        dlat = np.maximum(0, np.maximum(la0 - lat, lat - la1))
+        dlng = np.maximum(0, np.maximum(ln0 - lng, lng - ln1))
+        cos_lat = np.cos(np.radians(np.minimum(89.9, np.maximum(max(abs(la0), abs(la1)), np.abs(lat)))))
+        return np.hypot(dlat, dlng * cos_lat) * KM_PER_DEGREE / _BOUND_SLACK
+
+    def _far_km(self, idx, la0, la1, ln0, ln1) -> np.ndarray:
+        """Upper bound of the distance from each point to any spot in the cell."""
+        lat, lng = self.lats[idx], self.lngs[idx]
+        dlat = np.maximum(np.abs(lat - la0), np.abs(lat - la1))
+        dlng = np.maximum(np.abs(lng - ln0), np.abs(lng - ln1))
+        cos_lat = np.cos(np.radians(np.maximum(0, np.minimum(min(abs(la0), abs(la1)), np.abs(lat)))))
+        return np.hypot(dlat, dlng * cos_lat) * KM_PER_DEGREE
+
+    def _cell_of(self, lat: float, lng: float) -> Optional[int]:
+        ci = math.floor((lat - self.lat0) / self.cell_deg)
+        cj = math.floor((lng - self.lng0) / self.cell_deg)
+        if 0 <= ci < self.rows and 0 <= cj < self.cols:
+            return ci * self.cols + cj
+        return None
+
+    def nearest(self, lat: float, lng: float, max_km: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """(point index, distance_km) of the nearest point, or None beyond `max_km`."""
+        if len(self.names) == 0:
+            return None
+        cell = self._cell_of(lat, lng)
+        if cell is None:
+            dist = haversine_km_many(lat, lng, self.lats, self.lngs)
+            best, best_d = int(dist.argmin()), float(dist.min())
+        else:
+            idx, lats, lngs = self._cell_candidates(cell)
+            if len(idx) > _VECTOR_SCAN:
+                dist = haversine_km_many(lat, lng, lats, lngs)
+                k = int(dist.argmin())
+                best, best_d = int(idx[k]), float(dist[k])
+            else:
+                best, best_d = -1, math.inf
+                for i, p_lat, p_lng in zip(idx, lats, lngs):
+                    d = haversine_km(lat, lng, p_lat, p_lng)
+                    if d < best_d:
+                        best, best_d = i, d
+        if max_km is not None and best_d > max_km:
+            return None
+        return best, best_d
+
+    def name(self, lat: float, lng: float, max_km: Optional[float] = None) -> Optional[str]:
+        found = self.nearest(lat, lng, max_km)
+        return str(self.names[found[0]]) if found is not None else None
+
+    def lookup(self, lat: float, lng: float, max_km: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """The nearest point's record (or name) with `distance_km`."""
+        found = self.nearest(lat, lng, max_km)
+        if found is None:
+            return None
+        i, d = found
+        record = self.records[i] if self.records is not None else {"name": str(self.names[i])}
+        return {**record, "distance_km": round(d, 2)}
+
+    def nearest_many(self, lats, lngs, max_km: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized `nearest`: (point index, distance_km) per query, index -1
+        (distance inf) where nothing is within `max_km`.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        n = len(lats)
+        index = np.full(n, -1, dtype=np.int64)
+        dist = np.full(n, np.inf)
+        if n == 0 or len(self.names) == 0:
+            return index, dist
+
+        ci = np.floor((lats - self.lat0) / self.cell_deg)
+        cj = np.floor((lngs - self.lng0) / self.cell_deg)
+        inside = (ci >= 0) & (ci < self.rows) & (cj >= 0) & (cj < self.cols)
+
+        q = np.flatnonzero(inside)
+        if len(q):
+            cells, inverse = np.unique((ci[q] * self.cols + cj[q]).astype(np.int64), return_inverse=True)
+            lists = [self._cell_candidates(cell)[0] for cell in cells.tolist()]
+            table = np.full((len(lists), max(len(c) for c in lists)), -1, dtype=np.int64)
+            for k, c in enumerate(lists):
+                table[k, :len(c)] = c
+            cand = table[inverse]
+            valid = cand >= 0
+            safe = np.where(valid, cand, 0)
+            d = _haversine_pairs(lats[q, None], lngs[q, None], self.lats[safe], self.lngs[safe])
+            d = np.where(valid, d, np.inf)
+            col = d.argmin(axis=1)
+            index[q] = cand[np.arange(len(q)), col]
+            dist[q] = d[np.arange(len(q)), col]
+        for k in np.flatnonzero(~inside).tolist():
+            index[k], dist[k] = self.nearest(float(lats[k]), float(lngs[k]))
+
+        if max_km is not None:
+            far = dist > max_km
+            index[far] = -1
+            dist[far] = np.inf
+        return index, dist
+
+    def names_many(self, lats, lngs, max_km: Optional[float] = None) -> List[Optional[str]]:
+        index, _ = self.nearest_many(lats, lngs, max_km)
+        return [str(self.names[i]) if i >= 0 else None for i in index.tolist()]
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [len(c[0]) for c in list(self._cells.values())]
+        return {
+            "points": len(self.names),
+            "cell_deg": round(self.cell_deg, 4),
+            "cells": self.rows * self.cols,
+            "cells_ready": len(sizes),
+            "max_candidates": max(sizes, default=0),
+            "mean_candidates": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+        }
+
+
+def _ring_cells(ci: int, cj: int, ring: int):
+    if ring == 0:
+        yield (ci, cj)
+        return
+    for j in range(cj - ring, cj + ring + 1):
+        yield (ci - ring, j)
+        yield (ci + ring, j)
+    for i in range(ci - ring + 1, ci + ring):
+        yield (i, cj - ring)
+        yield (i, cj + ring)
+
+
+def _haversine_pairs(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Element-wise (broadcast) haversine_km."""
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lng2 - lng1)
+    a = (np.sin(dlat / 2) ** 2 +
+         np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
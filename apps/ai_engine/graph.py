@@ -0,0 +1,245 @@
+import csv
+import json
+import os
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Defaults match RouteOptimizer._cost_function for missing attributes
+DEFAULT_DISTANCE = 1.0
+DEFAULT_QUALITY = 5.0
+DEFAULT_TRAFFIC = 5.0
+
+EdgeCostFn = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_ARRAYS = ("names", "name_order", "lats", "lngs", "indptr", "indices", "road",
+                   "distance", "quality", "traffic", "cost")
+# Edge attributes that live traffic updates may rewrite; mapped copy-on-write
+# so a process's updates stay private while untouched pages remain shared.
+MUTABLE_ARRAYS = ("quality", "traffic", "cost")
+
+
+class CSRGraph:
+    """
+    Array-backed road graph in compressed sparse row layout.
+    Nodes are integer ids 0..N-1 (names kept for the API); the outgoing edges
+    of node u are positions indptr[u]:indptr[u+1] of the edge arrays.
+    Undirected roads are stored as two directed edges sharing a `road` id.
+    Name lookups binary-search a sorted permutation of `names`, so a graph
+    mapped from a snapshot needs no per-node Python objects.
+    """
+    def __init__(self, names: Sequence[str], lats, lngs, indptr, indices, road,
+                 distance, quality, traffic, cost, name_order=None):
+        self.names = names if isinstance(names, np.ndarray) else np.asarray(names, dtype=str)
+        self.name_order = np.asarray(name_order) if name_order is not None else np.argsort(self.names, kind="stable")
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.road = np.asarray(road, dtype=np.int32)
+        self.distance = np.asarray(distance, dtype=np.float64)
+        self.quality = np.asarray(quality, dtype=np.float64)
+        self.traffic = np.asarray(traffic, dtype=np.float64)
+        self.cost = np.asarray(cost, dtype=np.float64)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def __contains__(self, name: str) -> bool:
+        return self.node_id(name) is not None
+
+    def node_id(self, name: str) -> Optional[int]:
+        """Integer id of the node called `name`, or None."""
+        pos = int(np.searchsorted(self.names, name, sorter=self.name_order))
+        if pos < len(self.name_order):
+            i = int(self.name_order[pos])
+            if self.names[i] == name:
+                return i
+        return None
+
+    def name(self, i: int) -> str:
+        return str(self.names[i])
+
+    def reverse_adjacency(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Incoming edges in CSR form: (indptr, source node, forward edge position).
+        Costs are read through the edge positions, so live updates apply to both
+        directions of search. Built on first use.
+        """
+        if not hasattr(self, "_reverse"):
+            sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), np.diff(self.indptr))
+            order = np.argsort(self.indices, kind="stable")
+            counts = np.bincount(self.indices, minlength=self.num_nodes)
+            indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            self._reverse = (indptr, sources[order], order.astype(np.int64))
+        return self._reverse
+
+    def roads_between(self, u: int, v: int) -> np.ndarray:
+        """Road ids of the edges u -> v."""
+        lo, hi = int(self.indptr[u]), int(self.indptr[u + 1])
+        return np.unique(self.road[lo:hi][self.indices[lo:hi] == v])
+
+    def road_edges(self, roads) -> np.ndarray:
+        """Edge positions (both directions) of the given road ids."""
+        if not hasattr(self, "_road_order"):
+            self._road_order = np.argsort(self.road, kind="stable")
+            self._road_sorted = self.road[self._road_order]
+        roads = np.asarray(roads, dtype=self._road_sorted.dtype)
+        lo = np.searchsorted(self._road_sorted, roads, side="left")
+        hi = np.searchsorted(self._road_sorted, roads, side="right")
+        if len(roads) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._road_order[a:b] for a, b in zip(lo.tolist(), hi.tolist())])
+
+    def save_snapshot(self, directory: str):
+        """
+        Writes the graph as one .npy file per array plus meta.json.
+        `load_snapshot` memory-maps them, so startup is O(1) and every process
+        mapping the same snapshot shares its physical pages.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for key in SNAPSHOT_ARRAYS:
+            np.save(os.path.join(directory, f"{key}.npy"), getattr(self, key))
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "num_nodes": self.num_nodes,
+            "num_edges": self.num_edges,
+            "arrays": list(SNAPSHOT_ARRAYS),
+        }
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load_snapshot(cls, directory: str) -> "CSRGraph":
+        """Memory-maps a snapshot written by `save_snapshot`."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported graph snapshot format: {meta.get('format')}")
+
+        arrays = {
+            key: np.load(os.path.join(directory, f"{key}.npy"),
+                         mmap_mode="c" if key in MUTABLE_ARRAYS else "r")
+            for key in SNAPSHOT_ARRAYS
+        }
+        return cls(**arrays)
+
+    def neighbors(self, u: int) -> Tuple[List[int], List[float], List[int]]:
+        """(neighbor ids, edge costs, edge positions) of node `u` as Python lists."""
+        lo, hi = int(self.indptr[u]), int(self.indptr[u + 1])
+        return self.indices[lo:hi].tolist(), self.cost[lo:hi].tolist(), list(range(lo, hi))
+
+    @classmethod
+    def from_edges(cls, names: Sequence[str], lats, lngs, sources, targets, distance,
+                   quality, traffic, edge_cost: EdgeCostFn, directed: bool = False) -> "CSRGraph":
+        """
+        Builds the CSR layout from parallel edge arrays (node ids, not names).
+        `edge_cost` turns the (distance, quality, traffic) arrays into edge costs.
+        """
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        distance = np.asarray(distance, dtype=np.float64)
+        quality = np.asarray(quality, dtype=np.float64)
+        traffic = np.asarray(traffic, dtype=np.float64)
+        road = np.arange(len(sources), dtype=np.int32)
+
+        if not directed:
+            sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+            distance = np.concatenate([distance, distance])
+            quality = np.concatenate([quality, quality])
+            traffic = np.concatenate([traffic, traffic])
+            road = np.concatenate([road, road])
+
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=len(names))
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        distance, quality, traffic = distance[order], quality[order], traffic[order]
+        cost = edge_cost(distance, quality, traffic)
+        return cls(names, lats, lngs, indptr, targets[order], road[order],
+                   distance, quality, traffic, cost)
+
+
+class NodeCoords(Mapping):
+    """Read-only {name: (lat, lng)} view over a CSRGraph's coordinate arrays."""
+    def __init__(self, graph: CSRGraph):
+        self._graph = graph
+
+    def __getitem__(self, name: str) -> Tuple[float, float]:
+        i = self._graph.node_id(name)
+        if i is None:
+            raise KeyError(name)
+        return (float(self._graph.lats[i]), float(self._graph.lngs[i]))
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(name) for name in self._graph.names)
+
+    def __len__(self) -> int:
+        return self._graph.num_nodes
+
+
+def _column(row: Dict[str, str], key: str, default: float) -> float:
+    value = row.get(key)
+    return float(value) if value not in (None, "") else default
+
+
+def load_graph_csv(nodes_path: str, edges_path: str, edge_cost: EdgeCostFn,
+                   directed: bool = False) -> CSRGraph:
+    """
+    Reads a road network from CSV files.
+    nodes: `id,lat,lng`
+    edges: `source,target,distance,road_quality,traffic` (attributes optional)
+    """
+    names: List[str] = []
+    lats: List[float] = []
+    lngs: List[float] = []
+    with open(nodes_path, newline="") as f:
+        for row in csv.DictReader(f):
+            names.append(row["id"])
+            lats.append(float(row["lat"]))
+            lngs.append(float(row["lng"]))
+    node_index = {name: i for i, name in enumerate(names)}
+
+    sources: List[int] = []
+    targets: List[int] = []
+    distance: List[float] = []
+    quality: List[float] = []
+    traffic: List[float] = []
+    with open(edges_path, newline="") as f:
+        for row in csv.DictReader(f):
+            sources.append(node_index[row["source"]])
+            targets.append(node_index[row["target"]])
+            distance.append(_column(row, "distance", DEFAULT_DISTANCE))
+            quality.append(_column(row, "road_quality", DEFAULT_QUALITY))
+            traffic.append(_column(row, "traffic", DEFAULT_TRAFFIC))
+
+    return CSRGraph.from_edges(names, lats, lngs, sources, targets, distance,
+                               quality, traffic, edge_cost, directed=directed)
+
+
+def graph_from_dicts(nodes: Dict[str, tuple], edges: List[Tuple[str, str, dict]],
+                     edge_cost: EdgeCostFn, directed: bool = False) -> CSRGraph:
+    """Builds a CSRGraph from {name: (lat, lng)} and (u, v, attrs) edge tuples."""
+    names = list(nodes)
+    node_index = {name: i for i, name in enumerate(names)}
+    return CSRGraph.from_edges(
+        names,
+        [nodes[n][0] for n in names],
+        [nodes[n][1] for n in names],
+        [node_index[u] for u, _, _ in edges],
+        [node_index[v] for _, v, _ in edges],
+        [attr.get("distance", DEFAULT_DISTANCE) for _, _, attr in edges],
+        [attr.get("road_quality", DEFAULT_QUALITY) for _, _, attr in edges],
+        [attr.get("traffic", DEFAULT_TRAFFIC) for _, _, attr in edges],
+        edge_cost,
+        directed=directed,
+    )
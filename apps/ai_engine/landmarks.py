@@ -0,0 +1,191 @@
+import heapq
+import math
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from graph import CSRGraph
+
+
+def dijkstra_all(graph: CSRGraph, source: int, reverse: bool = False,
+                 cost: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Shortest-path cost from `source` to every node (to `source` with reverse=True),
+    over `cost` (per edge, default the graph's live costs). Unreachable nodes are inf.
+    """
+    cost = graph.cost if cost is None else cost
+    if reverse:
+        indptr, neighbors, edge_pos = graph.reverse_adjacency()
+        indptr, neighbors = indptr.tolist(), neighbors.tolist()
+        cost = cost[edge_pos].tolist()
+    else:
+        indptr, neighbors, cost = graph.indptr.tolist(), graph.indices.tolist(), cost.tolist()
+
+    dist = [math.inf] * graph.num_nodes
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for i in range(indptr[u], indptr[u + 1]):
+            v = neighbors[i]
+            nd = d + cost[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return np.asarray(dist)
+
+
+class LandmarkTable:
+    """
+    ALT (A*, Landmarks, Triangle inequality) lower bounds.
+    For each landmark L we keep d(L, v) and d(v, L); then for any a, b
+        d(a, b) >= max(d(L, b) - d(L, a), d(a, L) - d(b, L))
+    which is a far tighter (and consistent) A* potential than straight-line
+    distance when edge costs carry fixed per-km and per-road terms.
+    """
+    FILES = ("landmark_ids", "landmark_from", "landmark_to")
+
+    def __init__(self, landmark_ids, dist_from, dist_to):
+        self.landmark_ids = np.asarray(landmark_ids, dtype=np.int64)
+        self.dist_from = dist_from  # (L, N): d(L, v)
+        self.dist_to = dist_to      # (L, N): d(v, L)
+        # Edge cost increases since the tables were computed: repair skips
+        # them (bounds stay admissible but get looser), a rebuild resets it
+        self.loosened_edges = 0
+
+    def __len__(self):
+        return len(self.landmark_ids)
+
+    @classmethod
+    def build(cls, graph: CSRGraph, count: int, seed_node: int = 0) -> "LandmarkTable":
+        """
+        Picks `count` landmarks by farthest-point selection (each new landmark
+        maximizes its distance to the ones already chosen) and computes their tables.
+        """
+        count = min(count, graph.num_nodes)
+        if count <= 0:
+            raise ValueError("Need at least one landmark")
+
+        seed_dist = dijkstra_all(graph, seed_node)
+        first = int(np.argmax(np.where(np.isfinite(seed_dist), seed_dist, -1)))
+
+        ids: List[int] = []
+        froms: List[np.ndarray] = []
+        tos: List[np.ndarray] = []
+        closest = np.full(graph.num_nodes, np.inf)
+        nxt = first
+        for _ in range(count):
+            ids.append(nxt)
+            froms.append(dijkstra_all(graph, nxt))
+            tos.append(dijkstra_all(graph, nxt, reverse=True))
+            closest = np.minimum(closest, froms[-1])
+            spread = np.where(np.isfinite(closest), closest, -1)
+            spread[ids] = -1
+            nxt = int(np.argmax(spread))
+
+        return cls(ids, np.vstack(froms), np.vstack(tos))
+
+    def lower_bounds(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Lower bound on d(a[i], b[i]) for each i (0 when nothing is known)."""
+        with np.errstate(invalid="ignore"):
+            fwd = self.dist_from[:, b] - self.dist_from[:, a]
+            bwd = self.dist_to[:, a] - self.dist_to[:, b]
+            best = np.fmax.reduce(np.fmax(fwd, bwd), axis=0)
+        return np.maximum(np.nan_to_num(best, nan=0.0, posinf=np.inf), 0.0)
+
+    def repair(self, graph: CSRGraph, edges: np.ndarray, old_cost: np.ndarray, new_cost: np.ndarray) -> int:
+        """
+        Restores the tables after edge cost changes without recomputing them.
+        Costlier edges leave every bound admissible (the tables describe a graph
+        that is nowhere more expensive than the live one), so only cheaper edges
+        need work: each one that now shortcuts a table entry seeds a Dijkstra
+        that lowers just the entries it improves. Costlier edges are counted in
+        `loosened_edges`. Returns entries changed.
+        """
+        self.loosened_edges += int(np.count_nonzero(new_cost > old_cost))
+        cheaper = new_cost < old_cost
+        if not cheaper.any():
+            return 0
+
+        dec_edges = edges[cheaper]
+        dec_src = (np.searchsorted(graph.indptr, dec_edges, side="right") - 1).tolist()
+        dec_dst = graph.indices[dec_edges].tolist()
+        dec_cost = new_cost[cheaper].tolist()
+
+        changed = 0
+        for row in range(len(self)):
+            # d(L, v): a cheaper a -> b may shorten the path to b
+            changed += self._lower(graph, self.dist_from[row],
+                                   [(b, a, c) for a, b, c in zip(dec_src, dec_dst, dec_cost)], reverse=False)
+            # d(v, L): a cheaper a -> b may shorten the path from a
+            changed += self._lower(graph, self.dist_to[row],
+                                   [(a, b, c) for a, b, c in zip(dec_src, dec_dst, dec_cost)], reverse=True)
+        return changed
+
+    def recompute(self, graph: CSRGraph, cost: np.ndarray) -> "LandmarkTable":
+        """Fresh tables for the same landmarks over edge costs `cost` (e.g. a copy of the live ones)."""
+        froms = [dijkstra_all(graph, int(l), cost=cost) for l in self.landmark_ids.tolist()]
+        tos = [dijkstra_all(graph, int(l), reverse=True, cost=cost) for l in self.landmark_ids.tolist()]
+        return LandmarkTable(self.landmark_ids, np.vstack(froms), np.vstack(tos))
+
+    def install(self, graph: CSRGraph, fresh: "LandmarkTable", cost: np.ndarray):
+        """
+        Replaces the tables with `fresh` (computed over `cost`) in place, so
+        processes sharing the arrays see them. Edges that got cheaper than
+        `cost` meanwhile are repaired into `fresh` first; the callers must
+        keep edge costs from changing until this returns.
+        """
+        live = graph.cost
+        moved = np.flatnonzero(live != cost)
+        fresh.repair(graph, moved, cost[moved], live[moved])
+        self.dist_from[...] = fresh.dist_from
+        self.dist_to[...] = fresh.dist_to
+        self.loosened_edges = fresh.loosened_edges
+
+    @staticmethod
+    def _lower(graph: CSRGraph, dist: np.ndarray, seeds, reverse: bool) -> int:
+        """Decrease-only Dijkstra over `dist` from (node, via, edge cost) seeds."""
+        heap = []
+        for node, via, cost in seeds:
+            nd = dist[via] + cost
+            if nd < dist[node]:
+                dist[node] = nd
+                heapq.heappush(heap, (nd, node))
+
+        if reverse:
+            indptr, neighbors, edge_pos = graph.reverse_adjacency()
+        else:
+            indptr, neighbors, edge_pos = graph.indptr, graph.indices, None
+
+        changed = 0
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            changed += 1
+            lo, hi = int(indptr[u]), int(indptr[u + 1])
+            costs = graph.cost[edge_pos[lo:hi]] if reverse else graph.cost[lo:hi]
+            for v, c in zip(neighbors[lo:hi].tolist(), costs.tolist()):
+                nd = d + c
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return changed
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "landmark_ids.npy"), self.landmark_ids)
+        np.save(os.path.join(directory, "landmark_from.npy"), self.dist_from)
+        np.save(os.path.join(directory, "landmark_to.npy"), self.dist_to)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["LandmarkTable"]:
+        """Memory-maps saved tables (copy-on-write, for repairs); None if absent."""
+        paths = [os.path.join(directory, f"{name}.npy") for name in cls.FILES]
+        if not all(os.path.exists(p) for p in paths):
+            return None
+        ids, dist_from, dist_to = (np.load(p, mmap_mode="c") for p in paths)
+        return cls(ids, dist_from, dist_to)
@@ -1,11 +1,53 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Tuple
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import math
+import os
 import random
 from datetime import datetime
 
-app = FastAPI(title="TruckNet AI Engine", version="1.0.0")
+import numpy as np
+
+import metrics
+from metrics import InstrumentedRoute
+import profiling
+from profiling import ProfiledRoute
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Worker processes load the engines before the first request is served
+    await run_in_threadpool(engine_pool.start, ROUTING_GRAPH_SNAPSHOT)
+    await run_in_threadpool(pricing_engine.start)
+    demand_aggregator.start()
+    match_log.start()
+    yield
+    match_log.stop()
+    demand_aggregator.stop()
+    pricing_engine.stop()
+    engine_pool.shutdown()
+
+app = FastAPI(title="TruckNet AI Engine", version="1.0.0", lifespan=lifespan)
+# Per-route latency / in-flight / validation metrics, served on /metrics
+app.router.route_class = InstrumentedRoute
+
+# Opt-in request profiling (see profiling.py): X-Profile: 1 (or the token)
+# captures one request; PROFILE_SAMPLE_RATE profiles that fraction of
+# requests and keeps those slower than PROFILE_SLOW_MS. Captures are listed
+# on /debug/profiles. Disabled, the profiling route class is not installed.
+profiling.PROFILER.configure(
+    enabled=os.environ.get("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes"),
+    token=os.environ.get("PROFILING_TOKEN"),
+    slow_ms=float(os.environ.get("PROFILE_SLOW_MS", "500")),
+    sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+    buffer_size=int(os.environ.get("PROFILE_BUFFER_SIZE", "32"))
+)
+if profiling.PROFILER.enabled:
+    app.router.route_class = ProfiledRoute
 
 # --- Data Models ---
 
@@ -26,17 +68,75 @@ class Driver(BaseModel):
     rating: float
     vehicle_type: str
     is_available: bool
+    capacity: float = 0
+    home_city: Optional[str] = None
 
 class MatchResponse(BaseModel):
     driver_id: str
     score: float
     distance_km: float
 
+class ColumnarMatchResponse(BaseModel):
+    driver_ids: List[str]
+    scores: List[float]
+    distance_km: List[float]
+
+class AssignmentResponse(BaseModel):
+    load_id: str
+    driver_id: str
+    score: float
+    distance_km: float
+
+class BatchMatchResponse(BaseModel):
+    assignments: List[AssignmentResponse]
+    unassigned_loads: List[str]
+    total_score: float
+    optimal: bool
+
+class RouteRequest(BaseModel):
+    start: str
+    end: str
+    algorithm: Literal["astar", "alt"] = "astar"
+    departure: Optional[float] = None # unix seconds: fastest route for this departure (time-dependent)
+
+class RouteResponse(BaseModel):
+    route: List[str]
+    total_distance_km: float
+    optimization_score: float
+    steps: int
+    nodes_expanded: int
+    travel_time_min: Optional[float] = None # time-dependent routes only
+    arrival: Optional[float] = None
+
+class RouteMatrixRequest(BaseModel):
+    sources: List[str]
+    targets: List[str]
+
+class RouteMatrixResponse(BaseModel):
+    sources: List[str]
+    targets: List[str]
+    cost: List[List[Optional[float]]]
+    distance_km: List[List[Optional[float]]]
+    unknown_nodes: List[str]
+
+class EdgeUpdate(BaseModel):
+    source: str
+    target: str
+    traffic: Optional[float] = None # 1-10
+    road_quality: Optional[float] = None # 1-10
+
+class EdgeUpdateResponse(BaseModel):
+    updated_roads: int
+    changed_edges: int
+    invalidated_routes: int
+    unknown_edges: List[dict]
+
 class PriceRequest(BaseModel):
     distance_km: float
     weight: float
     vehicle_type: str
     origin_city: str
+    origin: Optional[Location] = None # enables the live demand surge
 
 class PriceResponse(BaseModel):
     total_price: float
@@ -44,6 +144,27 @@ class PriceResponse(BaseModel):
     surge_multiplier: float
     breakdown: dict
 
+class PriceBatchRequest(BaseModel):
+    # Parallel columns, one entry per quote
+    distance_km: List[float]
+    weight: List[float]
+    origin_city: List[str]
+    vehicle_type: Optional[List[str]] = None
+    origin_lat: Optional[List[float]] = None # with origin_lng: live demand surge
+    origin_lng: Optional[List[float]] = None
+
+class PriceBatchResponse(BaseModel):
+    total_price: List[float]
+    base_fare: List[float]
+    surge_multiplier: List[float]
+    rate: List[float]
+
+class DemandEvent(BaseModel):
+    type: Literal["load_created", "driver_available"]
+    lat: float
+    lng: float
+    timestamp: Optional[float] = None # unix seconds, default now; outside the surge window = rejected
+
 # --- Core Logic ---
 
 def calculate_distance(loc1: Location, loc2: Location) -> float:
@@ -58,11 +179,236 @@ def calculate_distance(loc1: Location, loc2: Location) -> float:
     return R * c
 
 # --- Core Engines ---
-from matching import MatchingEngine
+from matching import MatchingEngine, DriverBatch
 from routing import RouteOptimizer
+from registry import DriverRegistry
+from continuous import ContinuousMatcher
+from driverstore import SharedDriverStore
+from route_cache import RouteCache
+import executor
+from executor import EnginePool, PoolBusy, PoolTimeout
+from db import make_session_factory
+from pricing import PricingEngine
+from demand import DemandAggregator, EVENT_KINDS
+from geo import geohash_encode
+from matchlog import MatchLogWriter
+from poi import POIIndex
+from geocode import ReverseGeocoder
+from traffic import TrafficProfiles
 
 matching_engine = MatchingEngine()
-route_optimizer = RouteOptimizer()
+
+# Road graph: a memory-mapped snapshot (shared by all workers) when configured,
+# otherwise the built-in demo network.
+ROUTING_GRAPH_SNAPSHOT = os.environ.get("ROUTING_GRAPH_SNAPSHOT")
+route_cache = RouteCache(
+    maxsize=int(os.environ.get("ROUTE_CACHE_SIZE", "10000")),
+    ttl_s=float(os.environ.get("ROUTE_CACHE_TTL_S", "300"))
+)
+if ROUTING_GRAPH_SNAPSHOT:
+    route_optimizer = RouteOptimizer.from_snapshot(ROUTING_GRAPH_SNAPSHOT, cache=route_cache)
+else:
+    route_optimizer = RouteOptimizer(cache=route_cache)
+
+# ALT landmarks: snapshots should ship precomputed tables (see routing.py);
+# building them at startup is only cheap for small graphs.
+ROUTING_LANDMARKS = int(os.environ.get("ROUTING_LANDMARKS", "0" if ROUTING_GRAPH_SNAPSHOT else "4"))
+# Hourly travel-time factors per traffic level (see traffic.py); built-in
+# peak / night profile unless TRAFFIC_PROFILES_PATH points to a CSV.
+TRAFFIC_PROFILES_PATH = os.environ.get("TRAFFIC_PROFILES_PATH")
+if TRAFFIC_PROFILES_PATH:
+    route_optimizer.profiles = TrafficProfiles.from_csv(TRAFFIC_PROFILES_PATH)
+
+if route_optimizer.landmarks is None and ROUTING_LANDMARKS > 0:
+    route_optimizer.build_landmarks(ROUTING_LANDMARKS)
+# Traffic that raises edge costs loosens the ALT bounds (repairs only handle
+# cheaper edges); after this many increases the tables are rebuilt in the
+# background. 0 disables.
+route_optimizer.landmark_rebuild_edges = int(os.environ.get("LANDMARK_REBUILD_EDGES", "1000"))
+
+# Reverse geocoding: load destinations -> gazetteer city (the backhaul
+# score compares it with the driver's home city), driver and other
+# {lat, lng} locations -> nearest road graph node. GEOCODE_MAX_KM bounds
+# the city lookup.
+GAZETTEER_PATH = os.environ.get("GAZETTEER_PATH", os.path.join(os.path.dirname(__file__), "data", "india_cities.csv"))
+GEOCODE_MAX_KM = float(os.environ.get("GEOCODE_MAX_KM", "75"))
+city_geocoder = ReverseGeocoder.from_csv(GAZETTEER_PATH)
+_node_geocoder: Optional[ReverseGeocoder] = None
+
+def node_geocoder() -> ReverseGeocoder:
+    """Road node index, built on first use so a mapped graph snapshot keeps startup O(1)."""
+    global _node_geocoder
+    if _node_geocoder is None:
+        # Racing first calls build equal indexes; either one is kept
+        _node_geocoder = ReverseGeocoder.from_graph(route_optimizer.graph)
+    return _node_geocoder
+
+# Fleet state: per-process by default. With DRIVER_STORE_PATH (e.g. under
+# /dev/shm) every uvicorn worker and engine worker maps the same driver
+# table, and /match scores it in place.
+DRIVER_STORE_PATH = os.environ.get("DRIVER_STORE_PATH")
+if DRIVER_STORE_PATH:
+    driver_store = SharedDriverStore(DRIVER_STORE_PATH,
+                                     capacity=int(os.environ.get("DRIVER_STORE_CAPACITY", "100000")))
+    driver_registry = driver_store
+else:
+    driver_store = None
+    driver_registry = DriverRegistry()
+
+ai_db_sessions = make_session_factory()
+
+# Live demand / supply per geohash cell (sliding window), snapshotted to
+# DemandMetric every DEMAND_FLUSH_S when the AI database is configured.
+demand_aggregator = DemandAggregator(
+    precision=int(os.environ.get("DEMAND_GEOHASH_PRECISION", "5")),
+    window_s=float(os.environ.get("DEMAND_WINDOW_S", "900")),
+    bucket_s=float(os.environ.get("DEMAND_BUCKET_S", "60")),
+    session_factory=ai_db_sessions,
+    flush_s=float(os.environ.get("DEMAND_FLUSH_S", "60"))
+)
+
+# Hospitals, police, fuel and repair stations for SOS / roadside lookups:
+# a CSV of name,category,lat,lng (see poi.py). Without it SOS answers are mocked.
+POI_DATA_PATH = os.environ.get("POI_DATA_PATH")
+poi_index = POIIndex.from_csv(POI_DATA_PATH) if POI_DATA_PATH else None
+
+# Audit log of returned matches, written behind in bulk to MatchLog
+match_log = MatchLogWriter(
+    ai_db_sessions,
+    algorithm_version=MatchingEngine.version,
+    max_rows=int(os.environ.get("MATCHLOG_MAX_ROWS", "100000")),
+    batch_rows=int(os.environ.get("MATCHLOG_BATCH_ROWS", "1000")),
+    flush_s=float(os.environ.get("MATCHLOG_FLUSH_S", "2"))
+)
+
+# Pricing rules come from the AI database when AI_DATABASE_URL is set,
+# reloaded every PRICING_REFRESH_S; otherwise the built-in city rates apply.
+pricing_engine = PricingEngine(
+    ai_db_sessions,
+    refresh_s=float(os.environ.get("PRICING_REFRESH_S", "60")),
+    demand=demand_aggregator
+)
+
+# Routing and matching run in this pool of worker processes (0 = threads in
+# the API process). Beyond ENGINE_MAX_PENDING queued tasks requests get 503;
+# tasks running longer than ENGINE_TIMEOUT_S get 504.
+engine_pool = EnginePool(
+    route_optimizer, matching_engine,
+    processes=int(os.environ.get("ENGINE_PROCESSES", str(os.cpu_count() or 1))),
+    max_pending=int(os.environ.get("ENGINE_MAX_PENDING", "64")),
+    timeout_s=float(os.environ.get("ENGINE_TIMEOUT_S", "30")),
+    driver_store=driver_store
+)
+
+# Engine state read at scrape time. Search and scoring counters are recorded
+# here from the results, since the engines themselves run in worker processes.
+for name, help, key in (
+    ("ai_engine_route_cache_hits_total", "Route cache hits.", "hits"),
+    ("ai_engine_route_cache_misses_total", "Route cache misses.", "misses"),
+    ("ai_engine_route_cache_evictions_total", "Route cache LRU evictions.", "evictions"),
+    ("ai_engine_route_cache_invalidations_total", "Cached routes dropped by traffic updates.", "invalidations"),
+):
+    metrics.REGISTRY.callback(name, help, lambda key=key: route_cache.stats()[key], kind="counter")
+metrics.REGISTRY.callback("ai_engine_route_cache_hit_ratio", "Route cache hits / lookups.",
+                          lambda: route_cache.stats()["hit_rate"])
+metrics.REGISTRY.callback("ai_engine_route_cache_entries", "Cached routes.", lambda: len(route_cache))
+metrics.REGISTRY.callback("ai_engine_landmark_loosened_edges",
+                          "Edge cost increases not repaired in the landmark tables since their last build.",
+                          lambda: route_optimizer.landmark_stats()["loosened_edges"])
+metrics.REGISTRY.callback("ai_engine_landmark_rebuilds_total", "Background landmark table rebuilds.",
+                          lambda: route_optimizer.landmark_rebuilds, kind="counter")
+metrics.REGISTRY.callback("ai_engine_pool_pending_tasks", "Engine pool tasks queued or running.",
+                          lambda: engine_pool.pending)
+metrics.REGISTRY.callback("ai_engine_pool_rejected_total", "Engine pool tasks rejected (503).",
+                          lambda: engine_pool.rejected, kind="counter")
+metrics.REGISTRY.callback("ai_engine_pool_timeouts_total", "Engine pool tasks timed out (504).",
+                          lambda: engine_pool.timeouts, kind="counter")
+metrics.REGISTRY.callback("ai_engine_match_log_dropped_rows_total", "Match log rows dropped (queue full).",
+                          lambda: match_log.dropped_rows, kind="counter")
+metrics.REGISTRY.callback("ai_engine_demand_cells", "Geohash cells with demand/supply counts.",
+                          lambda: len(demand_aggregator))
+metrics.REGISTRY.callback("ai_engine_demand_rejected_events_total", "Demand events stamped outside the window.",
+                          lambda: demand_aggregator.rejected, kind="counter")
+
+@app.exception_handler(PoolBusy)
+async def pool_busy_handler(request: Request, exc: PoolBusy):
+    return JSONResponse(status_code=503, content={"detail": "Engine busy, retry shortly"},
+                        headers={"Retry-After": "1"})
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+async def find_route(start: str, end: str, algorithm: str = "astar") -> dict:
+    """`calculate_optimal_route` with the search run on the engine pool."""
+    error = route_optimizer.route_error(start, end, algorithm)
+    if error is not None:
+        return error
+    key = route_optimizer.route_key(start, end, algorithm)
+    cached = route_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = route_optimizer.graph_version
+    result, roads = await engine_pool.run(executor.compute_route, start, end, algorithm)
+    metrics.observe_route(algorithm, result)
+    # Not cached if a traffic update landed while the search ran
+    if roads is not None and route_optimizer.graph_version == version:
+        route_cache.put(key, result, roads)
+    return result
+
+async def find_routes(pairs: List[Tuple[str, str]], algorithm: str = "astar") -> Dict[Tuple[str, str], dict]:
+    """
+    `find_route` for many (start, end) pairs: cache hits and invalid pairs are
+    answered here, the remaining searches are split across the pool's workers.
+    """
+    results = {}
+    missing = []
+    for start, end in pairs:
+        error = route_optimizer.route_error(start, end, algorithm)
+        cached = route_cache.get(route_optimizer.route_key(start, end, algorithm)) if error is None else None
+        if error is not None or cached is not None:
+            results[(start, end)] = error if error is not None else cached
+        else:
+            missing.append((start, end))
+    if not missing:
+        return results
+
+    version = route_optimizer.graph_version
+    parts = max(1, min(engine_pool.workers, len(missing)))
+    chunk = -(-len(missing) // parts)
+    solved = await asyncio.gather(*(
+        engine_pool.run(executor.compute_routes, missing[i:i + chunk], algorithm)
+        for i in range(0, len(missing), chunk)
+    ))
+    for (start, end), (result, roads) in zip(missing, [r for part in solved for r in part]):
+        metrics.observe_route(algorithm, result)
+        if roads is not None and route_optimizer.graph_version == version:
+            route_cache.put(route_optimizer.route_key(start, end, algorithm), result, roads)
+        results[(start, end)] = result
+    return results
+
+# Candidate radius when /match pulls from the registry without radius/nearest.
+# Beyond 100 km the proximity score is flat, so this keeps every driver that
+# can still win on distance.
+DEFAULT_MATCH_RADIUS_KM = 100.0
+
+# Standing top-k lists for open loads (POST /loads), updated from the
+# /drivers feed of this process instead of rescoring on every read.
+continuous_matcher = ContinuousMatcher(
+    matching_engine,
+    top_k=int(os.environ.get("CONTINUOUS_MATCH_TOP_K", "20")),
+    radius_km=DEFAULT_MATCH_RADIUS_KM
+)
+metrics.REGISTRY.callback("ai_engine_continuous_open_loads", "Loads with a standing candidate list.",
+                          lambda: len(continuous_matcher))
+metrics.REGISTRY.callback("ai_engine_continuous_pairs_scored_total",
+                          "Load x driver pairs scored by continuous matching.",
+                          lambda: continuous_matcher.pairs_scored, kind="counter")
+
+def driver_to_engine_dict(d: Driver) -> dict:
+    # The engine keys drivers by "id"
+    return {**d.model_dump(), "id": d.driver_id}
 
 # --- Endpoints ---
 
@@ -79,6 +425,56 @@ class EtaResponse(BaseModel):
     adjustment_factor: float
     details: str
 
+class ShipmentEta(BaseModel):
+    shipment_id: str
+    origin: str # current graph node
+    destination: str
+    departure: Optional[float] = None # unix seconds, default now
+    weather_condition: Optional[str] = None
+    vehicle_type: Optional[str] = None
+
+class ShipmentEtaResponse(BaseModel):
+    shipment_id: str
+    eta: Optional[float] = None # unix seconds
+    travel_time_min: Optional[float] = None
+    distance_km: Optional[float] = None
+    adjustment_factor: float
+    error: Optional[str] = None
+
+class PlanStop(BaseModel):
+    node: str
+    demand: float = 0 # same unit as PlanRequest.capacity
+    window_start: Optional[float] = None # unix seconds; arriving earlier waits
+    window_end: Optional[float] = None # unix seconds; arriving later is penalised per minute
+    service_min: float = 0
+
+class PlanRequest(BaseModel):
+    start: str
+    stops: List[PlanStop]
+    capacity: Optional[float] = None # per vehicle; stops are split over several routes when exceeded
+    return_to_start: bool = False
+    departure: Optional[float] = None # unix seconds, default now
+    time_budget_ms: float = 500 # capped at PLAN_MAX_BUDGET_MS
+
+class PlannedRoute(BaseModel):
+    route: List[str]
+    total_distance_km: float
+    optimization_score: float
+    steps: int
+    stops: List[int] # indexes into PlanRequest.stops, in visiting order
+    load: float
+    arrivals: Optional[List[float]] = None # unix seconds, only with time windows
+    late_stops: List[int]
+
+class PlanResponse(BaseModel):
+    routes: List[PlannedRoute]
+    total_distance_km: float
+    optimization_score: float
+    unserved_stops: List[int]
+    unknown_nodes: List[str]
+    converged: bool
+    search_ms: float
+
 class SosRequest(BaseModel):
     lat: float
     lng: float
@@ -106,15 +502,133 @@ class InsightsResponse(BaseModel):
 def health_check():
     return {"status": "healthy", "service": "TruckNet AI Engine"}
 
-@app.post("/get-insights", response_model=InsightsResponse)
-def get_ai_insights(req: InsightsRequest):
+@app.post("/optimize-route", response_model=RouteResponse)
+async def optimize_route(req: RouteRequest):
     """
-    Unified AI Endpoint for TruckNet.
-    Dynamically returns insights based on User Role.
+    Route Optimization: best route between two graph nodes.
+    `nodes_expanded` reports the search effort (compare astar vs alt).
+    With `departure`, the fastest route for that departure time using the
+    hourly traffic profiles (time-dependent A*), with its arrival time.
     """
-    role = req.role.upper()
-    context = req.context
-    
+    if req.departure is not None:
+        res = await engine_pool.run(executor.time_dependent_route, req.start, req.end, req.departure)
+    else:
+        res = await find_route(req.start, req.end, algorithm=req.algorithm)
+    if "error" in res:
+        raise HTTPException(status_code=404, detail=res["error"])
+    return RouteResponse(**res)
+
+PLAN_MAX_BUDGET_MS = float(os.environ.get("PLAN_MAX_BUDGET_MS", "5000"))
+
+@app.post("/plan-route", response_model=PlanResponse)
+async def plan_route(req: PlanRequest):
+    """
+    Multi-drop planning: visiting order of a load's stops from `start`,
+    split into several vehicle routes when `capacity` is set. The search
+    stops after `time_budget_ms`; `converged` tells whether it finished first.
+    Stops that cannot be reached or exceed the capacity are `unserved_stops`.
+    """
+    res = await engine_pool.run(
+        executor.plan_route, req.start, [s.model_dump() for s in req.stops], req.capacity,
+        req.return_to_start, req.departure, min(max(req.time_budget_ms, 0), PLAN_MAX_BUDGET_MS) / 1000)
+    if "error" in res:
+        raise HTTPException(status_code=404, detail=res["error"])
+    return PlanResponse(**res)
+
+@app.post("/route-matrix", response_model=RouteMatrixResponse)
+async def route_matrix(req: RouteMatrixRequest):
+    """
+    Road cost / distance matrix for N sources x M targets.
+    One search per source serves every target; unreachable pairs are null.
+    Sources are split across the engine pool's workers.
+    """
+    rows, targets = route_optimizer.matrix_plan(req.sources, req.targets)
+    parts = max(1, min(engine_pool.workers, len(rows)))
+    chunk = -(-len(rows) // parts) if rows else 1
+    solved = await asyncio.gather(*(
+        engine_pool.run(executor.matrix_rows, rows[i:i + chunk], targets)
+        for i in range(0, len(rows), chunk)
+    ))
+    results = [row for part in solved for row in part]
+    return RouteMatrixResponse(**route_optimizer.matrix_result(req.sources, req.targets, results))
+
+@app.post("/traffic-updates", response_model=EdgeUpdateResponse)
+def push_traffic_updates(updates: List[EdgeUpdate]):
+    """
+    Live traffic feed: applies a batch of edge attribute updates to the road
+    graph and repairs cached routes incrementally.
+    """
+    report = route_optimizer.apply_edge_updates([u.model_dump() for u in updates])
+    return EdgeUpdateResponse(**report)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+def _profiling_access(token: Optional[str]):
+    if not profiling.PROFILER.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if profiling.PROFILER.token is not None and not profiling.PROFILER.authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@app.get("/debug/profiles", include_in_schema=False)
+def list_profiles(token: Optional[str] = None):
+    """Captured request profiles, newest first."""
+    _profiling_access(token)
+    return {**profiling.PROFILER.stats(), "profiles": profiling.PROFILER.list()}
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def download_profile(profile_id: str, format: Literal["pstats", "text"] = "pstats", sort: str = "cumulative",
+                     limit: int = Query(50, ge=1), token: Optional[str] = None):
+    """
+    One capture: a .prof file (pstats / snakeviz) or, with format=text, a
+    pstats report sorted by `sort`.
+    """
+    _profiling_access(token)
+    record = profiling.PROFILER.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        try:
+            return Response(profiling.report(record["data"], sort, limit), media_type="text/plain")
+        except KeyError:
+            raise HTTPException(status_code=422, detail=f"Unknown sort key: {sort}")
+    return Response(record["data"], media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'})
+
+@app.delete("/debug/profiles", include_in_schema=False)
+def clear_profiles(token: Optional[str] = None):
+    _profiling_access(token)
+    return {"cleared": profiling.PROFILER.clear()}
+
+@app.get("/route-cache/stats")
+def route_cache_stats():
+    return route_cache.stats()
+
+@app.get("/engine-pool/stats")
+def engine_pool_stats():
+    return engine_pool.stats()
+
+def _location_node(location, default: str) -> str:
+    """Route node for a context location: a node name as is, {lat, lng} snapped to the nearest node."""
+    if isinstance(location, str):
+        return location
+    if isinstance(location, dict):
+        try:
+            return node_geocoder().name(float(location["lat"]), float(location["lng"])) or default
+        except (KeyError, TypeError, ValueError):
+            return default
+    return default
+
+def _driver_corridor(context: dict) -> Tuple[str, str]:
+    """(start, end) route nodes for a DRIVER insights request; a {lat, lng} driver position is snapped to a node."""
+    current_loc = context.get("current_location", "Mumbai") # e.g. {lat: x, lng: y} or "City"
+    dest_loc = context.get("destination", "Pune")
+    return _location_node(current_loc, "Mumbai"), _location_node(dest_loc, "Pune")
+
+def _compose_insights(role: str, context: dict, route_res: Optional[dict]) -> InsightsResponse:
+    """Rule evaluation for one user; `route_res` is the DRIVER corridor's route."""
     response = InsightsResponse(
         summary="No insights available.",
         top_recommendations=[],
@@ -125,26 +639,8 @@ def get_ai_insights(req: InsightsRequest):
 
     if role == "DRIVER":
         # 1. Route Optimization Insight (Efficiency Boost)
-        current_loc = context.get("current_location", "Mumbai") # e.g. {lat: x, lng: y} or "City"
-        dest_loc = context.get("destination", "Pune")
-        
-        # Determine strict city names for the mock router if objects passed
-        start_city = "Mumbai"
-        end_city = "Pune"
-        if isinstance(current_loc, dict):
-             # Simple mock reverse geocode or default
-             start_city = "Mumbai" 
-        elif isinstance(current_loc, str):
-             start_city = current_loc
-
-        if isinstance(dest_loc, dict): 
-             end_city = "Pune"
-        elif isinstance(dest_loc, str):
-             end_city = dest_loc
-
-        route_res = route_optimizer.calculate_optimal_route(start_city, end_city)
-        
-        if "error" not in route_res:
+        # (a one-node route means the driver is already there)
+        if route_res is not None and "error" not in route_res and len(route_res["route"]) > 1:
             rec = {
                 "type": "ROUTE",
                 "title": "Efficiency Boost Available",
@@ -234,51 +730,300 @@ def get_ai_insights(req: InsightsRequest):
     
     return response
 
+@app.post("/get-insights", response_model=InsightsResponse)
+async def get_ai_insights(req: InsightsRequest):
+    """
+    Unified AI Endpoint for TruckNet.
+    Dynamically returns insights based on User Role.
+    """
+    role = req.role.upper()
+    route_res = await find_route(*_driver_corridor(req.context)) if role == "DRIVER" else None
+    return _compose_insights(role, req.context, route_res)
+
+@app.post("/get-insights-batch", response_model=List[InsightsResponse])
+async def get_ai_insights_batch(reqs: List[InsightsRequest]):
+    """
+    /get-insights for many users at once (fleet dashboards), in input order.
+    Requests are grouped by role and each distinct DRIVER corridor is routed
+    once for the whole batch.
+    """
+    by_role = {}
+    for i, req in enumerate(reqs):
+        by_role.setdefault(req.role.upper(), []).append(i)
+
+    driver_corridors = {i: _driver_corridor(reqs[i].context) for i in by_role.get("DRIVER", [])}
+    routes = await find_routes(list(dict.fromkeys(driver_corridors.values())))
+
+    results: List[Optional[InsightsResponse]] = [None] * len(reqs)
+    for role, indexes in by_role.items():
+        for i in indexes:
+            route_res = routes[driver_corridors[i]] if role == "DRIVER" else None
+            results[i] = _compose_insights(role, reqs[i].context, route_res)
+    return results
+
+@app.post("/drivers")
+def upsert_drivers(drivers: List[Driver]):
+    """
+    Driver Registry: insert or update driver positions and availability.
+    """
+    records = [driver_to_engine_dict(d) for d in drivers]
+    try:
+        driver_registry.upsert_many(records)
+    except ValueError as e:
+        # Shared store full, or an id / city name too long for its fixed-width column
+        raise HTTPException(status_code=422, detail=str(e))
+    continuous_matcher.upsert_drivers(records)
+    return {"upserted": len(drivers), "total": len(driver_registry), "available": driver_registry.available_count}
+
+@app.delete("/drivers/{driver_id}")
+def remove_driver(driver_id: str):
+    if not driver_registry.remove(driver_id):
+        raise HTTPException(status_code=404, detail="Driver not found")
+    continuous_matcher.remove_driver(driver_id)
+    return {"removed": driver_id, "total": len(driver_registry)}
+
+@app.get("/drivers/stats")
+def driver_stats():
+    if driver_store is not None:
+        return driver_store.stats()
+    return {"drivers": len(driver_registry), "available": driver_registry.available_count}
+
+@app.post("/loads")
+def open_loads(loads: List[LoadRequest]):
+    """
+    Continuous matching: opens (or replaces) loads. Each is scored once
+    against the registered drivers near its origin; later /drivers updates
+    keep its candidate list current.
+    """
+    load_dicts = []
+    for load in loads:
+        load_dict = load.model_dump()
+        load_dict["destination_city"] = _destination_city(load.destination)
+        load_dicts.append(load_dict)
+    continuous_matcher.open_loads(load_dicts)
+    return {"opened": len(loads), "open_loads": len(continuous_matcher)}
+
+@app.delete("/loads/{load_id}")
+def close_load(load_id: str):
+    if not continuous_matcher.close_load(load_id):
+        raise HTTPException(status_code=404, detail="Load not found")
+    return {"closed": load_id, "open_loads": len(continuous_matcher)}
+
+@app.get("/loads/stats")
+def continuous_matching_stats():
+    return continuous_matcher.stats()
+
+@app.get("/loads/{load_id}/matches", response_model=List[MatchResponse])
+def standing_matches(load_id: str, limit: Optional[int] = Query(None, ge=1)):
+    """Best drivers for an open load from its standing list (no rescoring)."""
+    matches = continuous_matcher.top(load_id, limit)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Load not found")
+    return [MatchResponse(**match) for match in matches]
+
+# Rows per chunk when streaming ranked matches as NDJSON
+MATCH_STREAM_CHUNK = 1000
+
+def _ndjson_matches(ids: list, order: np.ndarray, score: np.ndarray, distance: np.ndarray):
+    """Yields ranked matches (score/distance aligned with order) as NDJSON, a chunk at a time."""
+    for lo in range(0, len(order), MATCH_STREAM_CHUNK):
+        hi = lo + MATCH_STREAM_CHUNK
+        lines = [
+            json.dumps({"driver_id": ids[i], "score": round(raw, 2), "distance_km": dist})
+            for i, raw, dist in zip(order[lo:hi].tolist(), score[lo:hi].tolist(), distance[lo:hi].tolist())
+        ]
+        yield "\n".join(lines) + "\n"
+
+def _destination_city(location: Location) -> Optional[str]:
+    """Gazetteer city of a load destination (None = no backhaul match)."""
+    return city_geocoder.name(location.lat, location.lng, max_km=GEOCODE_MAX_KM)
+
+def _candidate_batch(load: LoadRequest, available_drivers: Optional[List[Driver]],
+                     radius_km: Optional[float], nearest: Optional[int]) -> DriverBatch:
+    if available_drivers is not None:
+        drivers_dict = [driver_to_engine_dict(d) for d in available_drivers]
+    else:
+        if radius_km is None and nearest is None:
+            radius_km = DEFAULT_MATCH_RADIUS_KM
+        drivers_dict = driver_registry.candidates(
+            load.origin.lat, load.origin.lng, radius_km=radius_km, k=nearest
+        )
+    # Workers only need the columns
+    return DriverBatch.from_dicts(drivers_dict).without_records()
+
+def _log_ranked(load_id: str, ids: list, order: np.ndarray, score: np.ndarray,
+                distance: np.ndarray, components: dict):
+    """Queues ranked matches for the MatchLog (no-op without the AI database)."""
+    if match_log.enabled:
+        match_log.log(load_id, [ids[i] for i in order.tolist()], score,
+                      {"distance_km": distance, **components})
+
 @app.post("/match", response_model=List[MatchResponse])
-def smart_matching(load: LoadRequest, available_drivers: List[Driver]):
+async def smart_matching(load: LoadRequest, available_drivers: Optional[List[Driver]] = None,
+                         radius_km: Optional[float] = None, nearest: Optional[int] = None,
+                         limit: Optional[int] = Query(None, ge=1), stream: bool = False):
     """
     Feature 2: Truck Owner AI (Smart Load Matching)
+    Scores `available_drivers` when posted; otherwise pulls candidates from the
+    driver registry (the `nearest` k, or everyone within `radius_km`).
+    `limit` returns only the top-k; `stream=true` sends ranked rows as NDJSON.
     """
     # Convert Pydantic models to dicts
     load_dict = load.model_dump()
-    load_dict["destination_city"] = "Pune" # Mocking
-    
-    drivers_dict = [d.model_dump() for d in available_drivers]
-    
-    # Run Engine
-    results = matching_engine.match_driver_to_load(load_dict, drivers_dict)
-    
+    load_dict["destination_city"] = _destination_city(load.destination)
+
+    if available_drivers is None and driver_store is not None:
+        # Scored in place from the shared store; results come back ranked
+        if radius_km is None and nearest is None:
+            radius_km = DEFAULT_MATCH_RADIUS_KM
+        ids, score, distance, components = await engine_pool.run(
+            executor.rank_fleet, load_dict, limit, radius_km, nearest
+        )
+        order = np.arange(len(ids))
+        metrics.DRIVERS_SCORED.labels("match").observe(driver_store.rows)
+    else:
+        batch = await run_in_threadpool(_candidate_batch, load, available_drivers, radius_km, nearest)
+        # Run Engine (vectorized path, same scores as match_driver_to_load)
+        order, score, distance, components = await engine_pool.run(executor.rank_drivers, load_dict, batch, limit)
+        ids = batch.ids
+        metrics.DRIVERS_SCORED.labels("match").observe(len(batch))
+
+    _log_ranked(load.load_id, ids, order, score, distance, components)
+    if stream:
+        return StreamingResponse(_ndjson_matches(ids, order, score, distance), media_type="application/x-ndjson")
+
     # Convert back to Response Model
-    response = []
-    for r in results:
-        response.append(MatchResponse(
-            driver_id=r["driver_id"],
-            score=r["total_score"],
-            distance_km=r["details"]["distance_km"]
-        ))
-        
-    return response
+    return [
+        MatchResponse(driver_id=ids[i], score=round(raw, 2), distance_km=dist)
+        for i, raw, dist in zip(order.tolist(), score.tolist(), distance.tolist())
+    ]
 
-@app.post("/predict-eta", response_model=EtaResponse)
-def calculate_smart_eta(req: EtaRequest):
+def _columns_batch(columns: dict) -> DriverBatch:
+    if not isinstance(columns, dict):
+        raise HTTPException(status_code=422, detail="'drivers' must be an object of columns")
+    try:
+        return DriverBatch.from_columns(
+            columns["ids"], columns["lats"], columns["lngs"], columns["ratings"],
+            capacities=columns.get("capacities"),
+            home_cities=columns.get("home_cities")
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Missing driver column: {e.args[0]}")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/match-columnar", response_model=ColumnarMatchResponse)
+async def smart_matching_columnar(request: Request, limit: Optional[int] = Query(None, ge=1)):
     """
-    Feature 1: Customer AI (Predictive ETA)
+    Smart Load Matching with a columnar payload for large fleets:
+        {"load": {...}, "drivers": {"ids": [...], "lats": [...], "lngs": [...],
+         "ratings": [...], "capacities": [...]?, "home_cities": [...]?}}
+    Columns go straight into the scoring engine; no per-driver model is built.
+    Results come back as parallel arrays, best match first (top `limit` only).
     """
-    base = req.base_time
+    try:
+        payload = json.loads(await request.body())
+        load = LoadRequest.model_validate(payload["load"])
+        columns = payload["drivers"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid columnar payload: {e}")
+
+    load_dict = load.model_dump()
+    load_dict["destination_city"] = _destination_city(load.destination)
+
+    batch = await run_in_threadpool(_columns_batch, columns)
+    order, score, distance, components = await engine_pool.run(executor.rank_drivers, load_dict, batch, limit)
+    metrics.DRIVERS_SCORED.labels("match-columnar").observe(len(batch))
+    _log_ranked(load.load_id, batch.ids, order, score, distance, components)
+    return ColumnarMatchResponse.model_construct(
+        driver_ids=[str(batch.ids[i]) for i in order.tolist()],
+        scores=[round(x, 2) for x in score.tolist()],
+        distance_km=distance.tolist()
+    )
+
+@app.post("/match-batch", response_model=BatchMatchResponse)
+async def batch_matching(loads: List[LoadRequest], available_drivers: Optional[List[Driver]] = None,
+                         radius_km: Optional[float] = None, min_score: Optional[float] = None,
+                         time_budget_ms: Optional[float] = None):
+    """
+    Smart Load Matching for many loads at once.
+    Scores every load x driver pair with the MatchingEngine weights and solves a
+    global assignment, so no driver is given two loads. Without
+    `available_drivers`, candidates are the registry drivers within `radius_km`
+    of any load.
+    """
+    cities = city_geocoder.names_many([l.destination.lat for l in loads], [l.destination.lng for l in loads],
+                                      max_km=GEOCODE_MAX_KM)
+    load_dicts = []
+    for load, city in zip(loads, cities):
+        load_dict = load.model_dump()
+        load_dict["destination_city"] = city
+        load_dicts.append(load_dict)
+
+    def candidates() -> DriverBatch:
+        if available_drivers is not None:
+            drivers_dict = [driver_to_engine_dict(d) for d in available_drivers]
+        else:
+            radius = radius_km if radius_km is not None else DEFAULT_MATCH_RADIUS_KM
+            by_id = {}
+            for load in loads:
+                for d in driver_registry.candidates(load.origin.lat, load.origin.lng, radius_km=radius):
+                    by_id[d["id"]] = d
+            drivers_dict = list(by_id.values())
+        return DriverBatch.from_dicts(drivers_dict).without_records()
+
+    batch = await run_in_threadpool(candidates)
+    plan, pair_values = await engine_pool.run(
+        executor.assign_loads, load_dicts, batch, min_score,
+        time_budget_ms / 1000 if time_budget_ms is not None else None
+    )
+    metrics.DRIVERS_SCORED.labels("match-batch").observe(len(batch) * len(loads))
+
+    assignments = [
+        AssignmentResponse(
+            load_id=loads[row].load_id,
+            driver_id=batch.ids[col],
+            score=round(score, 2),
+            distance_km=distance
+        )
+        for (row, col), (score, distance) in zip(plan["pairs"], pair_values)
+    ]
+    for a in assignments:
+        match_log.log(a.load_id, [a.driver_id], [a.score], {"distance_km": [a.distance_km]},
+                      algorithm_version=f"{MatchingEngine.version}+assignment")
+
+    return BatchMatchResponse(
+        assignments=assignments,
+        unassigned_loads=[loads[row].load_id for row in plan["unassigned"]],
+        total_score=round(sum(a.score for a in assignments), 2),
+        optimal=plan["optimal"]
+    )
+
+def _eta_adjustment(weather_condition: Optional[str], vehicle_type: Optional[str]):
+    """(multiplier, reasons) for weather and vehicle type."""
     multiplier = 1.0
     reason = []
 
-    if req.weather_condition.lower() == "rain":
+    weather = (weather_condition or "").lower()
+    if weather == "rain":
         multiplier += 0.15
         reason.append("Weather (Rain) +15%")
-    elif req.weather_condition.lower() == "storm":
+    elif weather == "storm":
         multiplier += 0.40
         reason.append("Weather (Storm) +40%")
-        
-    if req.vehicle_type.lower() == "heavy truck":
+
+    if (vehicle_type or "").lower() == "heavy truck":
         multiplier += 0.10
         reason.append("Vehicle (Heavy Truck) +10%")
-        
+    return multiplier, reason
+
+@app.post("/predict-eta", response_model=EtaResponse)
+def calculate_smart_eta(req: EtaRequest):
+    """
+    Feature 1: Customer AI (Predictive ETA)
+    """
+    base = req.base_time
+    multiplier, reason = _eta_adjustment(req.weather_condition, req.vehicle_type)
     adjusted = base * multiplier
     
     return EtaResponse(
@@ -288,49 +1033,174 @@ def calculate_smart_eta(req: EtaRequest):
         details=", ".join(reason) if reason else "Standard Conditions"
     )
 
+# Shipments leaving the same node within one bucket share a search tree
+# (departure rounded down to the bucket start)
+ETA_DEPARTURE_BUCKET_S = float(os.environ.get("ETA_DEPARTURE_BUCKET_S", "300"))
+
+@app.post("/predict-eta-batch", response_model=List[ShipmentEtaResponse])
+async def predict_eta_batch(shipments: List[ShipmentEta]):
+    """
+    Road-graph ETAs for many active shipments, in input order.
+    Travel times follow the hourly traffic profiles from the departure time
+    (default now), times the weather / vehicle factors of /predict-eta.
+    Shipments from the same origin and departure bucket are answered by a
+    single time-dependent search; the searches are spread across the pool.
+    """
+    g = route_optimizer.graph
+    now = datetime.now().timestamp()
+    groups = {} # (source id, bucket start) -> {target id: None}
+    plan = []
+    for s in shipments:
+        source, target = g.node_id(s.origin), g.node_id(s.destination)
+        departure = s.departure if s.departure is not None else now
+        if source is None or target is None:
+            plan.append(None)
+            continue
+        key = (source, departure - departure % ETA_DEPARTURE_BUCKET_S)
+        groups.setdefault(key, {})[target] = None
+        plan.append((key, target, departure))
+
+    keys = list(groups)
+    tasks = [(source, bucket, list(groups[(source, bucket)])) for source, bucket in keys]
+    parts = max(1, min(engine_pool.workers, len(tasks)))
+    chunk = -(-len(tasks) // parts) if tasks else 1
+    solved = await asyncio.gather(*(
+        engine_pool.run(executor.eta_trees, tasks[i:i + chunk])
+        for i in range(0, len(tasks), chunk)
+    ))
+    trees = {}
+    for key, (_, _, targets), (hours, dists) in zip(keys, tasks, [t for part in solved for t in part]):
+        trees[key] = dict(zip(targets, zip(hours, dists)))
+
+    results = []
+    for s, planned in zip(shipments, plan):
+        multiplier, _ = _eta_adjustment(s.weather_condition, s.vehicle_type)
+        if planned is None:
+            results.append(ShipmentEtaResponse(shipment_id=s.shipment_id, adjustment_factor=multiplier,
+                                               error="Start or End node not found in graph"))
+            continue
+        key, target, departure = planned
+        hours, distance = trees[key][target]
+        if math.isinf(hours):
+            results.append(ShipmentEtaResponse(shipment_id=s.shipment_id, adjustment_factor=multiplier,
+                                               error="No path found"))
+            continue
+        travel_min = hours * 60 * multiplier
+        results.append(ShipmentEtaResponse(
+            shipment_id=s.shipment_id,
+            eta=round(departure + travel_min * 60),
+            travel_time_min=round(travel_min, 1),
+            distance_km=round(distance, 2),
+            adjustment_factor=multiplier
+        ))
+    return results
+
+# Index candidates re-ranked with calculate_distance for the final answer
+SOS_CANDIDATES = 3
+
+def _nearest_poi(category: str, here: Location, fallback: dict) -> dict:
+    candidates = poi_index.nearest(category, here.lat, here.lng, k=SOS_CANDIDATES) if poi_index else []
+    if not candidates:
+        return fallback
+    ranked = [(calculate_distance(here, Location(lat=p["lat"], lng=p["lng"])), p) for p in candidates]
+    distance, best = min(ranked, key=lambda x: x[0])
+    return {**best, "distance": round(distance, 2)}
+
 @app.post("/trigger-sos", response_model=SosResponse)
 def trigger_smart_sos(req: SosRequest):
     """
     Feature 3: Driver AI (Smart SOS & Safety)
+    Nearest hospital and police station from the POI index; the mock
+    answers are used when no POI dataset is loaded.
     """
-    # Mock nearest locations
-    hospital_dist = 2.0
-    police_dist = 3.0
-    
-    hospital_name = "City General Hospital"
-    police_station = "Central Police Station"
-    
-    alert_msg = f"SOS at [{req.lat}, {req.lng}]. Nearest Hospital: {hospital_name} ({hospital_dist}km away). Nearest Police: {police_station} ({police_dist}km away)."
-    
+    here = Location(lat=req.lat, lng=req.lng)
+    hospital = _nearest_poi("hospital", here, {"name": "City General Hospital", "distance": 2.0})
+    police = _nearest_poi("police", here, {"name": "Central Police Station", "distance": 3.0})
+
+    alert_msg = f"SOS at [{req.lat}, {req.lng}]. Nearest Hospital: {hospital['name']} ({hospital['distance']}km away). Nearest Police: {police['name']} ({police['distance']}km away)."
+
     return SosResponse(
         alert=alert_msg,
-        nearest_hospital={"name": hospital_name, "distance": hospital_dist},
-        nearest_police={"name": police_station, "distance": police_dist}
+        nearest_hospital=hospital,
+        nearest_police=police
     )
 
+@app.get("/poi/nearest")
+def nearest_poi(category: str, lat: float, lng: float, k: int = Query(1, ge=1, le=100),
+                max_radius_km: Optional[float] = None):
+    """k nearest points of interest of a category (hospital, police, fuel, repair...)."""
+    if poi_index is None:
+        raise HTTPException(status_code=503, detail="No POI dataset loaded")
+    return poi_index.nearest(category, lat, lng, k=k, max_radius_km=max_radius_km)
+
+@app.get("/reverse-geocode")
+def reverse_geocode(lat: float, lng: float):
+    """Nearest gazetteer city (within GEOCODE_MAX_KM) and nearest road graph node."""
+    node = node_geocoder().lookup(lat, lng)
+    return {
+        "city": city_geocoder.lookup(lat, lng, max_km=GEOCODE_MAX_KM),
+        "node": node["name"] if node else None,
+        "node_distance_km": node["distance_km"] if node else None,
+    }
+
 @app.post("/predict-price", response_model=PriceResponse)
 def dynamic_pricing(req: PriceRequest):
     """
     Module 3: Dynamic Pricing Engine (Existing)
     """
-    base_rates = {"Mumbai": 20, "Delhi": 18, "Bangalore": 22, "Pune": 19}
-    base_rate_per_km = base_rates.get(req.origin_city, 20)
-    base_fare = base_rate_per_km * req.distance_km
-    
-    current_hour = datetime.now().hour
-    surge = 1.0
-    if 8 <= current_hour <= 11 or 17 <= current_hour <= 21:
-        surge += 0.5
-    
-    total_price = (base_fare * surge) * (1.2 if req.weight > 5 else 1.0)
-    
-    return PriceResponse(
-        total_price=round(total_price, 2),
-        base_fare=round(base_fare, 2),
-        surge_multiplier=round(surge, 2),
-        breakdown={"rate": base_rate_per_km, "dist": req.distance_km}
+    lat, lng = (req.origin.lat, req.origin.lng) if req.origin is not None else (None, None)
+    return PriceResponse(**pricing_engine.quote(req.distance_km, req.weight, req.origin_city, lat=lat, lng=lng))
+
+@app.post("/predict-price-batch", response_model=PriceBatchResponse)
+def dynamic_pricing_batch(req: PriceBatchRequest):
+    """
+    Dynamic Pricing for many quotes in one vectorized pass (e.g. re-quoting
+    every open load). Columns in, columns out, in input order.
+    """
+    try:
+        quotes = pricing_engine.quote_batch(req.distance_km, req.weight, req.origin_city,
+                                            lats=req.origin_lat, lngs=req.origin_lng)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return PriceBatchResponse.model_construct(
+        **{key: [round(x, 2) for x in values.tolist()] for key, values in quotes.items()}
     )
 
+@app.get("/pricing/stats")
+def pricing_stats():
+    return pricing_engine.stats()
+
+@app.post("/demand/events")
+def ingest_demand_events(events: List[DemandEvent]):
+    """
+    Market feed: load-created (demand) and driver-available (supply) events
+    update the sliding-window counts that drive the demand surge.
+    """
+    batches = {}
+    for e in events:
+        batches.setdefault((EVENT_KINDS[e.type], e.timestamp), []).append((e.lat, e.lng))
+    recorded = 0
+    for (kind, at), points in batches.items():
+        lats, lngs = zip(*points)
+        recorded += demand_aggregator.record_many(kind, lats, lngs, at=at)
+    return {"recorded": recorded, "rejected": len(events) - recorded, "cells": len(demand_aggregator)}
+
+@app.get("/demand/surge")
+def demand_surge(lat: float, lng: float):
+    return {
+        "geohash": geohash_encode(lat, lng, demand_aggregator.precision),
+        "surge_multiplier": round(demand_aggregator.surge_at(lat, lng), 2)
+    }
+
+@app.get("/match-log/stats")
+def match_log_stats():
+    return match_log.stats()
+
+@app.get("/demand/stats")
+def demand_stats():
+    return demand_aggregator.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,8 +1,127 @@
+import heapq
 import math
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
+import numpy as np
+
+# Distance bands (km) used by the proximity score. The vectorized path re-checks
+# distances that land right on a band edge with the scalar haversine so that
+# last-ulp differences between numpy and libm trig never change a score.
+_DISTANCE_BANDS = (10, 50, 100)
+_BAND_EDGE_TOLERANCE = 1e-6
+
+
+class DriverBatch:
+    """
+    Column-oriented fleet snapshot for vectorized scoring.
+    Home cities are stored as integer codes into `city_names` (lowercased, -1 = none).
+    """
+    def __init__(self, ids: List[Any], lats, lngs, capacities, ratings, home_city_codes,
+                 city_names: List[str], records: Optional[List[Dict[str, Any]]] = None):
+        self.ids = ids
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.capacities = np.asarray(capacities, dtype=np.float64)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.home_city_codes = np.asarray(home_city_codes, dtype=np.int32)
+        self.city_names = city_names
+        self.city_index = {name: code for code, name in enumerate(city_names)}
+        self.records = records
+
+    def __len__(self):
+        return len(self.ids)
+
+    def without_records(self) -> "DriverBatch":
+        """The same columns without the source dicts (cheap to pickle to a worker)."""
+        return DriverBatch(self.ids, self.lats, self.lngs, self.capacities, self.ratings,
+                           self.home_city_codes, self.city_names)
+
+    @classmethod
+    def from_dicts(cls, drivers: List[Dict[str, Any]]) -> "DriverBatch":
+        """Builds a batch from the driver dicts accepted by `match_driver_to_load`."""
+        n = len(drivers)
+        lats = np.empty(n)
+        lngs = np.empty(n)
+        capacities = np.empty(n)
+        ratings = np.empty(n)
+        codes = np.empty(n, dtype=np.int32)
+        city_index: Dict[str, int] = {}
+        ids = []
+
+        for i, driver in enumerate(drivers):
+            loc = driver.get("location")
+            lats[i] = loc["lat"]
+            lngs[i] = loc["lng"]
+            capacities[i] = driver.get("capacity", 0)
+            ratings[i] = driver.get("rating", 0)
+            ids.append(driver.get("id"))
+
+            home_city = driver.get("home_city", "")
+            if home_city:
+                codes[i] = city_index.setdefault(home_city.lower(), len(city_index))
+            else:
+                codes[i] = -1
+
+        return cls(ids, lats, lngs, capacities, ratings, codes, list(city_index), records=drivers)
+
+    @classmethod
+    def from_columns(cls, ids: List[Any], lats, lngs, ratings, capacities=None,
+                     home_cities: Optional[List[Optional[str]]] = None) -> "DriverBatch":
+        """
+        Builds a batch from parallel columns (columnar request payloads) without
+        creating a per-driver object. Missing capacity / home city columns get
+        the same defaults as `match_driver_to_load` (0 and no city).
+        Raises ValueError unless every column is a flat list of the right type
+        and length (string ids, finite numbers, string or null home cities).
+        """
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise ValueError("Column 'ids' must be a list of strings")
+        n = len(ids)
+        lats = _number_column("lats", lats, n)
+        lngs = _number_column("lngs", lngs, n)
+        ratings = _number_column("ratings", ratings, n)
+        capacities = np.zeros(n) if capacities is None else _number_column("capacities", capacities, n)
+
+        if home_cities is None:
+            codes = np.full(n, -1, dtype=np.int32)
+            city_names: List[str] = []
+        else:
+            if not isinstance(home_cities, list) or not all(c is None or isinstance(c, str) for c in home_cities):
+                raise ValueError("Column 'home_cities' must be a list of strings or nulls")
+            if len(home_cities) != n:
+                raise ValueError(f"Column 'home_cities' has {len(home_cities)} values, expected {n}")
+            lowered = np.asarray([c.lower() if c else "" for c in home_cities], dtype=str)
+            names, inverse = np.unique(lowered, return_inverse=True)
+            city_names = names.tolist()
+            codes = inverse.astype(np.int32)
+            if city_names and city_names[0] == "":
+                # "" sorts first: shift so "no city" becomes -1
+                codes -= 1
+                city_names = city_names[1:]
+
+        return cls(ids, lats, lngs, capacities, ratings, codes, city_names)
+
+
+def _number_column(name: str, values, n: int) -> np.ndarray:
+    """A columnar payload list of `n` finite numbers as float64 (ValueError otherwise)."""
+    # No dtype: nulls, strings and booleans must not be coerced to numbers
+    try:
+        column = np.asarray(values) if isinstance(values, list) else None
+    except ValueError:  # ragged nested lists
+        column = None
+    if column is None or column.ndim != 1 or (column.size and column.dtype.kind not in "iuf"):
+        raise ValueError(f"Column '{name}' must be a list of numbers")
+    if len(column) != n:
+        raise ValueError(f"Column '{name}' has {len(column)} values, expected {n}")
+    column = column.astype(np.float64)
+    if not np.isfinite(column).all():
+        raise ValueError(f"Column '{name}' has non-finite values")
+    return column
 
 class MatchingEngine:
+    # Recorded with every logged match (see matchlog.py); bump when the scoring changes
+    version = "weighted-v1"
+
     def __init__(self):
         # Weights for the scoring algorithm (Feature 2: Truck Owner AI)
         self.weights = {
@@ -27,10 +146,12 @@ class MatchingEngine:
         d = R * c
         return d
 
-    def match_driver_to_load(self, load_request: Dict[str, Any], available_drivers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def match_driver_to_load(self, load_request: Dict[str, Any], available_drivers: List[Dict[str, Any]],
+                             top_k: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Feature 2: Truck Owner AI (Smart Load Matching)
         Returns the Best Match drivers based on weighted scoring.
+        With `top_k`, only the best k are kept (heap selection, no full sort).
         """
         scored_drivers = []
         
@@ -143,10 +264,179 @@ class MatchingEngine:
             })
 
         # Sort by score descending and return "Best Match"
+        if top_k is not None and top_k < len(scored_drivers):
+            # Same result and tie order as sorted(...)[:top_k]
+            return heapq.nlargest(top_k, scored_drivers, key=lambda x: x["total_score"])
+
         scored_drivers.sort(key=lambda x: x["total_score"], reverse=True)
         
         return scored_drivers
 
+    def _haversine_np(self, lat1: float, lon1: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Vectorized `_calculate_haversine` from one point to many."""
+        R = 6371
+        dlat = np.radians(lats - lat1)
+        dlon = np.radians(lngs - lon1)
+        a = (np.sin(dlat / 2) * np.sin(dlat / 2) +
+             math.cos(math.radians(lat1)) * np.cos(np.radians(lats)) *
+             np.sin(dlon / 2) * np.sin(dlon / 2))
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        return R * c
+
+    def score_batch(self, load_request: Dict[str, Any], batch: DriverBatch):
+        """
+        Computes the weighted score of every driver in `batch` in one pass.
+        Returns (raw_scores, distance_km, component_scores) as arrays; the
+        arithmetic mirrors `match_driver_to_load` operation for operation.
+        """
+        load_origin = load_request.get("origin")
+        required_capacity = load_request.get("weight", 0)
+        load_dest_city = load_request.get("destination_city", "Unknown")
+
+        distance = self._haversine_np(load_origin["lat"], load_origin["lng"], batch.lats, batch.lngs)
+        near_edge = np.zeros(len(batch), dtype=bool)
+        for edge in _DISTANCE_BANDS:
+            near_edge |= np.abs(distance - edge) < _BAND_EDGE_TOLERANCE
+        for i in np.flatnonzero(near_edge):
+            distance[i] = self._calculate_haversine(
+                load_origin["lat"], load_origin["lng"], batch.lats[i], batch.lngs[i]
+            )
+
+        dist_score = np.where(distance < 10, 100,
+                     np.where(distance < 50, 70,
+                     np.where(distance < 100, 40, 10)))
+        capacity_score = np.where(batch.capacities >= required_capacity, 100, 0)
+        rating_score = batch.ratings * 20
+
+        dest_code = batch.city_index.get(load_dest_city.lower(), -2) if load_dest_city else -2
+        backhaul_score = np.where(batch.home_city_codes == dest_code, 100, 0)
+
+        score = dist_score * self.weights["proximity"]
+        score += capacity_score * self.weights["capacity"]
+        score += rating_score * self.weights["rating"]
+        score += backhaul_score * self.weights["backhaul"]
+
+        components = {
+            "distance_score": dist_score,
+            "capacity_score": capacity_score,
+            "rating_score": rating_score,
+            "backhaul_score": backhaul_score,
+        }
+        return score, distance, components
+
+    def score_matrix(self, load_requests: List[Dict[str, Any]], batch: DriverBatch):
+        """
+        Load x driver score and distance matrices, one vectorized row per load.
+        """
+        scores = np.empty((len(load_requests), len(batch)))
+        distances = np.empty((len(load_requests), len(batch)))
+        for row, load_request in enumerate(load_requests):
+            scores[row], distances[row], _ = self.score_batch(load_request, batch)
+        return scores, distances
+
+    def _rank(self, keys: np.ndarray, top_k: Optional[int]) -> np.ndarray:
+        """
+        Indices of the best `top_k` keys in descending order. Ties keep input
+        order, exactly like the stable `list.sort` of the scalar path.
+        """
+        n = len(keys)
+        if top_k is None or top_k >= n:
+            return np.argsort(-keys, kind="stable")
+        if top_k <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        kth = np.partition(keys, n - top_k)[n - top_k]
+        above = np.flatnonzero(keys > kth)
+        ties = np.flatnonzero(keys == kth)[:top_k - len(above)]
+        selected = np.sort(np.concatenate([above, ties]))
+        return selected[np.argsort(-keys[selected], kind="stable")]
+
+    def rank_scores(self, score: np.ndarray, top_k: Optional[int] = None,
+                    eligible: Optional[np.ndarray] = None, distance: Optional[np.ndarray] = None,
+                    ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Indices of the best `top_k` raw scores, best first (ranked on the
+        rounded score). Drivers where `eligible` is False are never returned.
+        Ties keep input order, or with `distance` rank nearest first and then
+        by `ids`, the order /match gives registry candidates (which come
+        sorted by distance, then id).
+        """
+        keys = np.round(score, 2)
+        if eligible is not None:
+            n_eligible = int(np.count_nonzero(eligible))
+            keys = np.where(eligible, keys, -np.inf)
+            top_k = n_eligible if top_k is None else min(top_k, n_eligible)
+        if distance is None:
+            return self._rank(keys, top_k)
+
+        n = len(keys)
+        if top_k is not None and top_k <= 0:
+            return np.empty(0, dtype=np.intp)
+        if top_k is None or top_k >= n:
+            selected = np.arange(n)
+        else:
+            # Everything tied with the k-th key, so the tie-break picks among them
+            selected = np.flatnonzero(keys >= np.partition(keys, n - top_k)[n - top_k])
+        sort_keys = (distance[selected], -keys[selected])
+        order = selected[np.lexsort(sort_keys)]
+        if ids is not None and len(order) > 1:
+            # Ids only matter (and cost a string sort) when score and distance both tie
+            same = (keys[order[1:]] == keys[order[:-1]]) & (distance[order[1:]] == distance[order[:-1]])
+            if same.any():
+                order = selected[np.lexsort((ids[selected],) + sort_keys)]
+        return order[:top_k]
+
+    def rank_batch(self, load_request: Dict[str, Any], batch: DriverBatch, top_k: Optional[int] = None):
+        """
+        Scores `batch` and ranks it like `match_driver_to_load`.
+        Returns (order, raw_scores, distance_km, component_scores); `order`
+        holds the indices of the best `top_k` drivers, best first.
+        """
+        score, distance, components = self.score_batch(load_request, batch)
+        return self.rank_scores(score, top_k), score, distance, components
+
+    def match_driver_batch(self, load_request: Dict[str, Any], batch: DriverBatch,
+                           top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Vectorized equivalent of `match_driver_to_load` over a `DriverBatch`.
+        Scores and ranking are identical to the scalar path (distance_km may differ
+        in the last ulp). Only the best `top_k` drivers are materialized
+        (partial selection, no full sort).
+        """
+        if len(batch) == 0:
+            return []
+
+        order, score, distance, components = self.rank_batch(load_request, batch, top_k)
+
+        # Gather the selected rows once and convert to Python scalars in bulk
+        ids = batch.ids
+        records = batch.records
+        rows = zip(
+            order.tolist(),
+            score[order].tolist(),
+            distance[order].tolist(),
+            components["distance_score"][order].tolist(),
+            components["capacity_score"][order].tolist(),
+            components["rating_score"][order].tolist(),
+            components["backhaul_score"][order].tolist(),
+        )
+
+        results = []
+        for i, raw, dist_km, dist_score, capacity_score, rating_score, backhaul_score in rows:
+            results.append({
+                "driver_id": ids[i],
+                "total_score": round(raw, 2),
+                "details": {
+                    "distance_score": dist_score,
+                    "distance_km": dist_km,
+                    "capacity_score": capacity_score,
+                    "rating_score": rating_score,
+                    "backhaul_score": backhaul_score,
+                },
+                "driver_data": records[i] if records is not None else None
+            })
+        return results
+
 # Example Usage Logic (if run directly)
 if __name__ == "__main__":
     engine = MatchingEngine()
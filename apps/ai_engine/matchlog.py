@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import insert
+
+from models import MatchLog
+
+logger = logging.getLogger(__name__)
+
+
+class MatchLogWriter:
+    """
+    Write-behind persistence of match results to `MatchLog`.
+    `log` only appends one entry per request (ids, scores and feature
+    columns as given) to a bounded in-memory queue; a background thread turns
+    entries into rows and bulk-inserts them once `batch_rows` are waiting or
+    `flush_s` has passed. When `max_rows` are already queued the new entry is
+    dropped and counted rather than blocking the request. `stop` drains
+    the queue.
+    """
+    def __init__(self, session_factory=None, algorithm_version: str = "", max_rows: int = 100000,
+                 batch_rows: int = 1000, flush_s: float = 2.0):
+        self.session_factory = session_factory
+        self.algorithm_version = algorithm_version
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.flush_s = flush_s
+
+        self._entries: deque = deque()
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.logged_rows = 0
+        self.dropped_rows = 0
+        self.written_rows = 0
+        self.failed_rows = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None
+
+    def log(self, load_id: str, driver_ids: Sequence[Any], scores: Sequence[float],
+            features: Optional[Dict[str, Sequence[Any]]] = None, algorithm_version: Optional[str] = None) -> bool:
+        """
+        Queues one row per driver; `features` holds a column (list or array)
+        per feature name. Returns False if the entry was dropped (queue full) or logging is off.
+        """
+        n = len(driver_ids)
+        if not self.enabled or n == 0:
+            return False
+        with self._cond:
+            if self._pending_rows + n > self.max_rows:
+                self.dropped_rows += n
+                return False
+            self._entries.append((load_id, driver_ids, scores, features or {},
+                                  algorithm_version or self.algorithm_version, datetime.utcnow()))
+            self._pending_rows += n
+            self.logged_rows += n
+            if self._pending_rows >= self.batch_rows:
+                self._cond.notify()
+        return True
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="matchlog-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the writer after flushing everything still queued."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            deadline = time.monotonic() + self.flush_s
+            with self._cond:
+                while not self._stop and self._pending_rows < self.batch_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                entries = list(self._entries)
+                self._entries.clear()
+                self._pending_rows = 0
+                stopping = self._stop
+            if entries:
+                self._write(entries)
+            if stopping:
+                return
+
+    def _write(self, entries: List[tuple]):
+        rows = []
+        for load_id, driver_ids, scores, features, version, created_at in entries:
+            names = list(features)
+            # Arrays are converted here, off the request path
+            columns = [features[name].tolist() if hasattr(features[name], "tolist") else features[name]
+                       for name in names]
+            for i, (driver_id, score) in enumerate(zip(driver_ids, scores)):
+                rows.append({
+                    "load_id": load_id,
+                    "driver_id": str(driver_id),
+                    "match_score": float(score),
+                    "algorithm_version": version,
+                    "features_used": {name: column[i] for name, column in zip(names, columns)},
+                    "created_at": created_at,
+                })
+
+        for lo in range(0, len(rows), self.batch_rows):
+            chunk = rows[lo:lo + self.batch_rows]
+            try:
+                with self.session_factory() as session:
+                    session.execute(insert(MatchLog), chunk)
+                    session.commit()
+                self.written_rows += len(chunk)
+            except Exception as e:
+                self.failed_rows += len(chunk)
+                logger.warning("Match log flush failed (%d rows dropped): %s", len(chunk), e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued_rows": self._pending_rows,
+            "max_rows": self.max_rows,
+            "logged_rows": self.logged_rows,
+            "dropped_rows": self.dropped_rows,
+            "written_rows": self.written_rows,
+            "failed_rows": self.failed_rows,
+        }
@@ -0,0 +1,300 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+
+# Prometheus text exposition format (version 0.0.4)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+PATH_BUCKETS = (2, 5, 10, 20, 50, 100, 200, 500, 1000)
+DISTANCE_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """
+    A metric family: one child per label-value tuple. Children are created
+    once (under a lock) and then updated without locking; a child's
+    `+=` can in rare cases lose an update under heavy thread contention,
+    which is accepted so the request path never waits on a lock.
+    """
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Fixed buckets (upper bounds, inclusive) allocated once per child."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self, values, child):
+        counts = list(child.counts)
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {total}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class _Callback:
+    """Value read at scrape time (e.g. from an engine's stats())."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float], kind: str):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(self.fn())}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge"):
+        return self._add(_Callback(name, help, fn, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                continue  # a failing callback must not break the scrape
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "ai_engine_http_request_duration_seconds",
+    "Time from routing to the endpoint's response (excludes streamed bodies).",
+    ("route", "method"))
+REQUESTS = REGISTRY.counter(
+    "ai_engine_http_requests_total", "Requests handled, by status code.", ("route", "method", "status"))
+IN_FLIGHT = REGISTRY.gauge(
+    "ai_engine_http_requests_in_flight", "Requests currently being handled.", ("route",))
+VALIDATION_LATENCY = REGISTRY.histogram(
+    "ai_engine_http_request_validation_seconds",
+    "Body parsing and pydantic validation before the endpoint runs.", ("route",))
+ROUTE_NODES_EXPANDED = REGISTRY.histogram(
+    "ai_engine_route_nodes_expanded", "Nodes expanded per route search (cache misses).",
+    ("algorithm",), COUNT_BUCKETS)
+ROUTE_PATH_NODES = REGISTRY.histogram(
+    "ai_engine_route_path_nodes", "Nodes on each computed route.", ("algorithm",), PATH_BUCKETS)
+ROUTE_DISTANCE_KM = REGISTRY.histogram(
+    "ai_engine_route_distance_km", "Length of each computed route.", ("algorithm",), DISTANCE_BUCKETS)
+DRIVERS_SCORED = REGISTRY.histogram(
+    "ai_engine_match_drivers_scored", "Drivers scored per matching call.", ("endpoint",), COUNT_BUCKETS)
+
+# [handler start, endpoint start] of the current request, shared with the
+# endpoint wrapper (also when the endpoint runs in the threadpool)
+_request_marks: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_marks", default=None)
+
+
+def _mark_endpoint_start():
+    marks = _request_marks.get()
+    if marks is not None and len(marks) == 1:
+        marks.append(time.perf_counter())
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            _mark_endpoint_start()
+            return await call(*args, **kwargs)
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            _mark_endpoint_start()
+            return call(*args, **kwargs)
+    return endpoint
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute that records latency, status and in-flight counts per route
+    template, plus the time FastAPI spends parsing and validating the
+    request before the endpoint is called. Set as `app.router.route_class`
+    before the endpoints are declared.
+    """
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        route, method = self.path, ",".join(sorted(self.methods or ()))
+        latency = REQUEST_LATENCY.labels(route, method)
+        validation = VALIDATION_LATENCY.labels(route)
+        in_flight = IN_FLIGHT.labels(route)
+
+        async def instrumented_handler(request):
+            marks = [time.perf_counter()]
+            token = _request_marks.set(marks)
+            in_flight.inc()
+            status = "error"
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            except HTTPException as e:
+                status = str(e.status_code)
+                raise
+            except RequestValidationError:
+                status = "422"
+                raise
+            finally:
+                in_flight.dec()
+                _request_marks.reset(token)
+                end = time.perf_counter()
+                latency.observe(end - marks[0])
+                if len(marks) > 1:
+                    validation.observe(marks[1] - marks[0])
+                REQUESTS.labels(route, method, status).inc()
+
+        return instrumented_handler
+
+
+def observe_route(algorithm: str, result: Dict[str, Any]):
+    """Search effort of a computed (not cached) route."""
+    if "error" in result:
+        return
+    ROUTE_NODES_EXPANDED.labels(algorithm).observe(result.get("nodes_expanded", 0))
+    ROUTE_PATH_NODES.labels(algorithm).observe(result.get("steps", 0))
+    ROUTE_DISTANCE_KM.labels(algorithm).observe(result.get("total_distance_km", 0))
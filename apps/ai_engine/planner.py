@@ -0,0 +1,275 @@
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Matrix cost of pairs with no path; large enough that no move keeps them
+_UNREACHABLE = 1e9
+# Objective cost per minute of arriving after a stop's window closes
+LATE_PENALTY = 1.0
+
+
+class _Problem:
+    """
+    Matrices over node 0 = start and 1..n = stops: `cost` (route optimizer
+    cost), `minutes` (travel time, only with time windows), per-stop demand,
+    windows (minutes after departure) and service times.
+    """
+    def __init__(self, cost: np.ndarray, minutes: Optional[np.ndarray], demand: List[float],
+                 windows: List[Tuple[Optional[float], Optional[float]]], service: List[float],
+                 capacity: Optional[float], return_to_start: bool):
+        self.cost = np.where(np.isinf(cost), _UNREACHABLE, cost).tolist()
+        self.minutes = np.where(np.isinf(minutes), _UNREACHABLE, minutes).tolist() if minutes is not None else None
+        self.demand = [0.0] + list(demand)
+        self.windows = [(None, None)] + list(windows)
+        self.service = [0.0] + list(service)
+        self.capacity = capacity
+        self.return_to_start = return_to_start
+
+    def load(self, route: List[int]) -> float:
+        return sum(self.demand[i] for i in route)
+
+    def fits(self, route: List[int]) -> bool:
+        return self.capacity is None or self.load(route) <= self.capacity + 1e-9
+
+    def reachable(self, route: List[int]) -> bool:
+        """True when every leg of `route` (and the way back, if any) has a path."""
+        prev = 0
+        for i in route:
+            if self.cost[prev][i] >= _UNREACHABLE:
+                return False
+            prev = i
+        return not (self.return_to_start and route and self.cost[prev][0] >= _UNREACHABLE)
+
+    def schedule(self, route: List[int], leg_minutes=None) -> Tuple[List[float], float]:
+        """
+        (arrival minute at each stop, total minutes late); waits when early.
+        Legs take `minutes` unless `leg_minutes(prev, i, t)` times them from
+        the minute `t` the vehicle leaves `prev`.
+        """
+        if self.minutes is None:
+            return [], 0.0
+        t, late, prev, arrivals = 0.0, 0.0, 0, []
+        for i in route:
+            t += self.minutes[prev][i] if leg_minutes is None else leg_minutes(prev, i, t)
+            start, end = self.windows[i]
+            if start is not None and t < start:
+                t = start
+            arrivals.append(t)
+            if end is not None and t > end:
+                late += t - end
+            t += self.service[i]
+            prev = i
+        return arrivals, late
+
+    def route_cost(self, route: List[int]) -> float:
+        if not route:
+            return 0.0
+        c, prev = 0.0, 0
+        for i in route:
+            c += self.cost[prev][i]
+            prev = i
+        if self.return_to_start:
+            c += self.cost[prev][0]
+        return c
+
+    def objective(self, route: List[int]) -> float:
+        return self.route_cost(route) + LATE_PENALTY * self.schedule(route)[1]
+
+
+def _construct(p: _Problem, stops: List[int]) -> Tuple[List[List[int]], List[int]]:
+    """
+    Insertion construction: stops by earliest window end (then farthest from
+    the start first), each at its cheapest position in a route with room
+    for it and a path through it, opening a new route when none has.
+    Returns (routes, stops no route can reach).
+    """
+    def key(i):
+        end = p.windows[i][1]
+        return (end if end is not None else math.inf, -p.cost[0][i])
+
+    routes: List[List[int]] = []
+    unreachable: List[int] = []
+    for i in sorted(stops, key=key):
+        best = None
+        for r, route in enumerate(routes):
+            if not p.fits(route + [i]):
+                continue
+            base = p.objective(route)
+            for pos in range(len(route) + 1):
+                candidate = route[:pos] + [i] + route[pos:]
+                if not p.reachable(candidate):
+                    continue
+                delta = p.objective(candidate) - base
+                if best is None or delta < best[0]:
+                    best = (delta, r, pos)
+        if best is not None:
+            _, r, pos = best
+            routes[r].insert(pos, i)
+        elif p.reachable([i]):
+            routes.append([i])
+        else:
+            unreachable.append(i)
+    return routes, unreachable
+
+
+def _two_opt(p: _Problem, route: List[int], deadline: float) -> bool:
+    """First-improvement 2-opt (segment reversal) within one route."""
+    best = p.objective(route)
+    for i in range(len(route) - 1):
+        for j in range(i + 1, len(route)):
+            if time.perf_counter() > deadline:
+                return False
+            candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+            value = p.objective(candidate)
+            if value < best - 1e-9:
+                route[:] = candidate
+                return True
+    return False
+
+
+def _or_opt(p: _Problem, routes: List[List[int]], deadline: float) -> bool:
+    """First-improvement Or-opt: moves a run of 1-3 stops to another position, in any route."""
+    for a, src in enumerate(routes):
+        for length in (1, 2, 3):
+            for i in range(len(src) - length + 1):
+                segment = src[i:i + length]
+                rest = src[:i] + src[i + length:]
+                for b, dst in enumerate(routes):
+                    target = rest if a == b else dst
+                    if a != b and not p.fits(dst + segment):
+                        continue
+                    before = p.objective(src) + (p.objective(dst) if a != b else 0.0)
+                    for pos in range(len(target) + 1):
+                        if a == b and pos == i:
+                            continue
+                        if time.perf_counter() > deadline:
+                            return False
+                        for seg in (segment, segment[::-1]) if length > 1 else (segment,):
+                            moved = target[:pos] + seg + target[pos:]
+                            after = p.objective(moved) + (p.objective(rest) if a != b else 0.0)
+                            if after < before - 1e-9:
+                                if a == b:
+                                    routes[a] = moved
+                                else:
+                                    routes[a], routes[b] = rest, moved
+                                return True
+    return False
+
+
+def solve_routes(p: _Problem, stops: List[int],
+                 time_budget_s: float) -> Tuple[List[List[int]], List[int], bool]:
+    """
+    Construction plus 2-opt / Or-opt local search until no move improves or
+    the time budget runs out. A leg with no path costs _UNREACHABLE, so no
+    improving move ever adds one. Returns (routes of stop indexes, stops no
+    route can reach, converged).
+    """
+    deadline = time.perf_counter() + time_budget_s
+    routes, unreachable = _construct(p, stops)
+    converged = False
+    while time.perf_counter() <= deadline:
+        improved = any([_two_opt(p, route, deadline) for route in routes])
+        improved = _or_opt(p, routes, deadline) or improved
+        routes = [route for route in routes if route]
+        if not improved:
+            converged = time.perf_counter() <= deadline
+            break
+    return routes, unreachable, converged
+
+
+def plan_stops(optimizer, start_node: str, stops: List[Dict[str, Any]], capacity: Optional[float] = None,
+               return_to_start: bool = False, departure: Optional[float] = None,
+               time_budget_s: float = 0.5) -> Dict[str, Any]:
+    """
+    Orders the drops of a multi-stop load on `optimizer`'s road graph.
+    `stops` are {"node", "demand"?, "window_start"?, "window_end"? (unix
+    seconds), "service_min"?}. The cost matrix (and, with time windows,
+    travel times) is built once with one search per stop; the order is then
+    improved under `time_budget_s`. The search times every leg as if it
+    left at `departure` (one matrix for all orders), an approximation on
+    routes that run into other traffic hours; the reported arrivals and
+    late stops re-time each leg from when the vehicle actually leaves.
+    With `capacity`, stops are split over as many vehicle routes as needed.
+    Each route has the `_reconstruct_path` fields plus its stop order.
+    """
+    g = optimizer.graph
+    start = g.node_id(start_node)
+    if start is None:
+        return {"error": "Start node not found in graph"}
+    departure = departure if departure is not None else time.time()
+
+    ids = [g.node_id(s["node"]) for s in stops]
+    unknown = sorted({s["node"] for s, i in zip(stops, ids) if i is None})
+    known = [k for k, i in enumerate(ids) if i is not None]
+    nodes = [start] + [ids[k] for k in known]
+
+    # One search per matrix row serves every column
+    cost = np.array([optimizer.one_to_many(u, nodes)[0] for u in nodes])
+    has_windows = any(stops[k].get("window_start") is not None or stops[k].get("window_end") is not None
+                      for k in known)
+    minutes = None
+    if has_windows:
+        minutes = np.array([optimizer.arrival_times(u, nodes, departure)[0] for u in nodes]) * 60
+
+    def minute(value):
+        return (value - departure) / 60 if value is not None else None
+
+    p = _Problem(
+        cost, minutes,
+        demand=[float(stops[k].get("demand") or 0) for k in known],
+        windows=[(minute(stops[k].get("window_start")), minute(stops[k].get("window_end"))) for k in known],
+        service=[float(stops[k].get("service_min") or 0) for k in known],
+        capacity=capacity, return_to_start=return_to_start
+    )
+    # Too heavy for any vehicle; stops no route can reach are left out by the search
+    servable = [i for i in range(1, len(nodes)) if capacity is None or p.demand[i] <= capacity]
+
+    t0 = time.perf_counter()
+    routes, unreachable, converged = solve_routes(p, servable, time_budget_s)
+    search_ms = (time.perf_counter() - t0) * 1000
+    routed = {i for route in routes for i in route}
+    unserved = sorted([k for k, i in enumerate(ids) if i is None] +
+                      [known[i - 1] for i in range(1, len(nodes)) if i not in routed])
+
+    def leg_minutes(a: int, b: int, t: float) -> float:
+        hours = optimizer.arrival_times(nodes[a], [nodes[b]], departure + t * 60)[0][0]
+        return hours * 60
+
+    planned = []
+    for route in routes:
+        arrivals, late = p.schedule(route, leg_minutes if has_windows else None)
+        waypoints = [start] + [nodes[i] for i in route] + ([start] if return_to_start else [])
+        path = [g.name(start)]
+        total_dist = 0.0
+        total_score = 0.0
+        for a, b in zip(waypoints, waypoints[1:]):
+            leg, _ = optimizer.compute_route(g.name(a), g.name(b))
+            if "error" in leg:
+                # The matrix had a path for every leg; graph structure never changes
+                raise RuntimeError(f"No path for planned leg {g.name(a)} -> {g.name(b)}")
+            path.extend(leg["route"][1:])
+            total_dist += leg["total_distance_km"]
+            total_score += leg["optimization_score"]
+        planned.append({
+            "route": path,
+            "total_distance_km": total_dist,
+            "optimization_score": round(total_score, 2),
+            "steps": len(path),
+            "stops": [known[i - 1] for i in route],
+            "load": p.load(route),
+            "arrivals": [departure + m * 60 for m in arrivals] if has_windows else None,
+            "late_stops": [known[i - 1] for i, m in zip(route, arrivals)
+                           if p.windows[i][1] is not None and m > p.windows[i][1] + 1e-9],
+        })
+
+    return {
+        "routes": planned,
+        "total_distance_km": sum(r["total_distance_km"] for r in planned),
+        "optimization_score": round(sum(r["optimization_score"] for r in planned), 2),
+        "unserved_stops": unserved,
+        "unknown_nodes": unknown,
+        "converged": converged,
+        "search_ms": round(search_ms, 2),
+    }
@@ -0,0 +1,58 @@
+import csv
+from typing import Any, Dict, List, Optional
+
+from geo import GridIndex
+
+
+class POIIndex:
+    """
+    Points of interest (hospitals, police, fuel, repair...) in one GridIndex
+    per category, so a k-nearest query only scans the cells around the
+    query point (ranked by haversine distance) instead of the whole dataset.
+    """
+    def __init__(self, cell_deg: float = 0.1):
+        self.cell_deg = cell_deg
+        self.indexes: Dict[str, GridIndex] = {}
+        self.records: List[Dict[str, Any]] = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, category: str, name: str, lat: float, lng: float, **info) -> int:
+        category = category.strip().lower()
+        poi_id = len(self.records)
+        self.records.append({"name": name, "category": category, "lat": lat, "lng": lng, **info})
+        self.indexes.setdefault(category, GridIndex(self.cell_deg)).insert(poi_id, lat, lng)
+        return poi_id
+
+    @classmethod
+    def from_csv(cls, path: str, cell_deg: float = 0.1) -> "POIIndex":
+        """
+        Loads `name,category,lat,lng` rows; any other columns (phone,
+        address...) are returned with the matches.
+        """
+        index = cls(cell_deg)
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            pos = {column: header.index(column) for column in ("name", "category", "lat", "lng")}
+            extra = [(i, column) for i, column in enumerate(header) if column not in pos]
+            for row in reader:
+                info = {column: row[i] for i, column in extra if row[i]}
+                index.add(row[pos["category"]], row[pos["name"]],
+                          float(row[pos["lat"]]), float(row[pos["lng"]]), **info)
+        return index
+
+    def counts(self) -> Dict[str, int]:
+        return {category: len(index) for category, index in self.indexes.items()}
+
+    def nearest(self, category: str, lat: float, lng: float, k: int = 1,
+                max_radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The `k` nearest POIs of `category`, nearest first, each with `distance` in km."""
+        index = self.indexes.get(category.strip().lower())
+        if index is None:
+            return []
+        return [
+            {**self.records[poi_id], "distance": round(d, 2)}
+            for d, poi_id in index.nearest(lat, lng, k=k, max_radius_km=max_radius_km)
+        ]
@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from models import PricingRule
+
+logger = logging.getLogger(__name__)
+
+# Used when no database is configured, and for cities without an active rule.
+# Same numbers as the original hard-coded /predict-price.
+DEFAULT_BASE_RATES = {"Mumbai": 20, "Delhi": 18, "Bangalore": 22, "Pune": 19}
+DEFAULT_RULE = {"base_rate_per_km": 20, "min_fare": 0, "night_multiplier": 1.0, "peak_multiplier": 1.5}
+
+HEAVY_WEIGHT = 5          # tonnes; heavier loads pay the weight factor
+HEAVY_WEIGHT_FACTOR = 1.2
+
+
+def is_peak_hour(hour: int) -> bool:
+    return 8 <= hour <= 11 or 17 <= hour <= 21
+
+
+def is_night_hour(hour: int) -> bool:
+    return hour >= 22 or hour < 6
+
+
+class RateTable:
+    """
+    Immutable snapshot of the pricing rules: a dict for single quotes and
+    parallel arrays (indexed by city code, last row = default) for batches.
+    The engine swaps in a new table on refresh, so readers never lock.
+    """
+    COLUMNS = ("base_rate_per_km", "min_fare", "night_multiplier", "peak_multiplier")
+
+    def __init__(self, rules: Dict[str, Dict[str, float]], source: str):
+        self.rules = rules
+        self.source = source
+        self.city_index = {city: code for code, city in enumerate(rules)}
+        rows = list(rules.values()) + [DEFAULT_RULE]
+        self.columns = {key: np.array([row[key] for row in rows], dtype=np.float64) for key in self.COLUMNS}
+
+    @classmethod
+    def defaults(cls) -> "RateTable":
+        return cls({city: {**DEFAULT_RULE, "base_rate_per_km": rate} for city, rate in DEFAULT_BASE_RATES.items()},
+                   source="defaults")
+
+    def rule(self, city: str) -> Dict[str, float]:
+        return self.rules.get(city, DEFAULT_RULE)
+
+    def codes(self, cities: Sequence[str]) -> np.ndarray:
+        """City code per entry (default row for unknown cities), one dict lookup per distinct city."""
+        default = len(self.rules)
+        names, inverse = np.unique(np.asarray(cities, dtype=object).astype(str), return_inverse=True)
+        lookup = np.array([self.city_index.get(name, default) for name in names.tolist()], dtype=np.int64)
+        return lookup[inverse.reshape(-1)]
+
+
+class PricingEngine:
+    """
+    Dynamic pricing from the active `PricingRule` rows.
+    Rules are loaded into an in-memory RateTable and reloaded every
+    `refresh_s` by a background thread, so quoting never touches the database.
+    Without a database (or until the first load succeeds) the built-in rates
+    apply; a failed reload keeps the last good table.
+    With a `demand` aggregator, quotes that carry an origin position are also
+    multiplied by the live demand/supply surge of that geohash cell.
+    """
+    def __init__(self, session_factory=None, refresh_s: float = 60.0, demand=None):
+        self.session_factory = session_factory
+        self.refresh_s = refresh_s
+        self.demand = demand  # Optional[demand.DemandAggregator]
+        self.table = RateTable.defaults()
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """Reloads the rules from the database; returns False if that failed."""
+        if self.session_factory is None:
+            return False
+        try:
+            with self.session_factory() as session:
+                rows = (session.query(PricingRule)
+                        .filter(PricingRule.is_active.is_(True))
+                        .order_by(PricingRule.created_at, PricingRule.id)
+                        .all())
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Pricing rule refresh failed, keeping %s table: %s", self.table.source, e)
+            return False
+
+        # Defaults for cities without a rule; the newest active rule per city wins
+        rules = dict(RateTable.defaults().rules)
+        for row in rows:
+            rules[row.city] = {
+                "base_rate_per_km": row.base_rate_per_km,
+                "min_fare": row.min_fare,
+                "night_multiplier": row.night_multiplier if row.night_multiplier is not None else 1.0,
+                "peak_multiplier": row.peak_multiplier if row.peak_multiplier is not None else 1.0,
+            }
+        self.table = RateTable(rules, source="database")
+        self.loaded_at = time.time()
+        self.last_error = None
+        return True
+
+    def start(self):
+        """Loads the rules now and keeps refreshing them in the background."""
+        if self.session_factory is None or self._thread is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="pricing-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_s):
+            self.refresh()
+
+    @staticmethod
+    def _surge(hour: int, rule: Dict[str, float]) -> float:
+        if is_peak_hour(hour):
+            return rule["peak_multiplier"]
+        if is_night_hour(hour):
+            return rule["night_multiplier"]
+        return 1.0
+
+    def quote(self, distance_km: float, weight: float, origin_city: str, now: Optional[datetime] = None,
+              lat: Optional[float] = None, lng: Optional[float] = None) -> Dict[str, Any]:
+        rule = self.table.rule(origin_city)
+        hour = (now or datetime.now()).hour
+
+        base_rate_per_km = rule["base_rate_per_km"]
+        base_fare = max(base_rate_per_km * distance_km, rule["min_fare"])
+        surge = self._surge(hour, rule)
+        breakdown = {"rate": base_rate_per_km, "dist": distance_km}
+        if self.demand is not None and lat is not None and lng is not None:
+            demand_surge = self.demand.surge_at(lat, lng)
+            surge *= demand_surge
+            breakdown["demand_surge"] = round(demand_surge, 2)
+        total_price = (base_fare * surge) * (HEAVY_WEIGHT_FACTOR if weight > HEAVY_WEIGHT else 1.0)
+
+        return {
+            "total_price": round(total_price, 2),
+            "base_fare": round(base_fare, 2),
+            "surge_multiplier": round(surge, 2),
+            "breakdown": breakdown
+        }
+
+    def quote_batch(self, distance_km: Sequence[float], weight: Sequence[float], origin_cities: List[str],
+                    now: Optional[datetime] = None, lats: Optional[Sequence[float]] = None,
+                    lngs: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        """
+        Vectorized `quote` for many quotes priced at the same instant.
+        Returns unrounded arrays: total_price, base_fare, surge_multiplier, rate.
+        """
+        distance_km = np.asarray(distance_km, dtype=np.float64)
+        weight = np.asarray(weight, dtype=np.float64)
+        if not (len(distance_km) == len(weight) == len(origin_cities)):
+            raise ValueError("distance_km, weight and origin_city must have the same length")
+
+        table = self.table
+        codes = table.codes(origin_cities) if len(origin_cities) else np.empty(0, dtype=np.int64)
+        hour = (now or datetime.now()).hour
+
+        rate = table.columns["base_rate_per_km"][codes]
+        base_fare = np.maximum(rate * distance_km, table.columns["min_fare"][codes])
+        if is_peak_hour(hour):
+            surge = table.columns["peak_multiplier"][codes]
+        elif is_night_hour(hour):
+            surge = table.columns["night_multiplier"][codes]
+        else:
+            surge = np.ones(len(codes))
+        if self.demand is not None and lats is not None and lngs is not None:
+            if not (len(lats) == len(lngs) == len(codes)):
+                raise ValueError("origin_lat and origin_lng must match the other columns")
+            if len(codes):
+                surge = surge * self.demand.surge_many(lats, lngs)
+        total_price = (base_fare * surge) * np.where(weight > HEAVY_WEIGHT, HEAVY_WEIGHT_FACTOR, 1.0)
+
+        return {"total_price": total_price, "base_fare": base_fare, "surge_multiplier": surge, "rate": rate}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.table.source,
+            "cities": len(self.table.rules),
+            "loaded_at": self.loaded_at,
+            "refresh_s": self.refresh_s,
+            "last_error": self.last_error,
+        }
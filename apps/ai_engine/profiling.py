@@ -0,0 +1,294 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+
+from metrics import InstrumentedRoute
+
+# Request header / query parameter asking for a profile of that request
+PROFILE_HEADER = "x-profile"
+PROFILE_PARAM = "profile"
+_TRUTHY = ("1", "true", "yes")
+
+
+class _Stats:
+    """Raw cProfile stats dict in the shape pstats.Stats loads."""
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _profiler_stats(profiler: cProfile.Profile) -> dict:
+    profiler.create_stats()
+    return profiler.stats
+
+
+def run_profiled(fn: Callable, *args):
+    """
+    Runs fn(*args) under cProfile; returns (result, raw stats or None).
+    Module-level so EnginePool can ship it to worker processes.
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return fn(*args), None  # another profiler owns the interpreter (3.12+)
+    try:
+        result = fn(*args)
+    finally:
+        profiler.disable()
+    return result, _profiler_stats(profiler)
+
+
+class _Capture:
+    """
+    One request being profiled: the event loop's share plus the parts that
+    ran elsewhere (threadpool endpoints, engine pool tasks).
+    """
+    def __init__(self, trigger: str):
+        self.trigger = trigger
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.parts: List[dict] = []
+        self._lock = threading.Lock()
+        self._profiler: Optional[cProfile.Profile] = None
+
+    def start(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return
+        self._profiler = profiler
+
+    def stop(self) -> float:
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.add(_profiler_stats(self._profiler))
+            self._profiler = None
+        return time.perf_counter() - self.t0
+
+    def add(self, stats: Optional[dict]):
+        if stats:
+            with self._lock:
+                self.parts.append(stats)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Profiles a call made on another thread for this request."""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            self.add(_profiler_stats(profiler))
+
+    def dump(self) -> bytes:
+        """The merged parts in the .prof format written by pstats.Stats.dump_stats."""
+        if not self.parts:
+            return marshal.dumps({})
+        stats = pstats.Stats(_Stats(self.parts[0]))
+        for part in self.parts[1:]:
+            stats.add(_Stats(part))
+        return marshal.dumps(stats.stats)
+
+
+# Capture of the request being handled, visible to the endpoint thread and
+# to EnginePool.run
+_capture: contextvars.ContextVar[Optional[_Capture]] = contextvars.ContextVar("profile_capture", default=None)
+
+
+def current_capture() -> Optional[_Capture]:
+    return _capture.get()
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile captures of single requests, kept in a bounded ring.
+    A request is profiled when it carries `X-Profile` (or `?profile=`) set
+    to 1 / the configured token, or, with `sample_rate`, by coin flip; a
+    sampled capture is kept only if the request took `slow_ms` or longer.
+    Only one request is profiled at a time (cProfile hooks are per thread,
+    and process-wide on 3.12+). A capture covers the event loop while the
+    request runs (other requests interleaved on it included), a threadpool
+    endpoint and the request's EnginePool tasks; other run_in_threadpool
+    work shows only as waiting. While disabled, ProfiledRoute is not
+    installed and nothing here runs.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.token: Optional[str] = None
+        self.slow_ms = 500.0
+        self.sample_rate = 0.0
+        self.captures: deque = deque(maxlen=32)
+        self.busy = 0  # requested profiles skipped because another was running
+        self._active = False
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def configure(self, enabled: bool = False, token: Optional[str] = None, slow_ms: float = 500.0,
+                  sample_rate: float = 0.0, buffer_size: int = 32):
+        self.enabled = enabled
+        self.token = token or None
+        self.slow_ms = slow_ms
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.captures = deque(self.captures, maxlen=max(1, buffer_size))
+
+    def authorized(self, value: Optional[str]) -> bool:
+        if value is None:
+            return False
+        if self.token is not None:
+            return hmac.compare_digest(value, self.token)
+        return value.lower() in _TRUTHY
+
+    def trigger(self, request) -> Optional[str]:
+        flag = request.headers.get(PROFILE_HEADER)
+        if flag is None and PROFILE_PARAM in request.query_params:
+            flag = request.query_params[PROFILE_PARAM]
+        if flag is not None and self.authorized(flag):
+            return "request"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def begin(self, trigger: str) -> Optional[_Capture]:
+        with self._lock:
+            if self._active:
+                if trigger == "request":
+                    self.busy += 1
+                return None
+            self._active = True
+        capture = _Capture(trigger)
+        capture.start()
+        return capture
+
+    def finish(self, capture: _Capture, route: str, method: str, path: str,
+               status: str) -> Optional[Dict[str, Any]]:
+        duration = capture.stop()
+        with self._lock:
+            self._active = False
+        if capture.trigger == "sampled" and duration * 1000 < self.slow_ms:
+            return None
+        record = {
+            "id": str(next(self._ids)),
+            "route": route,
+            "method": method,
+            "path": path,
+            "status": status,
+            "trigger": capture.trigger,
+            "duration_ms": round(duration * 1000, 2),
+            "started_at": capture.started_at,
+            "data": capture.dump(),
+        }
+        self.captures.append(record)
+        return record
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Captured profiles, newest first, without their data."""
+        return [{k: v for k, v in record.items() if k != "data"} for record in reversed(self.captures)]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        for record in list(self.captures):
+            if record["id"] == profile_id:
+                return record
+        return None
+
+    def clear(self) -> int:
+        count = len(self.captures)
+        self.captures.clear()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "slow_ms": self.slow_ms,
+            "sample_rate": self.sample_rate,
+            "buffer_size": self.captures.maxlen,
+            "captures": len(self.captures),
+            "busy": self.busy,
+        }
+
+
+def report(data: bytes, sort: str = "cumulative", limit: int = 50) -> str:
+    """pstats text report of a capture."""
+    stats = pstats.Stats(_Stats(marshal.loads(data)), stream=io.StringIO())
+    stats.sort_stats(sort).print_stats(limit)
+    return stats.stream.getvalue()
+
+
+PROFILER = RequestProfiler()
+
+
+def _profiled_endpoint(call: Callable) -> Callable:
+    # Async endpoints run on the event loop, which the request's capture covers
+    if asyncio.iscoroutinefunction(call):
+        return call
+
+    @functools.wraps(call)
+    def endpoint(*args, **kwargs):
+        capture = _capture.get()
+        if capture is None:
+            return call(*args, **kwargs)
+        return capture.run(call, *args, **kwargs)
+    return endpoint
+
+
+class ProfiledRoute(InstrumentedRoute):
+    """
+    InstrumentedRoute that can profile the request (see RequestProfiler).
+    Installed as `app.router.route_class` only when profiling is enabled.
+    Captures answer with an `X-Profile-Id` header naming the trace in
+    /debug/profiles.
+    """
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _profiled_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        route, method = self.path, ",".join(sorted(self.methods or ()))
+
+        async def profiled_handler(request):
+            trigger = PROFILER.trigger(request)
+            capture = PROFILER.begin(trigger) if trigger is not None else None
+            if capture is None:
+                response = await handler(request)
+                if trigger == "request":
+                    response.headers["X-Profile-Status"] = "busy"
+                return response
+
+            token = _capture.set(capture)
+            status = "error"
+            response = None
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            except HTTPException as e:
+                status = str(e.status_code)
+                raise
+            except RequestValidationError:
+                status = "422"
+                raise
+            finally:
+                _capture.reset(token)
+                record = PROFILER.finish(capture, route, method, request.url.path, status)
+                if record is not None and response is not None:
+                    response.headers["X-Profile-Id"] = record["id"]
+
+        return profiled_handler
@@ -0,0 +1,63 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from geo import GridIndex
+
+
+class DriverRegistry:
+    """
+    Server-side fleet state for matching.
+    Keeps the latest driver record per id and a grid index of the available
+    ones, so `/match` can pull nearby candidates instead of the caller posting
+    the whole fleet on every request.
+    """
+    def __init__(self, cell_deg: float = 0.1):
+        self.drivers: Dict[str, Dict[str, Any]] = {}
+        self.index = GridIndex(cell_deg)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.drivers)
+
+    @property
+    def available_count(self) -> int:
+        return len(self.index)
+
+    def upsert(self, driver: Dict[str, Any]):
+        """Adds or replaces a driver record (same shape `MatchingEngine` consumes)."""
+        driver_id = driver["id"]
+        loc = driver["location"]
+        with self._lock:
+            self.drivers[driver_id] = driver
+            if driver.get("is_available", True):
+                self.index.insert(driver_id, loc["lat"], loc["lng"])
+            else:
+                self.index.remove(driver_id)
+
+    def upsert_many(self, drivers: List[Dict[str, Any]]):
+        for driver in drivers:
+            self.upsert(driver)
+
+    def remove(self, driver_id: str) -> bool:
+        with self._lock:
+            self.index.remove(driver_id)
+            return self.drivers.pop(driver_id, None) is not None
+
+    def get(self, driver_id: str) -> Optional[Dict[str, Any]]:
+        return self.drivers.get(driver_id)
+
+    def candidates(self, lat: float, lng: float, radius_km: Optional[float] = None,
+                   k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Available drivers near (lat, lng), nearest first.
+        With `k`, the k nearest (optionally capped at `radius_km`); otherwise
+        every driver within `radius_km`.
+        """
+        with self._lock:
+            if k is not None:
+                hits = self.index.nearest(lat, lng, k, max_radius_km=radius_km)
+            elif radius_km is not None:
+                hits = self.index.within(lat, lng, radius_km)
+            else:
+                raise ValueError("candidates() needs radius_km or k")
+            return [self.drivers[driver_id] for _, driver_id in hits]
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+
+class RouteCache:
+    """
+    Bounded LRU cache of route results with a TTL.
+    Each entry remembers the road ids its route uses, so an attribute change
+    on one road only drops the routes that actually travel over it.
+    """
+    def __init__(self, maxsize: int = 10000, ttl_s: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, result, roads)
+        self._by_road: Dict[int, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, result: Any, roads: Iterable[int]):
+        roads = frozenset(roads)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_s, result, roads)
+            for road in roads:
+                self._by_road.setdefault(road, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def entries(self):
+        """Snapshot of (key, result, roads) for every cached route."""
+        with self._lock:
+            return [(key, result, roads) for key, (_, result, roads) in self._entries.items()]
+
+    def invalidate(self, keys: Iterable[Hashable]) -> int:
+        with self._lock:
+            dropped = 0
+            for key in keys:
+                if key in self._entries:
+                    self._drop(key)
+                    dropped += 1
+            self.invalidations += dropped
+            return dropped
+
+    def invalidate_roads(self, roads: Iterable[int]) -> int:
+        """Drops every cached route that uses any of `roads`; returns how many."""
+        with self._lock:
+            keys = set()
+            for road in roads:
+                keys |= self._by_road.get(road, set())
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_road.clear()
+
+    def _drop(self, key: Hashable):
+        _, _, roads = self._entries.pop(key)
+        for road in roads:
+            keys = self._by_road.get(road)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_road[road]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -1,30 +1,74 @@
 import math
 import heapq
-from typing import List, Dict, Tuple, Any
+import logging
+import threading
+from typing import List, Dict, Tuple, Any, Optional
+
+import numpy as np
+
+from geo import haversine_km_many
+from graph import CSRGraph, NodeCoords, graph_from_dicts, load_graph_csv
+from landmarks import LandmarkTable
+from route_cache import RouteCache
+from traffic import TrafficProfiles, hour_of_day, static_hours
+
+logger = logging.getLogger(__name__)
 
 class RouteOptimizer:
-    def __init__(self):
-        # Adjacency list: {node: {neighbor: {attr: val}}}
-        self.graph: Dict[str, Dict[str, Dict[str, Any]]] = {}
-        self.nodes: Dict[str, tuple] = {} # {name: (lat, lng)}
-        self._build_mock_graph()
+    # Name of the cost function in use; part of the route cache key
+    cost_profile = "default"
+
+    def __init__(self, graph: Optional[CSRGraph] = None, cache: Optional[RouteCache] = None):
+        # Compact CSR road graph; node names map to integer ids
+        self.graph: CSRGraph = graph if graph is not None else self._build_mock_graph()
+        self.nodes = NodeCoords(self.graph) # {name: (lat, lng)}
+        self.route_cache = cache if cache is not None else RouteCache()
+        self.landmarks: Optional[LandmarkTable] = None # ALT tables, see build_landmarks
+        # Bumped whenever edge costs change; lets callers that search outside
+        # this process (see executor.py) tell whether a result is still current
+        self.graph_version = 0
+        # Hourly travel-time factors per traffic level, for time-dependent routing
+        self.profiles = TrafficProfiles.default()
+        # Landmark tables are rebuilt in the background once this many edge
+        # cost increases have loosened them (0 = never)
+        self.landmark_rebuild_edges = 0
+        self.landmark_rebuilds = 0
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._update_lock = threading.Lock()  # serializes edge cost writers
+
+    @classmethod
+    def from_csv(cls, nodes_path: str, edges_path: str, directed: bool = False,
+                 cache: Optional[RouteCache] = None) -> "RouteOptimizer":
+        """Loads a real road network (see graph.load_graph_csv for the format)."""
+        return cls(load_graph_csv(nodes_path, edges_path, cls._edge_costs, directed=directed), cache=cache)
+
+    @classmethod
+    def from_snapshot(cls, directory: str, cache: Optional[RouteCache] = None) -> "RouteOptimizer":
+        """
+        Memory-maps a prepared graph written by `CSRGraph.save_snapshot`,
+        with its landmark tables when the snapshot has them.
+        """
+        optimizer = cls(CSRGraph.load_snapshot(directory), cache=cache)
+        optimizer.landmarks = LandmarkTable.load(directory)
+        return optimizer
+
+    def build_landmarks(self, count: int = 8) -> LandmarkTable:
+        """Precomputes ALT landmark tables (enables algorithm="alt")."""
+        self.landmarks = LandmarkTable.build(self.graph, count)
+        return self.landmarks
 
-    def _build_mock_graph(self):
+    def _build_mock_graph(self) -> CSRGraph:
         """Builds a sample graph for demonstration."""
         # Nodes: Cities/Junctions (lat, lng)
-        self.nodes = {
+        nodes = {
             "Mumbai": (19.0760, 72.8777),
             "Pune": (18.5204, 73.8567),
             "Nasik": (19.9975, 73.7898),
             "Surat": (21.1702, 72.8311),
             "Thane": (19.2183, 72.9781)
         }
-        
-        # Init graph structure
-        for node in self.nodes:
-            self.graph[node] = {}
 
-        # Edges: Roads with attributes
+        # Edges: Roads with attributes (undirected)
         edges = [
             ("Mumbai", "Thane", {"distance": 25, "road_quality": 8, "traffic": 9}),
             ("Thane", "Nasik", {"distance": 150, "road_quality": 7, "traffic": 5}),
@@ -33,10 +77,7 @@ class RouteOptimizer:
             ("Nasik", "Surat", {"distance": 200, "road_quality": 6, "traffic": 4})
         ]
 
-        for u, v, data in edges:
-            # Undirected graph
-            self.graph[u][v] = data
-            self.graph[v][u] = data
+        return graph_from_dicts(nodes, edges, self._edge_costs)
 
     def _cost_function(self, u, v, edge_attr):
         """
@@ -61,6 +102,16 @@ class RouteOptimizer:
         weight = time_hours + (distance * 0.05) + fuel_penalty
         return weight
 
+    @staticmethod
+    def _edge_costs(distance: np.ndarray, quality: np.ndarray, traffic: np.ndarray) -> np.ndarray:
+        """Vectorized `_cost_function` over edge attribute arrays (same arithmetic)."""
+        base_speed = 60 # km/h
+        speed_factor = (quality / 10) * (1 - (traffic / 20))
+        estimated_speed = base_speed * np.maximum(0.2, speed_factor)
+        time_hours = distance / estimated_speed
+        fuel_penalty = (10 - quality) * 0.5
+        return time_hours + (distance * 0.05) + fuel_penalty
+
     def _heuristic(self, u, v):
         """Heuristic for A*: Straight line distance (Haversine) / Max Speed"""
         pos_u = self.nodes.get(u)
@@ -75,58 +126,578 @@ class RouteOptimizer:
         max_speed = 100 # km/h
         return d / max_speed
 
-    def calculate_optimal_route(self, start_node: str, end_node: str) -> Dict[str, Any]:
+    def _geo_bounds(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """`_heuristic` between node ids a[i] and b[i], vectorized."""
+        g = self.graph
+        d = np.sqrt((g.lats[a] - g.lats[b])**2 + (g.lngs[a] - g.lngs[b])**2) * 111
+        max_speed = 100 # km/h
+        return d / max_speed
+
+    def _lower_bounds(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Best known lower bound on the route cost a[i] -> b[i]."""
+        bound = self._geo_bounds(a, b)
+        if self.landmarks is not None:
+            bound = np.maximum(bound, self.landmarks.lower_bounds(a, b))
+        return bound
+
+    def _heuristics_to(self, ids: List[int], target: int) -> List[float]:
+        """`_heuristic` from each node id in `ids` to `target`, vectorized."""
+        idx = np.asarray(ids, dtype=np.int64)
+        return self._geo_bounds(idx, np.full(len(idx), target)).tolist()
+
+    def update_edge(self, u: str, v: str, traffic: Optional[float] = None,
+                    road_quality: Optional[float] = None) -> int:
+        """
+        Changes the live attributes of the road(s) between u and v.
+        Returns the number of cached routes invalidated.
+        """
+        report = self.apply_edge_updates([{"source": u, "target": v, "traffic": traffic, "road_quality": road_quality}])
+        if report["unknown_edges"]:
+            raise KeyError(f"Unknown edge {u} -> {v}")
+        return report["invalidated_routes"]
+
+    def apply_edge_updates(self, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Applies a batch of live traffic / road quality updates.
+        Each update is {"source", "target", "traffic"?, "road_quality"?}; the
+        last update for a road wins. Only the touched edges are re-costed, and
+        cached routes are repaired incrementally (see `_repair_after_cost_change`).
+        """
+        g = self.graph
+        road_ids: List[int] = []
+        traffic: List[float] = []
+        quality: List[float] = []
+        unknown = []
+        for upd in updates:
+            u_id, v_id = g.node_id(upd["source"]), g.node_id(upd["target"])
+            roads = g.roads_between(u_id, v_id) if u_id is not None and v_id is not None else []
+            if len(roads) == 0:
+                unknown.append({"source": upd["source"], "target": upd["target"]})
+                continue
+            for road in roads.tolist():
+                road_ids.append(road)
+                traffic.append(math.nan if upd.get("traffic") is None else upd["traffic"])
+                quality.append(math.nan if upd.get("road_quality") is None else upd["road_quality"])
+
+        report = {"updated_roads": 0, "changed_edges": 0, "invalidated_routes": 0, "unknown_edges": unknown}
+        if not road_ids:
+            return report
+        with self._update_lock:
+            self._apply_road_updates(road_ids, traffic, quality, report)
+        self._maybe_rebuild_landmarks()
+        return report
+
+    def _apply_road_updates(self, road_ids: List[int], traffic: List[float], quality: List[float],
+                            report: Dict[str, Any]):
+        g = self.graph
+
+        # Keep the last update per road
+        roads_rev = np.asarray(road_ids[::-1])
+        roads, first_rev = np.unique(roads_rev, return_index=True)
+        traffic_new = np.asarray(traffic[::-1])[first_rev]
+        quality_new = np.asarray(quality[::-1])[first_rev]
+
+        edges = g.road_edges(roads)
+        per_edge = np.searchsorted(roads, g.road[edges])
+        t = traffic_new[per_edge]
+        q = quality_new[per_edge]
+        g.traffic[edges[~np.isnan(t)]] = t[~np.isnan(t)]
+        g.quality[edges[~np.isnan(q)]] = q[~np.isnan(q)]
+
+        old_cost = g.cost[edges].copy()
+        new_cost = self._edge_costs(g.distance[edges], g.quality[edges], g.traffic[edges])
+        g.cost[edges] = new_cost
+
+        changed = new_cost != old_cost
+        report["updated_roads"] = len(roads)
+        report["changed_edges"] = int(changed.sum())
+        if changed.any():
+            self.graph_version += 1
+            report["invalidated_routes"] = self._repair_after_cost_change(
+                edges[changed], old_cost[changed], new_cost[changed]
+            )
+
+    def _repair_after_cost_change(self, edges: np.ndarray, old_cost: np.ndarray,
+                                  new_cost: np.ndarray) -> int:
+        """
+        Keeps cached routes valid after edge costs change, without recomputing them.
+        - A route over a changed road is dropped (its cost, and possibly its
+          optimality, changed).
+        - A cheaper edge (a -> b) elsewhere can only create a better s -> t route
+          if LB(s, a) + cost(a, b) + LB(b, t) < cost(route); routes that fail
+          that test for every cheaper edge are provably still optimal and kept.
+        Returns the number of routes invalidated.
+        """
+        g = self.graph
+        if self.landmarks is not None:
+            # Repair first so the bounds below stay admissible
+            self.landmarks.repair(g, edges, old_cost, new_cost)
+        invalidated = self.route_cache.invalidate_roads(np.unique(g.road[edges]).tolist())
+
+        cheaper = new_cost < old_cost
+        if not cheaper.any():
+            return invalidated
+
+        dec_edges = edges[cheaper]
+        dec_src = np.searchsorted(g.indptr, dec_edges, side="right") - 1
+        dec_dst = g.indices[dec_edges].astype(np.int64)
+        dec_cost = new_cost[cheaper]
+
+        stale = []
+        for key, result, _ in self.route_cache.entries():
+            start, end = g.node_id(key[0]), g.node_id(key[1])
+            # optimization_score is rounded to 2 places; compare against its upper bound
+            route_cost = result["optimization_score"] + 0.005
+            via = (self._lower_bounds(np.full(len(dec_src), start), dec_src) + dec_cost +
+                   self._lower_bounds(dec_dst, np.full(len(dec_dst), end)))
+            if (via < route_cost).any():
+                stale.append(key)
+
+        return invalidated + self.route_cache.invalidate(stale)
+
+    def _maybe_rebuild_landmarks(self):
+        """Starts a background landmark rebuild once enough cost increases have loosened the tables."""
+        table = self.landmarks
+        if table is None or self.landmark_rebuild_edges <= 0 or table.loosened_edges < self.landmark_rebuild_edges:
+            return
+        with self._update_lock:
+            # Re-checked under the lock: a rebuild may have just installed
+            if table.loosened_edges < self.landmark_rebuild_edges or self.landmarks is not table:
+                return
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(target=self._rebuild_landmarks, args=(table,),
+                                                    name="landmark-rebuild", daemon=True)
+            self._rebuild_thread.start()
+
+    def _rebuild_landmarks(self, table: LandmarkTable):
+        """
+        Recomputes `table` over a copy of the live costs, without blocking
+        updates, then installs it under the update lock (repairing edges
+        that got cheaper meanwhile). Searches that overlap the in-place copy
+        may see mixed rows, so the graph version is bumped to keep their
+        results out of the route cache.
+        """
+        try:
+            with self._update_lock:
+                cost = self.graph.cost.copy()
+            fresh = table.recompute(self.graph, cost)
+            with self._update_lock:
+                if self.landmarks is not table:
+                    return  # replaced by build_landmarks meanwhile
+                table.install(self.graph, fresh, cost)
+                self.graph_version += 1
+                self.landmark_rebuilds += 1
+        except Exception:
+            logger.exception("Landmark rebuild failed")
+
+    def landmark_stats(self) -> Dict[str, Any]:
+        return {
+            "landmarks": len(self.landmarks) if self.landmarks is not None else 0,
+            "loosened_edges": self.landmarks.loosened_edges if self.landmarks is not None else 0,
+            "rebuild_after_edges": self.landmark_rebuild_edges,
+            "rebuilds": self.landmark_rebuilds,
+            "rebuilding": self._rebuild_thread is not None and self._rebuild_thread.is_alive(),
+        }
+
+    def calculate_optimal_route(self, start_node: str, end_node: str, algorithm: str = "astar") -> Dict[str, Any]:
         """
         Returns the best path using A* Algorithm manually implemented.
+        algorithm="alt" runs bidirectional A* with landmark potentials instead
+        (same optimal route, far fewer node expansions); needs build_landmarks().
+        Results are served from the route cache when a live entry exists.
         """
+        error = self.route_error(start_node, end_node, algorithm)
+        if error is not None:
+            return error
+
+        key = self.route_key(start_node, end_node, algorithm)
+        cached = self.route_cache.get(key)
+        if cached is not None:
+            return cached
+
+        result, roads = self.compute_route(start_node, end_node, algorithm)
+        if roads is not None:
+            self.route_cache.put(key, result, roads)
+        return result
+
+    def route_key(self, start_node: str, end_node: str, algorithm: str = "astar") -> Tuple[str, str, str, str]:
+        # Per algorithm: cached results carry that search's nodes_expanded
+        return (start_node, end_node, self.cost_profile, algorithm)
+
+    def route_error(self, start_node: str, end_node: str, algorithm: str) -> Optional[Dict[str, Any]]:
+        """Error result for a request that cannot be searched, else None."""
         if start_node not in self.graph or end_node not in self.graph:
             return {"error": "Start or End node not found in graph"}
+        if algorithm not in ("astar", "alt"):
+            return {"error": f"Unknown algorithm: {algorithm}"}
+        if algorithm == "alt" and self.landmarks is None:
+            return {"error": "Landmarks not built"}
+        return None
+
+    def compute_route(self, start_node: str, end_node: str,
+                      algorithm: str = "astar") -> Tuple[Dict[str, Any], Optional[List[int]]]:
+        """
+        Uncached search. Returns (result, road ids of the route); roads is None
+        when the result is an error and must not be cached.
+        """
+        error = self.route_error(start_node, end_node, algorithm)
+        if error is not None:
+            return error, None
+
+        start, end = self.graph.node_id(start_node), self.graph.node_id(end_node)
+        if algorithm == "alt":
+            edges, expanded = self._bidirectional_alt(start, end)
+        else:
+            edges, expanded = self._astar(start, end)
+        if edges is None:
+            return {"error": "No path found", "nodes_expanded": expanded}, None
+
+        result = self._route_result(start, edges)
+        result["nodes_expanded"] = expanded
+        return result, self.graph.road[edges].tolist()
 
-        # Priority Queue: (f_score, current_node)
+    def _astar(self, start: int, end: int) -> Tuple[Optional[List[int]], int]:
+        """A* search; returns (edge positions of the path or None, nodes expanded)."""
+        g = self.graph
+
+        # Priority Queue: (f_score, node_id, g_score); entries whose g is no
+        # longer the node's best are stale and skipped.
         open_set = []
-        heapq.heappush(open_set, (0, start_node))
-        
-        came_from = {}
-        
-        g_score = {node: float('inf') for node in self.graph}
-        g_score[start_node] = 0
-        
-        f_score = {node: float('inf') for node in self.graph}
-        f_score[start_node] = self._heuristic(start_node, end_node)
+        heapq.heappush(open_set, (self._heuristics_to([start], end)[0], start, 0.0))
 
-        while open_set:
-            _, current = heapq.heappop(open_set)
+        came_from: Dict[int, int] = {} # node -> edge position used to reach it
+        g_score: Dict[int, float] = {start: 0.0}
+        expanded = 0
 
-            if current == end_node:
-                return self._reconstruct_path(came_from, current)
+        while open_set:
+            _, current, current_g = heapq.heappop(open_set)
+            if current_g > g_score[current]:
+                continue
+            expanded += 1
 
-            for neighbor, attr in self.graph[current].items():
-                tentative_g_score = g_score[current] + self._cost_function(current, neighbor, attr)
+            if current == end:
+                return self._path_edges(came_from, current)[1], expanded
 
-                if tentative_g_score < g_score[neighbor]:
-                    came_from[neighbor] = current
+            neighbors, costs, edges = g.neighbors(current)
+            improved = []
+            for neighbor, cost, edge in zip(neighbors, costs, edges):
+                tentative_g_score = current_g + cost
+                if tentative_g_score < g_score.get(neighbor, math.inf):
+                    came_from[neighbor] = edge
                     g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = tentative_g_score + self._heuristic(neighbor, end_node)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    improved.append(neighbor)
+
+            if improved:
+                for neighbor, h in zip(improved, self._heuristics_to(improved, end)):
+                    heapq.heappush(open_set, (g_score[neighbor] + h, neighbor, g_score[neighbor]))
+
+        return None, expanded
+
+    def _bidirectional_alt(self, start: int, end: int) -> Tuple[Optional[List[int]], int]:
+        """
+        Bidirectional A* with the average landmark potential
+            p(v) = (LB(v, end) - LB(start, v)) / 2
+        (forward keys d_f(v) + p(v), backward keys d_r(v) - p(v)). Both searches
+        then run Dijkstra on the same non-negative reduced costs, so it is
+        optimal to stop once top_f + top_r >= best meeting cost.
+        """
+        g = self.graph
+        lm = self.landmarks
+        r_indptr, r_sources, r_edges = g.reverse_adjacency()
+
+        def potential(ids: List[int]) -> List[float]:
+            idx = np.asarray(ids, dtype=np.int64)
+            to_end = lm.lower_bounds(idx, np.full(len(idx), end))
+            from_start = lm.lower_bounds(np.full(len(idx), start), idx)
+            return ((to_end - from_start) / 2).tolist()
+
+        dist_f: Dict[int, float] = {start: 0.0}
+        dist_r: Dict[int, float] = {end: 0.0}
+        came_f: Dict[int, int] = {} # node -> edge into it (towards start)
+        came_r: Dict[int, int] = {} # node -> edge out of it (towards end)
+        heap_f = [(potential([start])[0], start, 0.0)]
+        heap_r = [(-potential([end])[0], end, 0.0)]
+
+        best = 0.0 if start == end else math.inf
+        meet = start if start == end else None
+        expanded = 0
+
+        while heap_f and heap_r:
+            if heap_f[0][0] + heap_r[0][0] >= best:
+                break
+
+            if heap_f[0][0] <= heap_r[0][0]:
+                _, u, du = heapq.heappop(heap_f)
+                if du > dist_f[u]:
+                    continue
+                expanded += 1
+                neighbors, costs, edges = g.neighbors(u)
+                improved = []
+                for v, c, e in zip(neighbors, costs, edges):
+                    nd = du + c
+                    if nd < dist_f.get(v, math.inf):
+                        dist_f[v] = nd
+                        came_f[v] = e
+                        improved.append(v)
+                        if v in dist_r and nd + dist_r[v] < best:
+                            best = nd + dist_r[v]
+                            meet = v
+                if improved:
+                    for v, p in zip(improved, potential(improved)):
+                        heapq.heappush(heap_f, (dist_f[v] + p, v, dist_f[v]))
+            else:
+                _, u, du = heapq.heappop(heap_r)
+                if du > dist_r[u]:
+                    continue
+                expanded += 1
+                lo, hi = int(r_indptr[u]), int(r_indptr[u + 1])
+                edges = r_edges[lo:hi]
+                improved = []
+                for w, c, e in zip(r_sources[lo:hi].tolist(), g.cost[edges].tolist(), edges.tolist()):
+                    nd = du + c
+                    if nd < dist_r.get(w, math.inf):
+                        dist_r[w] = nd
+                        came_r[w] = e
+                        improved.append(w)
+                        if w in dist_f and nd + dist_f[w] < best:
+                            best = nd + dist_f[w]
+                            meet = w
+                if improved:
+                    for w, p in zip(improved, potential(improved)):
+                        heapq.heappush(heap_r, (dist_r[w] - p, w, dist_r[w]))
+
+        if meet is None:
+            return None, expanded
+
+        _, path = self._path_edges(came_f, meet)
+        node = meet
+        while node != end:
+            e = came_r[node]
+            path.append(e)
+            node = int(g.indices[e])
+        return path, expanded
+
+    def _edge_hours(self, lo: int, hi: int, hour: float) -> List[float]:
+        """Travel time (hours) of edges lo:hi when entered at `hour` of the day."""
+        g = self.graph
+        traffic = g.traffic[lo:hi]
+        base = static_hours(g.distance[lo:hi], g.quality[lo:hi], traffic)
+        return (base * self.profiles.factors(TrafficProfiles.levels(traffic), hour)).tolist()
+
+    def _time_bounds(self, ids: List[int], target: int) -> List[float]:
+        """Lower bounds (hours) on the travel time from each of `ids` to `target`."""
+        g = self.graph
+        idx = np.asarray(ids, dtype=np.int64)
+        max_speed = 60 / min(1.0, self.profiles.min_factor) # km/h: best road, no traffic, fastest hour
+        return (haversine_km_many(g.lats[target], g.lngs[target], g.lats[idx], g.lngs[idx]) / max_speed).tolist()
+
+    def time_dependent_route(self, start_node: str, end_node: str, departure: float) -> Dict[str, Any]:
+        """
+        Fastest route for a departure time (unix seconds), with each edge's
+        travel time taken from its hourly traffic profile at the time the
+        vehicle enters it. Adds travel_time_min and arrival (unix seconds)
+        to the usual route result. Not cached: the answer depends on the time.
+        """
+        error = self.route_error(start_node, end_node, "astar")
+        if error is not None:
+            return error
+
+        start, end = self.graph.node_id(start_node), self.graph.node_id(end_node)
+        edges, hours, expanded = self._td_astar(start, end, hour_of_day(departure))
+        if edges is None:
+            return {"error": "No path found", "nodes_expanded": expanded}
+
+        result = self._route_result(start, edges)
+        result["nodes_expanded"] = expanded
+        result["travel_time_min"] = round(hours * 60, 1)
+        result["departure"] = departure
+        result["arrival"] = departure + hours * 3600
+        return result
+
+    def _td_astar(self, start: int, end: int, depart_hour: float) -> Tuple[Optional[List[int]], float, int]:
+        """
+        Time-dependent A* on arrival times (hours after departure).
+        Returns (edge positions of the path or None, travel hours, nodes expanded).
+        """
+        g = self.graph
+        open_set = [(self._time_bounds([start], end)[0], start, 0.0)]
+        came_from: Dict[int, int] = {}
+        arrival: Dict[int, float] = {start: 0.0}
+        expanded = 0
+
+        while open_set:
+            _, current, t = heapq.heappop(open_set)
+            if t > arrival[current]:
+                continue
+            expanded += 1
+
+            if current == end:
+                return self._path_edges(came_from, current)[1], t, expanded
 
-        return {"error": "No path found"}
+            lo, hi = int(g.indptr[current]), int(g.indptr[current + 1])
+            improved = []
+            for edge, neighbor, hours in zip(range(lo, hi), g.indices[lo:hi].tolist(),
+                                             self._edge_hours(lo, hi, depart_hour + t)):
+                tentative = t + hours
+                if tentative < arrival.get(neighbor, math.inf):
+                    came_from[neighbor] = edge
+                    arrival[neighbor] = tentative
+                    improved.append(neighbor)
 
-    def _reconstruct_path(self, came_from: Dict[str, str], current: str) -> Dict[str, Any]:
-        path = [current]
+            if improved:
+                for neighbor, h in zip(improved, self._time_bounds(improved, end)):
+                    heapq.heappush(open_set, (arrival[neighbor] + h, neighbor, arrival[neighbor]))
+
+        return None, math.inf, expanded
+
+    def arrival_times(self, source: int, targets: List[int], departure: float) -> Tuple[List[float], List[float]]:
+        """
+        Time-dependent `one_to_many`: one search from `source` leaving at
+        `departure` (unix seconds) serves every target. Returns
+        (travel hours, distance_km) per target along the fastest path; inf when unreachable.
+        """
+        g = self.graph
+        depart_hour = hour_of_day(departure)
+        remaining = set(targets)
+        arrival: Dict[int, float] = {source: 0.0}
+        dist_km: Dict[int, float] = {source: 0.0}
+        settled: Dict[int, float] = {}
+        heap = [(0.0, source)]
+
+        while heap and remaining:
+            t, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled[u] = t
+            remaining.discard(u)
+
+            lo, hi = int(g.indptr[u]), int(g.indptr[u + 1])
+            for v, hours, length in zip(g.indices[lo:hi].tolist(), self._edge_hours(lo, hi, depart_hour + t),
+                                        g.distance[lo:hi].tolist()):
+                nt = t + hours
+                if nt < arrival.get(v, math.inf):
+                    arrival[v] = nt
+                    dist_km[v] = dist_km[u] + length
+                    heapq.heappush(heap, (nt, v))
+
+        return (
+            [settled.get(t, math.inf) for t in targets],
+            [dist_km[t] if t in settled else math.inf for t in targets]
+        )
+
+    def one_to_many(self, source: int, targets: List[int]) -> Tuple[List[float], List[float]]:
+        """
+        One Dijkstra from `source` that stops once every target is settled.
+        Returns (cost, distance_km) per target along the min-cost path; inf when unreachable.
+        """
+        g = self.graph
+        remaining = set(targets)
+        cost: Dict[int, float] = {source: 0.0}
+        dist_km: Dict[int, float] = {source: 0.0}
+        settled: Dict[int, float] = {}
+        heap = [(0.0, source)]
+
+        while heap and remaining:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled[u] = d
+            remaining.discard(u)
+
+            neighbors, costs, edges = g.neighbors(u)
+            lengths = g.distance[edges].tolist() if edges else []
+            for v, c, length in zip(neighbors, costs, lengths):
+                nd = d + c
+                if nd < cost.get(v, math.inf):
+                    cost[v] = nd
+                    dist_km[v] = dist_km[u] + length
+                    heapq.heappush(heap, (nd, v))
+
+        return (
+            [settled.get(t, math.inf) for t in targets],
+            [dist_km[t] if t in settled else math.inf for t in targets]
+        )
+
+    def route_matrix(self, sources: List[str], targets: List[str]) -> Dict[str, Any]:
+        """
+        Cost and distance matrices for every source x target pair.
+        Runs one `one_to_many` search per source (all targets share it);
+        /route-matrix spreads the sources over the EnginePool workers instead
+        (executor.matrix_rows). Unknown or unreachable pairs are None.
+        """
+        rows_to_run, known_targets = self.matrix_plan(sources, targets)
+        results = [self.one_to_many(s, known_targets) for s in rows_to_run]
+        return self.matrix_result(sources, targets, results)
+
+    def matrix_plan(self, sources: List[str], targets: List[str]) -> Tuple[List[int], List[int]]:
+        """(source ids to search, target ids) for the known nodes of a matrix request."""
+        g = self.graph
+        source_ids = [g.node_id(n) for n in sources]
+        target_ids = [g.node_id(n) for n in targets]
+        return [s for s in source_ids if s is not None], [t for t in target_ids if t is not None]
+
+    def matrix_result(self, sources: List[str], targets: List[str],
+                      results: List[Tuple[List[float], List[float]]]) -> Dict[str, Any]:
+        """Assembles `one_to_many` rows (in `matrix_plan` order) into the matrix response."""
+        g = self.graph
+        unknown = sorted({n for n in list(sources) + list(targets) if n not in g})
+        source_ids = [g.node_id(n) for n in sources]
+        target_ids = [g.node_id(n) for n in targets]
+        known_targets = [t for t in target_ids if t is not None]
+
+        def cell(value: float) -> Optional[float]:
+            return None if math.isinf(value) else round(value, 2)
+
+        solved = iter(results)
+        cost_matrix: List[List[Optional[float]]] = []
+        dist_matrix: List[List[Optional[float]]] = []
+        for s in source_ids:
+            if s is None:
+                cost_matrix.append([None] * len(targets))
+                dist_matrix.append([None] * len(targets))
+                continue
+            costs, dists = next(solved)
+            by_target = dict(zip(known_targets, zip(costs, dists)))
+            cost_matrix.append([cell(by_target[t][0]) if t is not None else None for t in target_ids])
+            dist_matrix.append([cell(by_target[t][1]) if t is not None else None for t in target_ids])
+
+        return {
+            "sources": list(sources),
+            "targets": list(targets),
+            "cost": cost_matrix,
+            "distance_km": dist_matrix,
+            "unknown_nodes": unknown
+        }
+
+    def _edge_source(self, edge: int) -> int:
+        return int(np.searchsorted(self.graph.indptr, edge, side="right")) - 1
+
+    def _path_edges(self, came_from: Dict[int, int], current: int) -> Tuple[int, List[int]]:
+        """(start node, edge positions) of the path ending at `current`."""
+        edges = []
         while current in came_from:
-            current = came_from[current]
-            path.append(current)
-        path.reverse()
+            edge = came_from[current]
+            edges.append(edge)
+            current = self._edge_source(edge)
+        edges.reverse()
+        return current, edges
+
+    def _reconstruct_path(self, came_from: Dict[int, int], current: int) -> Dict[str, Any]:
+        start, edges = self._path_edges(came_from, current)
+        return self._route_result(start, edges)
+
+    def _route_result(self, start: int, edges: List[int]) -> Dict[str, Any]:
+        g = self.graph
+        path = [g.name(start)] + [g.name(int(g.indices[e])) for e in edges]
 
         # Calculate totals
         total_dist = 0
         total_optimization_score = 0
         
-        for i in range(len(path)-1):
-            u, v = path[i], path[i+1]
-            attr = self.graph[u][v]
-            total_dist += attr.get('distance', 0)
-            total_optimization_score += self._cost_function(u, v, attr)
+        for e in edges:
+            total_dist += float(g.distance[e])
+            total_optimization_score += float(g.cost[e])
 
         return {
             "route": path,
@@ -137,6 +708,15 @@ class RouteOptimizer:
 
 # Example Usage
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) in (4, 5):
+        # Prepare a snapshot: python routing.py nodes.csv edges.csv snapshot_dir [landmarks]
+        optimizer = RouteOptimizer.from_csv(sys.argv[1], sys.argv[2])
+        optimizer.graph.save_snapshot(sys.argv[3])
+        if len(sys.argv) == 5:
+            optimizer.build_landmarks(int(sys.argv[4])).save(sys.argv[3])
+        sys.exit(0)
+
     optimizer = RouteOptimizer()
     
     # Example: Mumbai to Pune
@@ -0,0 +1,26 @@
+from multiprocessing import shared_memory
+from typing import Tuple
+
+import numpy as np
+
+# (shared memory block name, shape, dtype string): enough to re-attach an array
+ArrayHandle = Tuple[str, tuple, str]
+
+
+def to_shared(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, np.ndarray, ArrayHandle]:
+    """
+    Copies `arr` into a new shared memory block.
+    Returns (block, view, handle); keep the block referenced for as long as the
+    view is used, and `unlink()` it once every process is done.
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)
+    view[...] = arr
+    return block, view, (block.name, tuple(arr.shape), arr.dtype.str)
+
+
+def attach(handle: ArrayHandle) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Maps an array shared by another process (zero-copy)."""
+    name, shape, dtype = handle
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
@@ -0,0 +1,45 @@
+import time
+
+from demand import DRIVER_AVAILABLE, LOAD_CREATED, DemandAggregator
+
+LAT, LNG = 18.52, 73.85
+
+
+def test_future_and_stale_events_are_rejected():
+    agg = DemandAggregator(window_s=900.0, bucket_s=60.0)
+    now = time.time()
+
+    # A skewed clock and a millisecond timestamp: neither may claim a slot ahead of time
+    assert agg.record_many(LOAD_CREATED, [LAT] * 5, [LNG] * 5, at=now + 3600) == 0
+    assert agg.record_many(LOAD_CREATED, [LAT] * 5, [LNG] * 5, at=now * 1000) == 0
+    # Older than the window
+    assert agg.record_many(LOAD_CREATED, [LAT] * 5, [LNG] * 5, at=now - 3600) == 0
+    assert agg.surge_at(LAT, LNG) == 1.0
+    assert agg.stats()["rejected"] == 15
+    assert agg.stats()["events"] == 0
+
+    # Real events after the rejected ones still land and drive the surge
+    assert agg.record_many(LOAD_CREATED, [LAT] * 5, [LNG] * 5, at=now) == 5
+    assert agg.record(DRIVER_AVAILABLE, LAT, LNG)
+    assert agg.stats()["events"] == 6
+    assert agg.surge_at(LAT, LNG) > 1.0
+
+
+def test_recent_past_and_one_bucket_ahead_are_kept():
+    agg = DemandAggregator(window_s=900.0, bucket_s=60.0)
+    now = time.time()
+    assert agg.record(LOAD_CREATED, LAT, LNG, at=now - 600)
+    assert agg.record(LOAD_CREATED, LAT, LNG, at=now + 30)
+    assert agg.stats()["rejected"] == 0
+
+
+def test_one_bucket_ahead_does_not_evict_live_counts():
+    agg = DemandAggregator(window_s=900.0, bucket_s=60.0)
+    now = time.time()
+    # Bucket now - 14 min shares its ring slot with the bucket one minute ahead
+    assert agg.record_many(LOAD_CREATED, [LAT] * 10, [LNG] * 10, at=now - 14 * 60) == 10
+    assert agg.record(DRIVER_AVAILABLE, LAT, LNG, at=now)
+    assert agg.surge_at(LAT, LNG) == 2.0
+    assert agg.record(LOAD_CREATED, LAT, LNG, at=now + 60)
+    assert agg.surge_at(LAT, LNG) == 2.0
+    assert agg.stats()["events"] == 12
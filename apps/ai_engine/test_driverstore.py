@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from driverstore import SharedDriverStore
+from matching import DriverBatch, MatchingEngine
+from registry import DriverRegistry
+
+LOAD = {
+    "load_id": "L1",
+    "origin": {"lat": 18.52, "lng": 73.85},
+    "destination": {"lat": 19.07, "lng": 72.87},
+    "weight": 10,
+    "destination_city": "Mumbai",
+}
+
+
+def _fleet(n: int, seed: int = 7):
+    """Drivers on a coarse lattice with few distinct ratings, so scores and distances tie often."""
+    rng = random.Random(seed)
+    drivers = []
+    for i in range(n):
+        drivers.append({
+            "id": f"D{rng.randrange(10 ** 6):06d}-{i}",
+            "location": {"lat": 18.52 + rng.randint(-4, 4) * 0.05, "lng": 73.85 + rng.randint(-4, 4) * 0.05},
+            "capacity": rng.choice([5, 10, 20]),
+            "rating": rng.choice([4.0, 4.5, 5.0]),
+            "home_city": rng.choice(["Mumbai", "Pune", None]),
+            "is_available": rng.random() > 0.1,
+        })
+    rng.shuffle(drivers)
+    return drivers
+
+
+def _registry_ranking(registry, engine, top_k, radius_km, nearest):
+    """What /match computes from registry candidates (executor.rank_drivers)."""
+    origin = LOAD["origin"]
+    candidates = registry.candidates(origin["lat"], origin["lng"], radius_km=radius_km, k=nearest)
+    batch = DriverBatch.from_dicts(candidates)
+    order, score, distance, _ = engine.rank_batch(LOAD, batch, top_k=top_k)
+    return [(batch.ids[i], round(float(score[i]), 2)) for i in order.tolist()]
+
+
+@pytest.mark.parametrize("top_k,radius_km,nearest", [
+    (None, 100.0, None),
+    (25, 100.0, None),
+    (10, 15.0, None),
+    (None, None, 60),
+    (15, 100.0, 40),
+])
+def test_rank_matches_registry(tmp_path, top_k, radius_km, nearest):
+    engine = MatchingEngine()
+    drivers = _fleet(400)
+    registry = DriverRegistry()
+    registry.upsert_many(drivers)
+    store = SharedDriverStore(str(tmp_path / "drivers.bin"), capacity=1000)
+    store.upsert_many(drivers)
+    try:
+        ids, score, _, _ = store.rank(engine, LOAD, top_k=top_k, radius_km=radius_km, nearest=nearest)
+        expected = _registry_ranking(registry, engine, top_k, radius_km, nearest)
+        assert len(expected) > 0
+        assert list(zip(ids, [round(x, 2) for x in score.tolist()])) == expected
+    finally:
+        store.close()
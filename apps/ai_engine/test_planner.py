@@ -0,0 +1,45 @@
+from graph import graph_from_dicts
+from planner import plan_stops
+from routing import RouteOptimizer
+
+NODES = {"S": (19.0, 72.8), "A": (19.1, 72.9), "B": (19.2, 72.7), "C": (19.3, 72.8)}
+
+
+def _optimizer(edges):
+    graph = graph_from_dicts(NODES, [(u, v, {"distance": d}) for u, v, d in edges],
+                             RouteOptimizer._edge_costs, directed=True)
+    return RouteOptimizer(graph)
+
+
+def _assert_routes_visit_stops(result, stops):
+    for route in result["routes"]:
+        for k in route["stops"]:
+            assert stops[k]["node"] in route["route"]
+
+
+def test_no_path_between_stops_splits_routes():
+    # S -> A and S -> B only: no route can visit both
+    optimizer = _optimizer([("S", "A", 10), ("S", "B", 12)])
+    stops = [{"node": "A"}, {"node": "B"}]
+    result = plan_stops(optimizer, "S", stops)
+    assert result["unserved_stops"] == []
+    assert sorted(route["stops"] for route in result["routes"]) == [[0], [1]]
+    _assert_routes_visit_stops(result, stops)
+
+
+def test_no_path_back_to_start_is_unserved():
+    optimizer = _optimizer([("S", "A", 10), ("S", "B", 12), ("B", "S", 12)])
+    stops = [{"node": "A"}, {"node": "B"}]
+    result = plan_stops(optimizer, "S", stops, return_to_start=True)
+    assert result["unserved_stops"] == [0]
+    assert [route["stops"] for route in result["routes"]] == [[1]]
+    assert result["routes"][0]["route"] == ["S", "B", "S"]
+
+
+def test_one_way_chain_keeps_its_order():
+    optimizer = _optimizer([("S", "A", 10), ("A", "B", 10), ("B", "C", 10), ("S", "C", 50)])
+    stops = [{"node": "C"}, {"node": "B"}, {"node": "A"}]
+    result = plan_stops(optimizer, "S", stops)
+    assert result["unserved_stops"] == []
+    assert [route["stops"] for route in result["routes"]] == [[2, 1, 0]]
+    assert result["routes"][0]["route"] == ["S", "A", "B", "C"]
@@ -0,0 +1,79 @@
+import csv
+from datetime import datetime
+
+import numpy as np
+
+from pricing import is_night_hour, is_peak_hour
+
+HOURS = 24
+LEVELS = 10  # edge traffic attribute 1-10
+
+# Default profile: peak hours (the same 8-11 / 17-21 as pricing) slow a road
+# by PEAK_SLOWDOWN per traffic level, night hours speed it up by
+# NIGHT_SPEEDUP per level; other hours keep the static travel time.
+PEAK_SLOWDOWN = 0.06
+NIGHT_SPEEDUP = 0.015
+
+
+def hour_of_day(timestamp: float) -> float:
+    """Local hour of a unix timestamp as a fraction (13.5 = 13:30)."""
+    t = datetime.fromtimestamp(timestamp)
+    return t.hour + t.minute / 60 + t.second / 3600
+
+
+class TrafficProfiles:
+    """
+    Hourly travel-time factors per traffic level: an edge with traffic level L
+    (its `traffic` attribute, rounded and clipped to 1-10) takes
+    static_time * table[L - 1, hour] when entered at that hour. Factors are
+    interpolated linearly between whole hours so that arrival time never
+    decreases with departure time on realistic tables.
+    """
+    def __init__(self, table):
+        table = np.asarray(table, dtype=np.float64)
+        if table.shape != (LEVELS, HOURS) or (table <= 0).any():
+            raise ValueError(f"Traffic profile table must be {LEVELS}x{HOURS} positive factors")
+        self.table = table
+        self.min_factor = float(table.min())
+
+    @classmethod
+    def default(cls) -> "TrafficProfiles":
+        levels = np.arange(1, LEVELS + 1)[:, None]
+        peak = np.array([is_peak_hour(h) for h in range(HOURS)])
+        night = np.array([is_night_hour(h) for h in range(HOURS)])
+        table = np.where(peak, 1 + PEAK_SLOWDOWN * levels, np.where(night, 1 - NIGHT_SPEEDUP * levels, 1.0))
+        return cls(table)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "TrafficProfiles":
+        """Rows `level,h0,...,h23`; levels missing from the file keep the default profile."""
+        table = cls.default().table.copy()
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                level = int(row["level"])
+                table[level - 1] = [float(row[f"h{h}"]) for h in range(HOURS)]
+        return cls(table)
+
+    @staticmethod
+    def levels(traffic: np.ndarray) -> np.ndarray:
+        """Profile row of each edge (0-based) from its traffic attribute."""
+        return np.clip(np.rint(traffic), 1, LEVELS).astype(np.intp) - 1
+
+    def factors(self, levels: np.ndarray, hour: float) -> np.ndarray:
+        """Travel-time factor at `hour` (any real, taken mod 24) for each profile row."""
+        hour = hour % HOURS
+        h = int(hour)
+        f = hour - h
+        return self.table[levels, h] * (1 - f) + self.table[levels, (h + 1) % HOURS] * f
+
+    def profile(self, traffic: float) -> list:
+        """The 24 hourly factors of an edge with this traffic level."""
+        return self.table[self.levels(np.array([traffic]))[0]].tolist()
+
+
+def static_hours(distance: np.ndarray, quality: np.ndarray, traffic: np.ndarray) -> np.ndarray:
+    """Travel time (hours) of edges, same speed model as RouteOptimizer._edge_costs."""
+    base_speed = 60 # km/h
+    speed_factor = (quality / 10) * (1 - (traffic / 20))
+    return distance / (base_speed * np.maximum(0.2, speed_factor))
+